@@ -15,16 +15,25 @@
  3. Save 30 detailed CSVs containing NA values.
  4. (V10) Calculate 3 match rates, each with its own independent total sample size (denominator).
  5. Save the 90 match rates (and their respective denominators) to a "match_rates.txt" summary file.
+ 6. Scenarios are the product of GRID_AXES (input/output windows, optionally threshold,
+    asset and event folders) and run on a process pool; inputs are loaded once and
+    prices are shared read-only through a shared-memory panel.
 =============================================================================
 """
 
 import os
 import json
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import sys
 from collections import Counter
 import traceback
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from ohlcv_store import load_ohlcv
+from ohlcv_index import BarIndex, to_ns
+from price_panel import build_panel, PricePanel
 
 # --- 1. Global Configuration ---
 
@@ -40,11 +49,31 @@ OUTPUT_DIR = r'Project\correlation_matrix_v10'
 EVENT_DIRS_TO_SCAN = ['ALL', 'BTC']
 PRICE_RESOLUTION = pd.Timedelta(minutes=5)
 PRICE_THRESHOLD = 0.1  # 0.1% threshold for price change
+# Thresholds evaluated together (one classification pass) for the match-rate cube,
+# unless GRID_AXES has a 'threshold' axis, which then is the cube's threshold vector
+PRICE_THRESHOLDS = [0.05, 0.1, 0.2, 0.5]
+TREND_LABELS = ['bullish', 'bearish', 'consolidation']
+IMPACT_LEVELS = ['all', 'medhigh', 'high']
 
 # --- [!] Automated Experiment Parameters ---
 INPUT_WINDOWS_MIN = [5, 10, 20, 30, 60, 120]
 OUTPUT_WINDOWS_MIN = [10, 20, 30, 60, 120]
 
+# --- [!] Scenario Grid (every combination of these axes is one scenario) ---
+# Optional extra axes, each falling back to the single-run setting above when absent:
+#   'threshold': [0.05, 0.1, 0.2]            (PRICE_THRESHOLD; also replaces PRICE_THRESHOLDS)
+#   'asset': ['BTC', 'ETH']                  (keys of ASSET_PRICE_PATHS, default DEFAULT_ASSET)
+#   'event_dirs': [('ALL', 'BTC'), ('ALL',)] (EVENT_DIRS_TO_SCAN)
+GRID_AXES = {
+    'input_min': INPUT_WINDOWS_MIN,
+    'output_min': OUTPUT_WINDOWS_MIN,
+}
+DEFAULT_ASSET = 'BTC'
+ASSET_PRICE_PATHS = {
+    'BTC': PRICE_CSV_PATH,
+}
+GRID_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
 # --- 2. Helper Functions ---
 
 def load_events(base_dir, subfolders):
@@ -96,25 +125,54 @@ def load_events(base_dir, subfolders):
 def load_price_data(csv_path):
     """
     Load and prepare price data (OHLCV CSV).
+    Served from the memory-mapped columnar store (rebuilt automatically if the CSV is newer).
     """
     print(f"\nStart loading price data: {csv_path}...")
     try:
-        df_price = pd.read_csv(csv_path)
+        df_price = load_ohlcv(csv_path)
     except FileNotFoundError:
         print(f"❌ Critical Error: Price file {csv_path} not found.")
         sys.exit()
-        
-    df_price['open_time'] = pd.to_datetime(df_price['open_time'])
-    df_price = df_price.set_index('open_time').sort_index()
     
     print(f"🎉 Successfully loaded {len(df_price)} price records.")
     return df_price
 
 
-def get_price_trend(df_price, start_time, end_time, resolution, threshold):
+def classify_trend(percent_change, threshold):
+    """
+    Vectorized trend labels for an array of percent changes.
+    NaN (zero start price, see BarIndex.window_pct_change) is 'consolidation' for any threshold.
+    """
+    percent_change = np.asarray(percent_change, dtype=float)
+    labels = np.where(percent_change >= threshold, 'bullish',
+                      np.where(percent_change <= -threshold, 'bearish', 'consolidation'))
+    # Explicit, so threshold == 0 cannot turn a zero start price into 'bullish'
+    labels[np.isnan(percent_change)] = 'consolidation'
+    return labels
+
+
+def get_price_trends(df_price, bar_index, window_starts, window_ends, threshold):
+    """
+    Vectorized get_price_trend for many windows at once.
+    Returns an object array of labels, with None where price data is missing.
+    """
+    pct, ok = bar_index.window_pct_change(
+        df_price['open'].to_numpy(), df_price['close'].to_numpy(), window_starts, window_ends
+    )
+    trends = classify_trend(pct, threshold).astype(object)
+    trends[~ok] = None
+    return trends
+
+
+def get_price_trend(df_price, start_time, end_time, resolution, threshold, bar_index=None):
     """
     Calculate price trend based on P_start(open) and P_end(close).
+    With a BarIndex, bars are located by arithmetic and missing bars are
+    detected from its bitmap instead of a KeyError.
     """
+    if bar_index is not None:
+        return get_price_trends(df_price, bar_index, [start_time], [end_time], threshold)[0]
+
     end_bar_time = end_time - resolution
     
     try:
@@ -170,198 +228,472 @@ def get_majority_sentiment(event_list_tuples, level='all'):
     return counts.most_common(1)[0][0]
 
 
-def process_scenario(df_events, df_price, input_min, output_min, output_dir):
+def majority_sentiments(window_ids, sentiment_codes, sentiment_labels, n_windows):
     """
-    Run full analysis for a single (input, output) combination.
-    V10: Returns 3 sets of (match, total).
+    Vectorized get_majority_sentiment for many windows at once.
+    `window_ids` / `sentiment_codes` describe the (already level-filtered) events in
+    their original order. Reproduces Counter.most_common(1) (first-seen sentiment wins
+    a count tie) and the bullish == bearish -> 'consolidation' rule; windows with no
+    events get pd.NA.
+    """
+    n_labels = len(sentiment_labels)
+    key = window_ids * n_labels + sentiment_codes
+    counts = np.bincount(key, minlength=n_windows * n_labels).reshape(n_windows, n_labels)
+
+    # Position of the first event of each (window, sentiment) pair
+    no_event = np.iinfo(np.int64).max
+    first_seen = np.full(n_windows * n_labels, no_event, dtype=np.int64)
+    unique_keys, first_pos = np.unique(key, return_index=True)
+    first_seen[unique_keys] = first_pos
+    first_seen = first_seen.reshape(n_windows, n_labels)
+
+    max_counts = counts.max(axis=1)
+    is_candidate = counts == max_counts[:, None]
+    winner = np.argmin(np.where(is_candidate, first_seen, no_event), axis=1)
+
+    majority = np.asarray(sentiment_labels, dtype=object)[winner]
+    labels = list(sentiment_labels)
+    bullish = counts[:, labels.index('bullish')] if 'bullish' in labels else np.zeros(n_windows, dtype=np.int64)
+    bearish = counts[:, labels.index('bearish')] if 'bearish' in labels else np.zeros(n_windows, dtype=np.int64)
+    majority[(bullish > 0) & (bullish == bearish)] = 'consolidation'
+    majority[max_counts == 0] = pd.NA
+    return majority
+
+
+def compute_scenario_windows(df_events, df_price, input_min, output_min, bar_index=None):
+    """
+    Threshold-independent part of a single (input, output) combination.
+    Events are bucketed into windows with searchsorted, sentiment counts per
+    impact level come from bincount, and prices are gathered through a BarIndex.
+    Returns the per-window DataFrame (rows = non-empty windows with price data)
+    with the raw `pct_change` instead of a trend label, or None if there is no overlap.
     """
-    
-    # 1. Set time parameters
     event_window = pd.Timedelta(minutes=input_min)
     price_window = pd.Timedelta(minutes=output_min)
-    
-    # 2. Generate time windows
+    if bar_index is None:
+        bar_index = BarIndex.from_frame(df_price, PRICE_RESOLUTION)
+
+    # 1. Windows (same grid and stop rule as the V10 loop)
     overall_start_time = df_price.index.min()
     overall_end_time = df_price.index.max()
-    
-    time_windows = pd.date_range(
-        start=overall_start_time, 
-        end=overall_end_time, 
-        freq=event_window
+    time_windows = pd.date_range(start=overall_start_time, end=overall_end_time, freq=event_window)
+    time_windows = time_windows[time_windows + event_window + price_window <= overall_end_time + PRICE_RESOLUTION]
+    n_windows = len(time_windows)
+    if n_windows == 0 or df_events.empty:
+        return None
+
+    # 2. Bucket events into windows: window w covers [start_w, start_w + event_window)
+    window_start_ns = to_ns(time_windows)
+    event_ns = to_ns(df_events.index)
+    window_of_event = np.searchsorted(window_start_ns, event_ns, side='right') - 1
+    in_window = (window_of_event >= 0) & (event_ns < window_start_ns[np.maximum(window_of_event, 0)] + event_window.value)
+    window_of_event = np.where(in_window, window_of_event, -1)
+    n_events = np.bincount(window_of_event[in_window], minlength=n_windows)
+
+    # 3. Price change for non-empty windows; drop windows with missing price data
+    candidates = np.flatnonzero(n_events > 0)
+    pct_change, has_price = bar_index.window_pct_change(
+        df_price['open'].to_numpy(), df_price['close'].to_numpy(),
+        time_windows[candidates] + event_window,
+        time_windows[candidates] + event_window + price_window
     )
-    
-    results = []
-    
-    # 3. Iterate through all time windows
-    for window_start in tqdm(time_windows, desc=f"Input={input_min}m, Output={output_min}m", leave=False):
-        
-        # --- A. Define all time points ---
-        event_window_start = window_start
-        event_window_end = window_start + event_window
-        
-        price_window_start = event_window_end
-        price_window_end = price_window_start + price_window
-        
-        if price_window_end > overall_end_time + PRICE_RESOLUTION:
-            break
-            
-        # --- B. Core Filtering: Keep only windows with events ---
-        events_in_window = df_events[
-            (df_events.index >= event_window_start) &
-            (df_events.index < event_window_end)
-        ]
-        
-        if events_in_window.empty:
-            continue
-            
-        # --- C. Calculate price trend (if events exist) ---
-        trend = get_price_trend(
-            df_price,
-            price_window_start,
-            price_window_end,
-            PRICE_RESOLUTION,
-            PRICE_THRESHOLD
-        )
-        
-        if trend is None: # (e.g., missing price data)
-            continue
-            
-        # --- D. Calculate 3 types of majority sentiment ---
-        event_list = events_in_window[['sentiment', 'impact']].values.tolist()
-        
-        sent_all = get_majority_sentiment(event_list, 'all')
-        sent_medhigh = get_majority_sentiment(event_list, 'medhigh')
-        sent_high = get_majority_sentiment(event_list, 'high')
-        
-        # --- E. Record results ---
-        time_window_str = (
-            f"{event_window_start.strftime('%Y%m%dT%H%M')}-"
-            f"{event_window_end.strftime('%Y%m%dT%H%M')}"
-        )
-        
-        results.append({
-            'time_window': time_window_str,
-            'price_trend': trend,
-            'events_list': str(event_list), # Full list for archiving
-            'sentiment_all': sent_all,
-            'sentiment_medhigh': sent_medhigh,
-            'sentiment_high': sent_high
-        })
+    kept = candidates[has_price]
+    if len(kept) == 0:
+        return None
+
+    # 4. Majority sentiment per impact level (events keep their original order)
+    row_of_window = np.full(n_windows, -1, dtype=np.int64)
+    row_of_window[kept] = np.arange(len(kept))
+    event_row = np.where(in_window, row_of_window[np.maximum(window_of_event, 0)], -1)
+    in_kept = event_row >= 0
+
+    sentiment_codes, sentiment_labels = pd.factorize(df_events['sentiment'])
+    impacts = df_events['impact'].to_numpy()
+    level_masks = {
+        'all': in_kept,
+        'medhigh': in_kept & np.isin(impacts, ['Medium', 'High']),
+        'high': in_kept & (impacts == 'High'),
+    }
+    sentiments = {
+        level: majority_sentiments(event_row[mask], sentiment_codes[mask], sentiment_labels, len(kept))
+        for level, mask in level_masks.items()
+    }
+
+    # 5. Archive columns: window label and the full event list, as str(list_of_lists)
+    kept_starts = time_windows[kept]
+    time_window_str = kept_starts.strftime('%Y%m%dT%H%M') + '-' + (kept_starts + event_window).strftime('%Y%m%dT%H%M')
+
+    kept_event_pos = np.flatnonzero(in_kept)
+    kept_event_pos = kept_event_pos[np.argsort(event_row[kept_event_pos], kind='stable')]
+    event_reprs = [repr([s, i]) for s, i in zip(df_events['sentiment'].to_numpy()[kept_event_pos], impacts[kept_event_pos])]
+    bounds = np.r_[0, np.cumsum(n_events[kept])]
+    events_list = ['[' + ', '.join(event_reprs[a:b]) + ']' for a, b in zip(bounds[:-1], bounds[1:])]
+
+    return pd.DataFrame({
+        'time_window': list(time_window_str),
+        'pct_change': pct_change[has_price],
+        'events_list': events_list,
+        'sentiment_all': list(sentiments['all']),
+        'sentiment_medhigh': list(sentiments['medhigh']),
+        'sentiment_high': list(sentiments['high']),
+    })
+
+
+def build_scenario_frame(df_events, df_price, input_min, output_min, threshold=PRICE_THRESHOLD, bar_index=None):
+    """
+    Vectorized V10 window table for a single (input, output) combination
+    (columns: time_window, price_trend, events_list, sentiment_*), or None.
+    """
+    df_windows = compute_scenario_windows(df_events, df_price, input_min, output_min, bar_index)
+    return None if df_windows is None else label_scenario_windows(df_windows, threshold)
+
+
+def label_scenario_windows(df_windows, threshold):
+    """
+    Replace `pct_change` with the `price_trend` label for one threshold.
+    """
+    df_scenario = df_windows.drop(columns='pct_change')
+    df_scenario.insert(1, 'price_trend', classify_trend(df_windows['pct_change'].to_numpy(), threshold).astype(object))
+    return df_scenario
+
+
+def threshold_match_counts(df_windows, thresholds):
+    """
+    Classify every window against a whole vector of thresholds in one broadcast
+    (thresholds x windows) and count matches per impact level.
+    Returns int64 array (n_thresholds, n_levels, 2) holding (match, total);
+    totals use the V10 independent denominators (NA sentiments are skipped).
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    counts = np.zeros((len(thresholds), len(IMPACT_LEVELS), 2), dtype=np.int64)
+    if df_windows is None:
+        return counts
+
+    pct = df_windows['pct_change'].to_numpy()[None, :]
+    thr = thresholds[:, None]
+    trend_codes = np.where(pct >= thr, 0, np.where(pct <= -thr, 1, 2))  # codes of TREND_LABELS
+    trend_codes[:, np.isnan(pct[0])] = 2                                 # zero start price: consolidation
+
+    for l, level in enumerate(IMPACT_LEVELS):
+        sentiment = df_windows[f'sentiment_{level}']
+        present = sentiment.notna().to_numpy()
+        sentiment_codes = pd.Categorical(sentiment, categories=TREND_LABELS).codes  # -1 for other labels / NA
+        counts[:, l, 0] = ((trend_codes == sentiment_codes[None, :]) & present).sum(axis=1)
+        counts[:, l, 1] = present.sum()
+    return counts
+
+
+def match_indicators(df_scenario):
+    """
+    Per-window match indicators (bool arrays, in window order) for each impact level.
+    Windows whose level subset is empty (NA sentiment) are left out, so len() of each
+    array is that level's independent denominator.
+    """
+    indicators = {}
+    for level in IMPACT_LEVELS:
+        df_level = df_scenario.dropna(subset=[f'sentiment_{level}'])
+        indicators[level] = (df_level[f'sentiment_{level}'] == df_level['price_trend']).to_numpy(dtype=bool)
+    return indicators
+
+
+def process_scenario(df_events, df_price, input_min, output_min, output_dir, bar_index=None,
+                     threshold=PRICE_THRESHOLD, csv_tag=''):
+    """
+    Run full analysis for a single (input, output) combination.
+    V10: Returns 3 sets of (match, total).
+    """
+    df_windows = compute_scenario_windows(df_events, df_price, input_min, output_min, bar_index)
+    return summarize_scenario(df_windows, input_min, output_min, output_dir, threshold, csv_tag)
+
 
+def summarize_scenario(df_windows, input_min, output_min, output_dir, threshold=PRICE_THRESHOLD, csv_tag=''):
+    """
+    Label the windows for one threshold, save the scenario CSV and return the V10 match counts.
+    """
     # 4. Save CSV
-    if not results:
+    if df_windows is None:
         tqdm.write("  -> Warning: No overlapping data found.")
         return (0, 0, 0, 0, 0, 0) # (Return 0 matches)
 
-    df_scenario = pd.DataFrame(results)
-    
-    csv_filename = f"input_{input_min}m_output_{output_min}m.csv"
-    csv_path = os.path.join(output_dir, csv_filename)
-    df_scenario.to_csv(csv_path, index=False)
+    df_scenario = save_scenario_csv(df_windows, input_min, output_min, output_dir, threshold, csv_tag)
     
     # 5. V10 Match Rate Calculation (Independent Denominator)
-    
-    # 5.1 'All' Stats (It will never be NA because we filtered empty windows)
-    df_all = df_scenario.dropna(subset=['sentiment_all'])
-    total_all = len(df_all)
-    match_all = (df_all['sentiment_all'] == df_all['price_trend']).sum() if total_all > 0 else 0
-
-    # 5.2 'Med+High' Stats (Drop rows where 'sentiment_medhigh' is NA)
-    df_medhigh = df_scenario.dropna(subset=['sentiment_medhigh'])
-    total_medhigh = len(df_medhigh)
-    match_medhigh = (df_medhigh['sentiment_medhigh'] == df_medhigh['price_trend']).sum() if total_medhigh > 0 else 0
-
-    # 5.3 'High Only' Stats (Drop rows where 'sentiment_high' is NA)
-    df_high = df_scenario.dropna(subset=['sentiment_high'])
-    total_high = len(df_high)
-    match_high = (df_high['sentiment_high'] == df_high['price_trend']).sum() if total_high > 0 else 0
+    # ('All' will never be NA because we filtered empty windows; the other levels drop NA rows)
+    indicators = match_indicators(df_scenario)
+    match_all, total_all = int(indicators['all'].sum()), len(indicators['all'])
+    match_medhigh, total_medhigh = int(indicators['medhigh'].sum()), len(indicators['medhigh'])
+    match_high, total_high = int(indicators['high'].sum()), len(indicators['high'])
     
     return (match_all, total_all, match_medhigh, total_medhigh, match_high, total_high)
 
-# --- 3. Main Execution Logic (V10.1 Bugfix) ---
+
+
+def save_scenario_csv(df_windows, input_min, output_min, output_dir, threshold, csv_tag=''):
+    """
+    Label the windows for one threshold and save them as the scenario CSV.
+    """
+    df_scenario = label_scenario_windows(df_windows, threshold)
+    csv_filename = f"input_{input_min}m_output_{output_min}m{csv_tag}.csv"
+    df_scenario.to_csv(os.path.join(output_dir, csv_filename), index=False)
+    return df_scenario
+
+# --- 3. Scenario Grid Runner ---
+
+def expand_grid(axes):
+    """
+    Cartesian product of the grid axes, in deterministic (row-major) order.
+    Each scenario is a dict with every axis filled in (defaults for absent axes).
+    """
+    names = list(axes)
+    scenarios = []
+    for values in itertools.product(*(axes[n] for n in names)):
+        scenario = {
+            'threshold': PRICE_THRESHOLD,
+            'asset': DEFAULT_ASSET,
+            'event_dirs': tuple(EVENT_DIRS_TO_SCAN),
+        }
+        scenario.update(zip(names, values))
+        scenario['event_dirs'] = tuple(scenario['event_dirs'])
+        scenarios.append(scenario)
+    return scenarios
+
+
+def grid_thresholds(axes):
+    """
+    (cube thresholds, report thresholds) of a grid. A 'threshold' axis is both;
+    without one the cube covers PRICE_THRESHOLDS and the report PRICE_THRESHOLD.
+    """
+    if 'threshold' in axes:
+        thresholds = list(dict.fromkeys(axes['threshold']))
+        return thresholds, thresholds
+    return list(dict.fromkeys(PRICE_THRESHOLDS + [PRICE_THRESHOLD])), [PRICE_THRESHOLD]
+
+
+def window_key(scenario):
+    """
+    Every scenario setting except the threshold: scenarios sharing it share their windows.
+    """
+    return tuple(sorted((k, v) for k, v in scenario.items() if k != 'threshold'))
+
+
+def scenario_label(scenario, axes):
+    """
+    Human-readable scenario name; extra axes are only mentioned if they are part of the grid.
+    """
+    label = f"Scenario: Input={scenario['input_min']}m, Output={scenario['output_min']}m"
+    if 'asset' in axes:
+        label += f", Asset={scenario['asset']}"
+    if 'threshold' in axes:
+        label += f", Threshold={scenario['threshold']}%"
+    if 'event_dirs' in axes:
+        label += f", Events={'+'.join(scenario['event_dirs'])}"
+    return label
+
+
+def scenario_csv_tag(scenario, axes):
+    """
+    File-name suffix so scenarios that differ only in an extra axis do not overwrite each other.
+    """
+    tag = ''
+    if 'asset' in axes:
+        tag += f"_asset_{scenario['asset']}"
+    if 'threshold' in axes:
+        tag += f"_thr_{scenario['threshold']}"
+    if 'event_dirs' in axes:
+        tag += f"_events_{'+'.join(scenario['event_dirs'])}"
+    return tag
+
+
+# Read-only inputs of a grid worker, set once per process by _init_grid_worker
+_GRID_STATE = {}
+
+def _init_grid_worker(events_by_dirs, panel_spec, axes, output_dir, thresholds, csv_thresholds):
+    _GRID_STATE.clear()
+    _GRID_STATE.update({
+        'thresholds': thresholds,
+        'csv_thresholds': csv_thresholds,
+        'events': events_by_dirs,
+        'panel': PricePanel.attach(panel_spec),
+        'axes': axes,
+        'output_dir': output_dir,
+        'prices': {},
+    })
+
+
+def _grid_prices(asset):
+    """
+    Per-worker (frame, BarIndex) for an asset, cut from the shared panel on first use.
+    """
+    prices = _GRID_STATE['prices']
+    if asset not in prices:
+        df_price = _GRID_STATE['panel'].asset_frame(asset)
+        prices[asset] = (df_price, BarIndex.from_frame(df_price, PRICE_RESOLUTION))
+    return prices[asset]
+
+
+def _run_grid_scenario(scenario):
+    df_price, bar_index = _grid_prices(scenario['asset'])
+    df_windows = compute_scenario_windows(
+        _GRID_STATE['events'][scenario['event_dirs']],
+        df_price,
+        scenario['input_min'],
+        scenario['output_min'],
+        bar_index
+    )
+    if df_windows is None:
+        tqdm.write("  -> Warning: No overlapping data found.")
+    else:
+        for threshold in _GRID_STATE['csv_thresholds']:
+            save_scenario_csv(
+                df_windows,
+                scenario['input_min'],
+                scenario['output_min'],
+                _GRID_STATE['output_dir'],
+                threshold,
+                scenario_csv_tag(dict(scenario, threshold=threshold), _GRID_STATE['axes'])
+            )
+    return threshold_match_counts(df_windows, _GRID_STATE['thresholds'])
+
+
+def run_grid(axes, output_dir, max_workers=GRID_WORKERS):
+    """
+    Run every scenario of the grid across a process pool.
+    Events (per event-folder set) and prices are loaded once in this process; prices are
+    published as one shared-memory panel that workers attach to without copying.
+    Windows are computed once per scenario without its threshold and classified against
+    every threshold of grid_thresholds(axes) in one pass.
+    Returns [(scenario, (match_all, total_all, match_medhigh, total_medhigh, match_high, total_high))]
+    in grid order, independent of completion order, and the match-rate cube as a long table
+    (one row per threshold x scenario x impact level).
+    """
+    scenarios = expand_grid(axes)
+    window_axes = {k: v for k, v in axes.items() if k != 'threshold'}
+    window_scenarios = expand_grid(window_axes)
+    thresholds, csv_thresholds = grid_thresholds(axes)
+
+    events_by_dirs = {}
+    for dirs in dict.fromkeys(s['event_dirs'] for s in scenarios):
+        events_by_dirs[dirs] = load_events(EVENTS_BASE_DIR, list(dirs))
+
+    assets = list(dict.fromkeys(s['asset'] for s in scenarios))
+    print(f"\nStart loading price data: {[ASSET_PRICE_PATHS[a] for a in assets]}...")
+    panel = build_panel(assets={a: ASSET_PRICE_PATHS[a] for a in assets}, ohlcv_dir='')
+    panel_spec = panel.publish()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_grid_worker,
+            initargs=(events_by_dirs, panel_spec, list(axes), output_dir, thresholds, csv_thresholds)
+        ) as executor:
+            outputs = list(tqdm(executor.map(_run_grid_scenario, window_scenarios),
+                                total=len(window_scenarios), desc="Scenarios"))
+    finally:
+        panel.unlink()
+    cube = np.stack(outputs, axis=1)  # (n_thresholds, n_window_scenarios, n_levels, 2)
+
+    window_index = {window_key(w): i for i, w in enumerate(window_scenarios)}
+    results = []
+    for scenario in scenarios:
+        counts = cube[thresholds.index(scenario['threshold']), window_index[window_key(scenario)]]
+        results.append((scenario, tuple(int(c) for c in counts.ravel())))
+    return results, threshold_cube_frame(window_scenarios, cube, thresholds)
+
+
+def threshold_cube_frame(window_scenarios, cube, thresholds):
+    """
+    The threshold x scenario x impact-level cube as a long table, keyed by
+    (threshold, input_min, output_min, asset, event_dirs, level) without duplicates.
+    """
+    rows = []
+    for t, threshold in enumerate(thresholds):
+        for s, scenario in enumerate(window_scenarios):
+            for l, level in enumerate(IMPACT_LEVELS):
+                match, total = cube[t, s, l]
+                rows.append({
+                    'threshold': threshold,
+                    'input_min': scenario['input_min'],
+                    'output_min': scenario['output_min'],
+                    'asset': scenario['asset'],
+                    'event_dirs': '+'.join(scenario['event_dirs']),
+                    'level': level,
+                    'match': int(match),
+                    'total': int(total),
+                    'match_rate': match / total if total > 0 else np.nan,
+                })
+    return pd.DataFrame(rows)
+
+
+def write_scenario_report(f_report, scenario_name, counts):
+    """
+    Append one scenario block to the summary report and echo the result line.
+    """
+    (match_all, total_all,
+     match_medhigh, total_medhigh,
+     match_high, total_high) = counts
+
+    f_report.write("="*60 + "\n")
+    f_report.write(f"{scenario_name}\n")
+
+    if total_all == 0:
+        f_report.write("(No overlapping data, 0 non-empty windows)\n")
+        tqdm.write(f"{scenario_name} -> Result: 0 rows")
+    else:
+        # --- 'All' Stats (Base) ---
+        rate_all = match_all / total_all
+        report_line_1 = f"  - All Events:      Match Rate: {rate_all:.2%} ({match_all}/{total_all} rows)"
+        console_line_1 = f"(All): {rate_all:.2%}"
+
+        # --- 'Med+High' Stats ---
+        if total_medhigh == 0:
+            report_line_2 = "  - Med+High Events: Match Rate: N/A (0 rows)"
+            console_line_2 = "(Med+High): N/A"
+        else:
+            rate_medhigh = match_medhigh / total_medhigh
+            report_line_2 = f"  - Med+High Events: Match Rate: {rate_medhigh:.2%} ({match_medhigh}/{total_medhigh} rows)"
+            console_line_2 = f"(Med+High): {rate_medhigh:.2%}"
+
+        # --- 'High Only' Stats ---
+        if total_high == 0:
+            report_line_3 = "  - High Only Events: Match Rate: N/A (0 rows)"
+            console_line_3 = "(High): N/A"
+        else:
+            rate_high = match_high / total_high
+            report_line_3 = f"  - High Only Events: Match Rate: {rate_high:.2%} ({match_high}/{total_high} rows)"
+            console_line_3 = f"(High): {rate_high:.2%}"
+
+        # --- Write to File ---
+        f_report.write(f"(Based on {total_all} non-empty windows)\n")
+        f_report.write(report_line_1 + "\n")
+        f_report.write(report_line_2 + "\n")
+        f_report.write(report_line_3 + "\n")
+
+        tqdm.write(f"{scenario_name} -> Result: {console_line_1} | {console_line_2} | {console_line_3}")
+
+    f_report.write("="*60 + "\n\n")
+
+# --- 4. Main Execution Logic (V10.1 Bugfix) ---
 if __name__ == "__main__":
     
     # --- Step 1: Create Output Directory ---
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     report_txt_path = os.path.join(OUTPUT_DIR, "match_rates_summary_v10.txt")
+    cube_csv_path = os.path.join(OUTPUT_DIR, "match_rates_threshold_cube.csv")
     print(f"Output will be saved to: {OUTPUT_DIR}")
     
-    # --- Step 2: Load Data (Once) ---
-    df_events = load_events(EVENTS_BASE_DIR, EVENT_DIRS_TO_SCAN)
-    df_price = load_price_data(PRICE_CSV_PATH)
-    
+    n_scenarios = int(np.prod([len(v) for v in GRID_AXES.values()]))
     print("\n" + "="*80)
     print("🚀 Start Automated Correlation Matrix Analysis (V10.1 Bugfix)...")
-    print(f"  -> {len(INPUT_WINDOWS_MIN)} (Input) x {len(OUTPUT_WINDOWS_MIN)} (Output) = {len(INPUT_WINDOWS_MIN) * len(OUTPUT_WINDOWS_MIN)} scenarios to process")
+    print(f"  -> {' x '.join(f'{len(v)} ({k})' for k, v in GRID_AXES.items())} = {n_scenarios} scenarios on {GRID_WORKERS} workers")
     print("="*80 + "\n")
     
-    # --- Step 3: Loop & Write Report ---
+    # --- Step 2: Load Data (Once) & Run All Scenarios in Parallel ---
+    # --- Step 3: Write Report (grid order) ---
     try:
+        results, df_cube = run_grid(GRID_AXES, OUTPUT_DIR)
         with open(report_txt_path, 'w', encoding='utf-8') as f_report:
-            
-            # Use tqdm for the outer loop
-            for input_min in tqdm(INPUT_WINDOWS_MIN, desc="Total Input Windows"):
-                for output_min in OUTPUT_WINDOWS_MIN:
-                    
-                    scenario_name = f"Scenario: Input={input_min}m, Output={output_min}m"
-                    tqdm.write(f"\nProcessing {scenario_name}...")
-                    
-                    # --- Step 4: Execute Single Scenario Analysis ---
-                    (match_all, total_all, 
-                     match_medhigh, total_medhigh, 
-                     match_high, total_high) = process_scenario(
-                        df_events, 
-                        df_price, 
-                        input_min, 
-                        output_min, 
-                        OUTPUT_DIR
-                    )
-                    
-                    # --- Step 5: Write to TXT Report (V10.1 Improved Robust Logic) ---
-                    f_report.write("="*60 + "\n")
-                    f_report.write(f"{scenario_name}\n")
-                    
-                    # (Prepare strings for console and file)
-                    console_lines = []
-                    
-                    if total_all == 0:
-                        f_report.write("(No overlapping data, 0 non-empty windows)\n")
-                        tqdm.write("  -> Result: 0 rows")
-                    else:
-                        # --- 'All' Stats (Base) ---
-                        rate_all = match_all / total_all
-                        report_line_1 = f"  - All Events:      Match Rate: {rate_all:.2%} ({match_all}/{total_all} rows)"
-                        console_line_1 = f"(All): {rate_all:.2%}"
-
-                        # --- 'Med+High' Stats ---
-                        if total_medhigh == 0:
-                            report_line_2 = "  - Med+High Events: Match Rate: N/A (0 rows)"
-                            console_line_2 = "(Med+High): N/A"
-                        else:
-                            rate_medhigh = match_medhigh / total_medhigh
-                            report_line_2 = f"  - Med+High Events: Match Rate: {rate_medhigh:.2%} ({match_medhigh}/{total_medhigh} rows)"
-                            console_line_2 = f"(Med+High): {rate_medhigh:.2%}"
-                        
-                        # --- 'High Only' Stats ---
-                        if total_high == 0:
-                            report_line_3 = "  - High Only Events: Match Rate: N/A (0 rows)"
-                            console_line_3 = "(High): N/A"
-                        else:
-                            rate_high = match_high / total_high
-                            report_line_3 = f"  - High Only Events: Match Rate: {rate_high:.2%} ({match_high}/{total_high} rows)"
-                            console_line_3 = f"(High): {rate_high:.2%}"
-
-                        # --- Write to File ---
-                        f_report.write(f"(Based on {total_all} non-empty windows)\n")
-                        f_report.write(report_line_1 + "\n")
-                        f_report.write(report_line_2 + "\n")
-                        f_report.write(report_line_3 + "\n")
-                        
-                        # --- Print to Console (Now Safe) ---
-                        tqdm.write(f"  -> Result: {console_line_1} | {console_line_2} | {console_line_3}")
-
-                    f_report.write("="*60 + "\n\n")
-                    f_report.flush() # Ensure real-time writing to file
+            for scenario, counts in results:
+                write_scenario_report(f_report, scenario_label(scenario, GRID_AXES), counts)
+        df_cube.to_csv(cube_csv_path, index=False)
 
     except Exception as e:
         print(f"\n❌❌❌ Critical Error Occurred: {e}")
@@ -369,5 +701,6 @@ if __name__ == "__main__":
 
     print("\n" + "="*80)
     print("✨✨✨ All Automated Experiments Completed! ✨✨✨")
-    print(f"{len(INPUT_WINDOWS_MIN) * len(OUTPUT_WINDOWS_MIN)} CSV files saved to: {OUTPUT_DIR}")
-    print(f"Summary report saved to: {report_txt_path}")
\ No newline at end of file
+    print(f"{n_scenarios} CSV files saved to: {OUTPUT_DIR}")
+    print(f"Summary report saved to: {report_txt_path}")
+    print(f"Threshold cube saved to: {cube_csv_path}")
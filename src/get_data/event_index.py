@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ Prefix-Sum Sentiment Count Index over the Event Timeline
+=============================================================================
+ Purpose:
+ 1. Build, once, cumulative counts per (sentiment, impact) over the time-sorted
+    events returned by ana_match_rates.load_events:
+        cum[i, s, m] = number of events among the first i with sentiment s and impact m
+ 2. Answer "how many <impact> <sentiment> events in [t0, t1)" for ANY window with two
+    binary searches and one subtraction (O(log n)), for scalars or arrays of windows.
+ 3. Answer the V10 majority sentiment of any window (All / Med+High / High Only) with
+    the same rules as get_majority_sentiment: first-seen sentiment wins a count tie,
+    bullish == bearish -> 'consolidation', empty subset -> pd.NA.
+
+ Usage:
+    index = EventCountIndex(df_events)
+    index.count('2025-03-01', '2025-03-02', sentiment='bullish', impact='High')
+    index.majority('2025-03-01 12:00', '2025-03-01 14:00', level='medhigh')
+=============================================================================
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from ohlcv_index import to_ns
+
+# --- 1. Global Configuration ---
+
+LEVEL_IMPACTS = {
+    'all': None,                 # every impact
+    'medhigh': ['Medium', 'High'],
+    'high': ['High'],
+}
+
+# --- 2. Index ---
+
+class EventCountIndex:
+    """
+    Cumulative (sentiment, impact) counts over sorted event timestamps.
+    """
+    def __init__(self, df_events):
+        if df_events.empty:
+            raise ValueError("EventCountIndex needs at least one event")
+        times = to_ns(df_events.index)
+        order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        self.n_events = len(self.times)
+
+        sentiment_codes, self.sentiments = pd.factorize(df_events['sentiment'].to_numpy()[order])
+        impact_codes, self.impacts = pd.factorize(df_events['impact'].to_numpy()[order])
+        self.sentiments, self.impacts = list(self.sentiments), list(self.impacts)
+        n_sent, n_imp = len(self.sentiments), len(self.impacts)
+
+        one_hot = np.zeros((self.n_events, n_sent, n_imp), dtype=np.int32)
+        one_hot[np.arange(self.n_events), sentiment_codes, impact_codes] = 1
+        self.cum = np.zeros((self.n_events + 1, n_sent, n_imp), dtype=np.int32)
+        np.cumsum(one_hot, axis=0, out=self.cum[1:])
+
+        # next_seen[level][i, s]: position of the first event at or after i with sentiment s
+        # (and an impact in the level); n_events if there is none. Used for tie-breaks.
+        self.next_seen = {}
+        positions = np.arange(self.n_events)
+        for level in LEVEL_IMPACTS:
+            in_level = self._level_impact_mask(level)[impact_codes]
+            nxt = np.full((self.n_events + 1, n_sent), self.n_events, dtype=np.int64)
+            for s in range(n_sent):
+                pos = np.where((sentiment_codes == s) & in_level, positions, self.n_events)
+                nxt[:-1, s] = np.minimum.accumulate(pos[::-1])[::-1]
+            self.next_seen[level] = nxt
+
+    def _level_impact_mask(self, level):
+        if level not in LEVEL_IMPACTS:
+            raise ValueError(f"Unknown level {level!r}, expected one of {list(LEVEL_IMPACTS)}")
+        wanted = LEVEL_IMPACTS[level]
+        return np.array([wanted is None or imp in wanted for imp in self.impacts], dtype=bool)
+
+    def bounds(self, t0, t1):
+        """
+        Event positions [lo, hi) covering the half-open window [t0, t1).
+        """
+        lo = np.searchsorted(self.times, to_ns(t0), side='left')
+        hi = np.searchsorted(self.times, to_ns(t1), side='left')
+        return lo, np.maximum(hi, lo)
+
+    def count_matrix(self, t0, t1):
+        """
+        (sentiment, impact) counts of each window: shape (..., n_sentiments, n_impacts).
+        """
+        lo, hi = self.bounds(t0, t1)
+        return self.cum[hi] - self.cum[lo]
+
+    def count(self, t0, t1, sentiment=None, impact=None, level=None):
+        """
+        Number of events in [t0, t1), optionally restricted to one sentiment and to one
+        impact (or an impact `level`: 'all' / 'medhigh' / 'high'). Works on arrays of windows.
+        """
+        counts = self.count_matrix(t0, t1)
+        if sentiment is not None:
+            if sentiment not in self.sentiments:
+                return np.zeros(counts.shape[:-2], dtype=np.int64)[()]
+            counts = counts[..., [self.sentiments.index(sentiment)], :]
+        if impact is not None:
+            if impact not in self.impacts:
+                return np.zeros(counts.shape[:-2], dtype=np.int64)[()]
+            counts = counts[..., [self.impacts.index(impact)]]
+        elif level is not None:
+            counts = counts[..., self._level_impact_mask(level)]
+        return counts.sum(axis=(-2, -1))[()]
+
+    def count_table(self, t0, t1):
+        """
+        Sentiment x impact count table of a single window.
+        """
+        return pd.DataFrame(self.count_matrix(t0, t1), index=self.sentiments, columns=self.impacts)
+
+    def majority(self, t0, t1, level='all'):
+        """
+        V10 majority sentiment of each window for one impact level.
+        """
+        lo, hi = self.bounds(t0, t1)
+        counts = (self.cum[hi] - self.cum[lo])[..., self._level_impact_mask(level)].sum(axis=-1)
+        first_seen = self.next_seen[level][lo]
+        first_seen = np.where(first_seen < np.expand_dims(hi, -1), first_seen, self.n_events)
+
+        max_counts = counts.max(axis=-1, initial=0)
+        candidates = counts == np.expand_dims(max_counts, -1)
+        winner = np.argmin(np.where(candidates, first_seen, self.n_events + 1), axis=-1)
+
+        majority = np.array(np.asarray(self.sentiments, dtype=object)[winner], dtype=object, ndmin=1)
+        bullish = counts[..., self.sentiments.index('bullish')] if 'bullish' in self.sentiments else np.zeros_like(max_counts)
+        bearish = counts[..., self.sentiments.index('bearish')] if 'bearish' in self.sentiments else np.zeros_like(max_counts)
+        tie = np.atleast_1d((bullish > 0) & (bullish == bearish))
+        empty = np.atleast_1d(max_counts == 0)
+        majority[tie] = 'consolidation'
+        majority[empty] = pd.NA
+        return majority[0] if np.ndim(lo) == 0 else majority
+
+# --- 3. Main Execution Logic ---
+if __name__ == "__main__":
+    from ana_match_rates import EVENTS_BASE_DIR, EVENT_DIRS_TO_SCAN, load_events
+
+    if len(sys.argv) != 3:
+        print("Usage: python event_index.py <t0> <t1>   (e.g. '2025-03-01 12:00' '2025-03-01 14:00')")
+        sys.exit()
+
+    t0, t1 = pd.Timestamp(sys.argv[1]), pd.Timestamp(sys.argv[2])
+    index = EventCountIndex(load_events(EVENTS_BASE_DIR, EVENT_DIRS_TO_SCAN))
+    print(f"\nEvents in [{t0}, {t1}):")
+    print(index.count_table(t0, t1))
+    for level in LEVEL_IMPACTS:
+        print(f"  - Majority ({level}): {index.majority(t0, t1, level)}")
@@ -1,14 +1,38 @@
+import os
+import shutil
 import requests
 import pandas as pd
 import time
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ohlcv_store import load_arrays
 
 
 # ========================
 INTERVAL = "5m"       
 LIMIT = 1000         
-SLEEP_TIME = 8        
+MAX_WORKERS = 8            # concurrent page requests across all symbols
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 10
+INCREMENTAL = False        # True: extend existing CSVs up to end_date instead of re-downloading
 
+# Binance REQUEST_WEIGHT budget (per IP, per minute); klines cost 2 per call for limit <= 1000
+WEIGHT_LIMIT_PER_MIN = 6000
+WEIGHT_SAFETY = 0.8        # only spend 80% of the budget, other tools share the IP
+KLINES_WEIGHT = 2
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000,
+}
+
+KLINE_COLUMNS = [
+    "open_time", "open", "high", "low", "close", "volume",
+    "close_time", "quote_asset_volume", "number_of_trades",
+    "taker_buy_base_volume", "taker_buy_quote_volume", "ignore"
+]
 
 # ========================
 tokens = [
@@ -125,61 +149,269 @@ start_date = datetime.strptime("2025-08-24 14:00:00", "%Y-%m-%d %H:%M:%S")
 end_date   = datetime.strptime("2025-09-05 23:59:59", "%Y-%m-%d %H:%M:%S")
 
 # ========================
-def get_klines(symbol, interval, start_time, end_time):
-    all_data = []
-    while True:
-        params = {
-            "symbol": symbol,
-            "interval": interval,
-            "startTime": int(start_time.timestamp() * 1000),
-            "endTime": int(end_time.timestamp() * 1000),
-            "limit": LIMIT
-        }
+def to_ms(dt):
+    """
+    Naive datetimes are treated as UTC, matching the naive-UTC `open_time` written to the CSVs.
+    """
+    return int(pd.Timestamp(dt).value // 1_000_000)
+
+
+class WeightLimiter:
+    """
+    Token bucket shared by all download threads.
+    Tokens are Binance request weight, refilled continuously at the per-minute budget.
+    The bucket is re-synced from the X-MBX-USED-WEIGHT-1M header, and a 429/418
+    pauses every thread until the server's Retry-After has elapsed.
+    """
+    def __init__(self, limit_per_min=WEIGHT_LIMIT_PER_MIN, safety=WEIGHT_SAFETY):
+        self.capacity = limit_per_min * safety
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, weight):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = max(self.paused_until - now, (weight - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def observe(self, used_weight):
+        """
+        Never believe we have more weight left than the server says we do.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def pause(self, seconds):
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.0
+            self.updated = now
+
+
+_thread_local = threading.local()
+
+def _get_session():
+    if not hasattr(_thread_local, "session"):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+
+def fetch_page(symbol, interval, start_ms, end_ms, limiter, base_url=BASE_URL):
+    """
+    Fetch one page of klines ([start_ms, end_ms], at most LIMIT bars) with retries.
+    """
+    params = {
+        "symbol": symbol,
+        "interval": interval,
+        "startTime": start_ms,
+        "endTime": end_ms,
+        "limit": LIMIT
+    }
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire(KLINES_WEIGHT)
         try:
-            resp = requests.get(BASE_URL, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception as e:
-            print(f"⚠️ error")
-            break
+            resp = _get_session().get(base_url, params=params, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"⚠️ {symbol} request error ({e}), retry {attempt + 1}/{MAX_RETRIES}")
+            time.sleep(2 ** attempt)
+            continue
 
-        if not data:
-            break
+        used = resp.headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            limiter.observe(int(used))
 
-        all_data.extend(data)
+        if resp.status_code in (429, 418):
+            # 429: over the limit; 418: IP auto-banned for ignoring 429s. Both carry Retry-After.
+            retry_after = float(resp.headers.get("Retry-After", 2 ** (attempt + 1)))
+            print(f"⏸️ {symbol} got HTTP {resp.status_code}, pausing all requests for {retry_after:.0f}s")
+            limiter.pause(retry_after)
+            continue
+        if resp.status_code >= 500:
+            print(f"⚠️ {symbol} got HTTP {resp.status_code}, retry {attempt + 1}/{MAX_RETRIES}")
+            time.sleep(2 ** attempt)
+            continue
 
-        last_time = datetime.fromtimestamp(data[-1][0] / 1000)
-        if last_time >= end_time or len(data) < LIMIT:
-            break
-        start_time = last_time + timedelta(milliseconds=1)
+        resp.raise_for_status()
+        return resp.json()
 
-        time.sleep(0.2)  
+    raise RuntimeError(f"{symbol}: page {start_ms}-{end_ms} failed after {MAX_RETRIES} attempts")
 
-    return all_data
 
+def split_pages(start_ms, end_ms, interval_ms, limit=LIMIT):
+    """
+    Split [start_ms, end_ms] into independent page windows of at most `limit` bars each.
+    """
+    span = interval_ms * limit
+    return [(s, min(s + span - 1, end_ms)) for s in range(start_ms, end_ms + 1, span)]
 
-# ========================
-for token in tokens:
-    name, symbol, _ = token 
-    print(f"🔄 getting data of {name} ({symbol}) ...")
 
-    data = get_klines(symbol, INTERVAL, start_date, end_date)
+def get_klines(symbol, interval, start_time, end_time, limiter=None, executor=None, base_url=BASE_URL):
+    """
+    Download all klines of one symbol; pages are fetched concurrently.
+    """
+    limiter = limiter or WeightLimiter()
+    pages = split_pages(to_ms(start_time), to_ms(end_time), INTERVAL_MS[interval])
+    own_executor = executor is None
+    executor = executor or ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        futures = [executor.submit(fetch_page, symbol, interval, s, e, limiter, base_url) for s, e in pages]
+        pages_data = [f.result() for f in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return merge_pages(pages_data)
+
 
-    if not data:
-        print(f"❌ {name} ({symbol}) has no data")
-        continue
+def merge_pages(pages_data):
+    """
+    Concatenate pages in time order, dropping duplicate open_times at page boundaries.
+    """
+    rows = {}
+    for page in pages_data:
+        for k in page:
+            rows[k[0]] = k
+    return [rows[t] for t in sorted(rows)]
 
-    df = pd.DataFrame(data, columns=[
-        "open_time", "open", "high", "low", "close", "volume",
-        "close_time", "quote_asset_volume", "number_of_trades",
-        "taker_buy_base_volume", "taker_buy_quote_volume", "ignore"
-    ])
+
+def klines_to_frame(data):
+    df = pd.DataFrame(data, columns=KLINE_COLUMNS)
     df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
     df["close_time"] = pd.to_datetime(df["close_time"], unit="ms")
-    df = df[["open_time", "open", "high", "low", "close", "volume"]]
+    return df[["open_time", "open", "high", "low", "close", "volume"]]
+
 
-    filename = f"{name}_{symbol}_{INTERVAL}.csv"
-    df.to_csv(filename, index=False)
-    print(f"✅ save {filename} ({len(df)} rows)")
+def read_last_open_time(csv_path):
+    """
+    Last open_time (epoch ms) of an existing CSV, read from its columnar store.
+    """
+    open_time = load_arrays(csv_path, columns=["open_time"])["open_time"]
+    if len(open_time) == 0:
+        return None
+    return int(open_time[-1] // 1_000_000)
 
-    time.sleep(SLEEP_TIME)  
+
+def drop_unclosed_bars(data, now_ms=None):
+    """
+    Remove bars whose close_time is still in the future; they would be frozen half-built.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return [k for k in data if k[6] < now_ms]
+
+
+def append_rows_atomic(csv_path, df):
+    """
+    Append rows to a CSV without ever exposing a partially written file:
+    copy -> append -> fsync -> os.replace.
+    """
+    tmp_path = f"{csv_path}.tmp-{os.getpid()}"
+    shutil.copyfile(csv_path, tmp_path)
+    try:
+        with open(tmp_path, "a", newline="") as f:
+            df.to_csv(f, header=False, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def download_tokens(token_list, interval, start_time, end_time, out_dir=".", max_workers=MAX_WORKERS,
+                    base_url=BASE_URL, incremental=False):
+    """
+    Fetch every (symbol, page) of every token through one thread pool and one
+    shared weight limiter; each CSV is written as soon as its symbol completes.
+
+    incremental=True: for tokens whose CSV already exists, only bars after its last
+    open_time are fetched and appended (overlapping boundary bars are de-duplicated).
+
+    A token with any failed page is not written (its file is left unchanged), since the
+    CSV would otherwise carry a silent gap; after all tokens are done a RuntimeError
+    lists the failed ones.
+    """
+    limiter = WeightLimiter()
+    interval_ms = INTERVAL_MS[interval]
+    end_ms = to_ms(end_time)
+    plans, results = {}, {}
+    failed_tokens = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for name, symbol, _ in token_list:
+            filename = os.path.join(out_dir, f"{name}_{symbol}_{interval}.csv")
+            last_ms = read_last_open_time(filename) if incremental and os.path.isfile(filename) else None
+            # Start at the last stored bar (not after it) so the boundary page overlaps instead of gaps
+            start_ms = to_ms(start_time) if last_ms is None else last_ms
+            pages = split_pages(start_ms, end_ms, interval_ms) if start_ms + interval_ms <= end_ms else []
+            if last_ms is not None and not pages:
+                print(f"✨ {name} ({symbol}) is already up to date")
+                continue
+
+            plans[symbol] = {"name": name, "filename": filename, "last_ms": last_ms, "remaining": len(pages), "failed": False}
+            results[symbol] = [None] * len(pages)
+            for i, (s, e) in enumerate(pages):
+                fut = executor.submit(fetch_page, symbol, interval, s, e, limiter, base_url)
+                futures[fut] = (symbol, i)
+
+        for fut in as_completed(futures):
+            symbol, i = futures[fut]
+            plan = plans[symbol]
+            try:
+                results[symbol][i] = fut.result()
+            except Exception as e:
+                print(f"⚠️ {plan['name']} ({symbol}) page {i} failed: {e}")
+                results[symbol][i] = []
+                plan["failed"] = True
+            plan["remaining"] -= 1
+            if plan["remaining"] > 0:
+                continue
+
+            name, filename, last_ms = plan["name"], plan["filename"], plan["last_ms"]
+            if plan["failed"]:
+                # Writing around a missing page would leave a permanent hole in the history
+                results.pop(symbol)
+                failed_tokens.append(f"{name} ({symbol})")
+                print(f"❌ {name} ({symbol}) has failed pages, file left unchanged")
+                continue
+            data = drop_unclosed_bars(merge_pages(results.pop(symbol)))
+
+            if last_ms is not None:
+                data = [k for k in data if k[0] > last_ms]
+                if not data:
+                    print(f"✨ {name} ({symbol}) has no new closed bars")
+                    continue
+                df = klines_to_frame(data)
+                append_rows_atomic(filename, df)
+                print(f"✅ append {filename} (+{len(df)} rows)")
+                continue
+
+            if not data:
+                print(f"❌ {name} ({symbol}) has no data")
+                continue
+            df = klines_to_frame(data)
+            df.to_csv(filename, index=False)
+            print(f"✅ save {filename} ({len(df)} rows)")
+
+    if failed_tokens:
+        raise RuntimeError(f"{len(failed_tokens)} token(s) failed and were not written: {', '.join(failed_tokens)}")
+
+
+# ========================
+if __name__ == "__main__":
+    print(f"🔄 getting data of {len(tokens)} tokens with {MAX_WORKERS} workers (incremental={INCREMENTAL}) ...")
+    download_tokens(tokens, INTERVAL, start_date, end_date, incremental=INCREMENTAL)
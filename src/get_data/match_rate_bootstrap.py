@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ Block-Bootstrap Confidence Intervals for V10 Match Rates
+=============================================================================
+ Purpose:
+ 1. Read the per-scenario window CSVs written by ana_match_rates.process_scenario
+    and turn them into per-window match indicators (one array per impact level).
+ 2. Resample each indicator series with a circular moving-block bootstrap
+    (blocks keep the serial dependence between neighbouring windows).
+    Each batch of replicates is ONE matrix operation: block sums come from a
+    prefix sum, so a replicate is a (n_blocks,) gather + row sum, never an
+    (n_replicates x n_windows) copy of the data.
+ 3. Split replicates into fixed, independently seeded chunks (SeedSequence.spawn)
+    and run them across a process pool: results do not depend on the worker count.
+ 4. Save percentile CIs per scenario and impact level to "match_rates_bootstrap_ci.csv".
+=============================================================================
+"""
+
+import os
+import re
+import sys
+import glob
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from ana_match_rates import OUTPUT_DIR, IMPACT_LEVELS, GRID_WORKERS, match_indicators
+
+# --- 1. Global Configuration ---
+
+N_REPLICATES = 5000
+N_CHUNKS = 16            # fixed, so results are reproducible for any worker count
+BLOCK_LENGTH = None      # windows per block; None -> ceil(n ** (1/3))
+CI_LEVEL = 0.95
+SEED = 20250101
+
+SCENARIO_CSV_PATTERN = re.compile(r'input_(\d+)m_output_(\d+)m(.*)\.csv$')
+
+# --- 2. Bootstrap Core ---
+
+def default_block_length(n):
+    return max(1, int(np.ceil(n ** (1 / 3))))
+
+
+def block_bootstrap_rates(indicators, n_replicates, block_length, seed):
+    """
+    Circular moving-block bootstrap of the mean of a 0/1 series.
+    Each replicate concatenates ceil(n / L) blocks with uniform random starts and
+    truncates to n values; the last block therefore contributes only its first
+    n - (n_blocks - 1) * L values.
+    """
+    x = np.asarray(indicators, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        return np.full(n_replicates, np.nan)
+    L = min(block_length, n)
+    n_blocks = -(-n // L)
+    tail = n - (n_blocks - 1) * L
+
+    # Circular prefix sums: sum of x[s : s + k] (wrapping) = cs[s + k] - cs[s]
+    cs = np.concatenate(([0.0], np.cumsum(np.concatenate((x, x[:L])))))
+    full_sums = cs[np.arange(n) + L] - cs[np.arange(n)]
+    tail_sums = cs[np.arange(n) + tail] - cs[np.arange(n)]
+
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, n, size=(n_replicates, n_blocks))
+    totals = full_sums[starts[:, :-1]].sum(axis=1) + tail_sums[starts[:, -1]]
+    return totals / n
+
+
+def _bootstrap_chunk(args):
+    indicators, n_replicates, block_length, seed = args
+    return block_bootstrap_rates(indicators, n_replicates, block_length, seed)
+
+
+def bootstrap_ci(series_by_key, n_replicates=N_REPLICATES, block_length=BLOCK_LENGTH, ci_level=CI_LEVEL,
+                 seed=SEED, n_chunks=N_CHUNKS, max_workers=GRID_WORKERS):
+    """
+    Percentile CIs for many indicator series at once.
+    `series_by_key` maps any hashable key (e.g. (scenario, level)) to a bool/0-1 array.
+    Every (key, chunk) pair is one pool task with its own spawned seed.
+    """
+    keys = list(series_by_key)
+    chunk_sizes = np.diff(np.linspace(0, n_replicates, n_chunks + 1).astype(int))
+    seeds = np.random.SeedSequence(seed).spawn(len(keys) * n_chunks)
+
+    tasks, lengths = [], {}
+    for k, key in enumerate(keys):
+        x = np.asarray(series_by_key[key])
+        lengths[key] = default_block_length(len(x)) if block_length is None else block_length
+        for c, size in enumerate(chunk_sizes):
+            tasks.append((x, int(size), lengths[key], seeds[k * n_chunks + c]))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunks = list(executor.map(_bootstrap_chunk, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))))
+
+    alpha = (1 - ci_level) / 2
+    rows = []
+    for k, key in enumerate(keys):
+        x = np.asarray(series_by_key[key])
+        reps = np.concatenate(chunks[k * n_chunks:(k + 1) * n_chunks])
+        lo, hi = np.nanquantile(reps, [alpha, 1 - alpha]) if len(x) else (np.nan, np.nan)
+        rows.append({
+            'key': key,
+            'n_windows': len(x),
+            'match_rate': x.mean() if len(x) else np.nan,
+            'ci_low': lo,
+            'ci_high': hi,
+            'boot_std': np.nanstd(reps) if len(x) else np.nan,
+            'block_length': lengths[key],
+        })
+    return rows
+
+# --- 3. Scenario Loading ---
+
+def load_scenario_indicators(output_dir):
+    """
+    {(scenario file stem, level): indicators} for every scenario CSV in output_dir.
+    """
+    series = {}
+    for csv_path in sorted(glob.glob(os.path.join(output_dir, 'input_*m_output_*m*.csv'))):
+        name = os.path.basename(csv_path)
+        if not SCENARIO_CSV_PATTERN.match(name):
+            continue
+        indicators = match_indicators(pd.read_csv(csv_path))
+        for level in IMPACT_LEVELS:
+            series[(os.path.splitext(name)[0], level)] = indicators[level]
+    return series
+
+# --- 4. Main Execution Logic ---
+if __name__ == "__main__":
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR
+    series = load_scenario_indicators(output_dir)
+    if not series:
+        print(f"❌ No scenario CSVs found in {output_dir}. Run ana_match_rates.py first.")
+        sys.exit()
+
+    print(f"🚀 Bootstrapping {len(series)} (scenario, level) series x {N_REPLICATES} replicates on {GRID_WORKERS} workers...")
+    rows = bootstrap_ci(series)
+
+    df_ci = pd.DataFrame(rows)
+    df_ci[['scenario', 'level']] = pd.DataFrame(df_ci.pop('key').tolist(), index=df_ci.index)
+    df_ci = df_ci[['scenario', 'level', 'n_windows', 'match_rate', 'ci_low', 'ci_high', 'boot_std', 'block_length']]
+    ci_path = os.path.join(output_dir, "match_rates_bootstrap_ci.csv")
+    df_ci.to_csv(ci_path, index=False)
+
+    for _, r in df_ci.iterrows():
+        print(f"  - {r['scenario']:<28} {r['level']:<8} {r['match_rate']:.2%} "
+              f"[{r['ci_low']:.2%}, {r['ci_high']:.2%}] (n={r['n_windows']})")
+    print(f"\n✨ CI table saved to: {ci_path}")
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ O(1) Timestamp -> Row Index for Fixed-Step OHLCV Bars
+=============================================================================
+ Purpose:
+ 1. Map any bar-aligned timestamp to its row offset by arithmetic:
+        slot = (t - t0) // step,  row = row_of_slot[slot]
+    instead of a label lookup on a DatetimeIndex.
+ 2. Precompute the missing-bar bitmap (`valid`, one flag per slot on the full
+    regular grid) and the previous/next valid slot for "nearest valid bar" queries.
+ 3. Answer window-return queries for whole arrays of windows with gathers,
+    so missing bars become -1 / NaN instead of KeyError exceptions.
+=============================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+# --- 1. Global Configuration ---
+
+DEFAULT_STEP = pd.Timedelta(minutes=5)
+MISSING = -1
+
+# --- 2. Helpers ---
+
+def to_ns(ts):
+    """
+    Convert a Timestamp / datetime / DatetimeIndex / datetime64 array / int ns array to int64 ns.
+    """
+    if isinstance(ts, (int, np.integer)):
+        return np.int64(ts)
+    if isinstance(ts, np.ndarray) and ts.dtype.kind in 'iu':
+        return ts.astype(np.int64, copy=False)
+    if np.ndim(ts) == 0:
+        return np.int64(pd.Timestamp(ts).value)
+    return np.asarray(pd.DatetimeIndex(ts).as_unit('ns').asi8)
+
+# --- 3. Bar Index ---
+
+class BarIndex:
+    """
+    Arithmetic index over a sorted, step-aligned open_time array.
+    """
+    def __init__(self, open_time_ns, step=DEFAULT_STEP):
+        times = np.asarray(open_time_ns, dtype=np.int64)
+        self.step = np.int64(pd.Timedelta(step).value)
+        self.n_rows = len(times)
+        if self.n_rows == 0:
+            raise ValueError("BarIndex needs at least one bar")
+
+        self.t0 = times[0]
+        offsets = times - self.t0
+        if np.any(offsets % self.step) or np.any(np.diff(times) <= 0):
+            raise ValueError("open_time must be strictly increasing and aligned to the bar step")
+
+        slots = offsets // self.step
+        self.n_slots = int(slots[-1]) + 1
+        self.row_of_slot = np.full(self.n_slots, MISSING, dtype=np.int64)
+        self.row_of_slot[slots] = np.arange(self.n_rows)
+
+        # Missing-bar bitmap on the regular grid, and nearest valid slots on either side
+        self.valid = self.row_of_slot != MISSING
+        slot_ids = np.arange(self.n_slots)
+        self.prev_valid = np.maximum.accumulate(np.where(self.valid, slot_ids, MISSING))
+        self.next_valid = np.minimum.accumulate(np.where(self.valid, slot_ids, self.n_slots)[::-1])[::-1]
+
+    @classmethod
+    def from_frame(cls, df, step=DEFAULT_STEP):
+        """
+        Build from a frame indexed by open_time (e.g. load_price_data / load_ohlcv).
+        """
+        return cls(to_ns(df.index), step)
+
+    @property
+    def n_missing(self):
+        return int(self.n_slots - self.n_rows)
+
+    def slots(self, ts):
+        """
+        Slot number of each timestamp, or MISSING if off-grid or outside the covered range.
+        """
+        offsets = to_ns(ts) - self.t0
+        slots = offsets // self.step
+        ok = (offsets % self.step == 0) & (slots >= 0) & (slots < self.n_slots)
+        return np.where(ok, slots, MISSING)
+
+    def rows(self, ts):
+        """
+        Row offset of each timestamp, or MISSING if there is no bar at exactly that time.
+        """
+        slots = self.slots(ts)
+        return np.where(slots == MISSING, MISSING, self.row_of_slot[np.maximum(slots, 0)])
+
+    def nearest_rows(self, ts, direction='backward'):
+        """
+        Row of the nearest valid bar at or before ('backward') / at or after ('forward') each
+        timestamp; 'nearest' picks the closer of the two (ties go backward).
+        Timestamps need not be grid-aligned. MISSING if no such bar exists.
+        """
+        ts_ns = to_ns(ts)
+        offsets = ts_ns - self.t0
+        floor_slot = np.clip(offsets // self.step, -1, self.n_slots)
+        ceil_slot = np.clip(-(-offsets // self.step), -1, self.n_slots)
+
+        back = np.where(floor_slot >= self.n_slots, self.prev_valid[-1],
+                        np.where(floor_slot < 0, MISSING, self.prev_valid[np.clip(floor_slot, 0, self.n_slots - 1)]))
+        fwd = np.where(ceil_slot < 0, self.next_valid[0],
+                       np.where(ceil_slot >= self.n_slots, self.n_slots, self.next_valid[np.clip(ceil_slot, 0, self.n_slots - 1)]))
+        fwd = np.where(fwd >= self.n_slots, MISSING, fwd)
+
+        if direction == 'backward':
+            slots = back
+        elif direction == 'forward':
+            slots = fwd
+        elif direction == 'nearest':
+            d_back = np.where(back == MISSING, np.iinfo(np.int64).max, offsets - back * self.step)
+            d_fwd = np.where(fwd == MISSING, np.iinfo(np.int64).max, fwd * self.step - offsets)
+            slots = np.where(d_fwd < d_back, fwd, back)
+        else:
+            raise ValueError(f"Unknown direction {direction!r}")
+        return np.where(slots == MISSING, MISSING, self.row_of_slot[np.maximum(slots, 0)])
+
+    def window_pct_change(self, open_, close, window_starts, window_ends):
+        """
+        Percent change from the open of the bar at `window_starts` to the close of the
+        last bar of the window (the bar starting at `window_ends - step`), for many windows.
+        Returns (pct_change, ok): `ok` is False where either bar is missing (pct is NaN there).
+        A zero start price has no percent change either: pct is NaN with ok True, which
+        classifiers must map to 'consolidation' whatever the threshold (as get_price_trend does).
+        """
+        start_rows = self.rows(window_starts)
+        end_rows = self.rows(to_ns(window_ends) - self.step)
+        ok = (start_rows != MISSING) & (end_rows != MISSING)
+
+        p_start = np.where(ok, np.asarray(open_)[np.maximum(start_rows, 0)], np.nan)
+        p_end = np.where(ok, np.asarray(close)[np.maximum(end_rows, 0)], np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(p_start == 0, np.nan, ((p_end - p_start) / p_start) * 100)
+        return pct, ok
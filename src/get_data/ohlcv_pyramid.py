@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ Multi-Resolution OHLCV Pyramid (5m -> 15m / 1h / 4h / 1d)
+=============================================================================
+ Purpose:
+ 1. Aggregate the 5m columnar store (see ohlcv_store.py) into coarser bars once:
+    open = first, high = max, low = min, close = last, volume = sum,
+    plus `n_bars` (number of 5m bars in the bucket, to spot partial buckets).
+ 2. Persist every level next to the base store:
+        dataset/ohlcv/_store/<csv stem>/1h/open_time.npy ... /n_bars.npy /meta.json
+ 3. Serve any resolution slice [start, end) from mmap'd arrays without recomputing.
+    A level is rebuilt automatically when the base store was rebuilt from a newer CSV.
+
+ Buckets are left-closed and labelled by their start, aligned to the epoch
+ (same as pandas resample(..., label='left', closed='left') for these intervals).
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+from ohlcv_store import OHLCV_DIR, TIME_COLUMN, PRICE_COLUMNS, ensure_store, read_meta, load_arrays, load_columns, retry_on_swap
+
+# --- 1. Global Configuration ---
+
+BASE_RESOLUTION = '5m'
+RESOLUTIONS_MIN = {'15m': 15, '1h': 60, '4h': 240, '1d': 1440}
+PYRAMID_VERSION = 1
+
+# --- 2. Aggregation ---
+
+def aggregate_ohlcv(arrays, minutes):
+    """
+    Aggregate sorted 5m arrays into `minutes`-wide buckets in one vectorized pass.
+    """
+    times = np.asarray(arrays[TIME_COLUMN])
+    if len(times) == 0:
+        empty = {col: np.asarray(arrays[col])[:0] for col in [TIME_COLUMN] + PRICE_COLUMNS}
+        empty['n_bars'] = np.zeros(0, dtype=np.int32)
+        return empty
+
+    width = np.int64(minutes) * 60 * 1_000_000_000
+    bucket = times - times % width
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(times)]
+
+    return {
+        TIME_COLUMN: bucket[starts],
+        'open': np.asarray(arrays['open'])[starts],
+        'high': np.maximum.reduceat(np.asarray(arrays['high']), starts),
+        'low': np.minimum.reduceat(np.asarray(arrays['low']), starts),
+        'close': np.asarray(arrays['close'])[ends - 1],
+        'volume': np.add.reduceat(np.asarray(arrays['volume']), starts),
+        'n_bars': (ends - starts).astype(np.int32),
+    }
+
+# --- 3. Build & Freshness ---
+
+def get_level_dir(store_dir, resolution):
+    return os.path.join(store_dir, resolution)
+
+
+def is_level_fresh(store_dir, resolution):
+    base_meta = read_meta(store_dir)
+    level_meta = read_meta(get_level_dir(store_dir, resolution))
+    if base_meta is None or level_meta is None:
+        return False
+    return (level_meta.get('version') == PYRAMID_VERSION
+            and level_meta.get('base_source_mtime_ns') == base_meta.get('source_mtime_ns')
+            and level_meta.get('base_rows') == base_meta.get('rows'))
+
+
+def build_pyramid(csv_path, resolutions=None, store_root=None):
+    """
+    (Re)build the requested pyramid levels for one asset from its base store.
+    """
+    resolutions = list(RESOLUTIONS_MIN) if resolutions is None else list(resolutions)
+    store_dir = ensure_store(csv_path, store_root)
+    base_meta = read_meta(store_dir)
+    base = load_arrays(csv_path, store_root=store_root)
+
+    for resolution in resolutions:
+        level = aggregate_ohlcv(base, RESOLUTIONS_MIN[resolution])
+        level_dir = get_level_dir(store_dir, resolution)
+        tmp_dir = f"{level_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for col, values in level.items():
+            np.save(os.path.join(tmp_dir, f'{col}.npy'), np.ascontiguousarray(values))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': PYRAMID_VERSION,
+                'resolution': resolution,
+                'minutes': RESOLUTIONS_MIN[resolution],
+                'rows': int(len(level[TIME_COLUMN])),
+                'base_rows': base_meta['rows'],
+                'base_source_mtime_ns': base_meta['source_mtime_ns'],
+            }, f, indent=2)
+        shutil.rmtree(level_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, level_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return store_dir
+
+# --- 4. Loader API ---
+
+def load_resolution_arrays(csv_path, resolution, start=None, end=None, store_root=None):
+    """
+    Return {column: ndarray} for `resolution` restricted to open_time in [start, end).
+    '5m' is served straight from the base store (without `n_bars`).
+    """
+    if resolution == BASE_RESOLUTION:
+        arrays = load_arrays(csv_path, store_root=store_root)
+    else:
+        if resolution not in RESOLUTIONS_MIN:
+            raise ValueError(f"Unknown resolution {resolution!r}, expected one of {[BASE_RESOLUTION] + list(RESOLUTIONS_MIN)}")
+        store_dir = ensure_store(csv_path, store_root)
+        if not is_level_fresh(store_dir, resolution):
+            build_pyramid(csv_path, [resolution], store_root)
+        level_dir = get_level_dir(store_dir, resolution)
+        arrays = retry_on_swap(lambda: load_columns(level_dir, [TIME_COLUMN] + PRICE_COLUMNS + ['n_bars']))
+
+    if start is None and end is None:
+        return arrays
+    times = arrays[TIME_COLUMN]
+    lo = 0 if start is None else int(np.searchsorted(times, pd.Timestamp(start).value, side='left'))
+    hi = len(times) if end is None else int(np.searchsorted(times, pd.Timestamp(end).value, side='left'))
+    return {col: values[lo:hi] for col, values in arrays.items()}
+
+
+def load_resolution(csv_path, resolution, start=None, end=None, store_root=None):
+    """
+    Same as load_resolution_arrays, as a DataFrame indexed by `open_time`.
+    """
+    arrays = load_resolution_arrays(csv_path, resolution, start, end, store_root)
+    index = pd.DatetimeIndex(np.asarray(arrays[TIME_COLUMN]).view('datetime64[ns]'), name=TIME_COLUMN)
+    return pd.DataFrame({col: values for col, values in arrays.items() if col != TIME_COLUMN}, index=index, copy=False)
+
+# --- 5. Main Execution Logic ---
+if __name__ == "__main__":
+    ohlcv_dir = sys.argv[1] if len(sys.argv) > 1 else OHLCV_DIR
+    csv_files = sorted(glob.glob(os.path.join(ohlcv_dir, '*_5m.csv')))
+    if not csv_files:
+        print(f"❌ No *_5m.csv files found in {ohlcv_dir}")
+        sys.exit()
+
+    for csv_path in csv_files:
+        store_dir = build_pyramid(csv_path)
+        sizes = ", ".join(f"{r}={read_meta(get_level_dir(store_dir, r))['rows']}" for r in RESOLUTIONS_MIN)
+        print(f"✅ {os.path.basename(csv_path)}: {sizes}")
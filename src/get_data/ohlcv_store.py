@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ Columnar OHLCV Store (Memory-Mapped Binary Cache for *_5m.csv)
+=============================================================================
+ Purpose:
+ 1. Convert each asset's 5m OHLCV CSV into a binary columnar store:
+    one raw .npy file per column (int64 epoch-ns `open_time`, float OHLCV),
+    plus a small `meta.json` describing the source CSV.
+ 2. Load the store with np.load(mmap_mode='r'), so a run pays for page faults
+    instead of pd.read_csv + pd.to_datetime on 45k text rows.
+ 3. Rebuild the store automatically when the source CSV changes
+    (mtime or size differs from the values recorded in meta.json).
+
+ Layout (next to the CSV):
+    dataset/ohlcv/_store/<csv stem>/open_time.npy
+                                   /open.npy ... /volume.npy
+                                   /meta.json
+=============================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+
+# --- 1. Global Configuration ---
+
+OHLCV_DIR = r'dataset/ohlcv'
+STORE_DIRNAME = '_store'
+STORE_VERSION = 1
+
+TIME_COLUMN = 'open_time'
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+# float64 keeps the CSV values bit-exact; float32 halves the footprint for sweeps
+PRICE_DTYPE = 'float64'
+
+# A rebuild swaps the store directory in with two renames, so it is briefly missing;
+# readers retry for up to SWAP_RETRIES * SWAP_RETRY_DELAY seconds (retry_on_swap is also
+# used by the pyramid levels and by src/method's artifacts and prediction tensor)
+SWAP_RETRIES = 50
+SWAP_RETRY_DELAY = 0.02
+
+# --- 2. Store Paths & Metadata ---
+
+def get_store_dir(csv_path, store_root=None):
+    """
+    Return the store directory for a CSV (default: <csv dir>/_store/<csv stem>).
+    """
+    if store_root is None:
+        store_root = os.path.join(os.path.dirname(os.path.abspath(csv_path)), STORE_DIRNAME)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(store_root, stem)
+
+
+def read_meta(store_dir):
+    """
+    Read meta.json of a store, or None if the store does not exist / is broken.
+    """
+    try:
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def is_store_fresh(csv_path, store_dir):
+    """
+    A store is fresh if it was built from exactly this version of the CSV.
+    """
+    meta = read_meta(store_dir)
+    if meta is None or meta.get('version') != STORE_VERSION:
+        return False
+    st = os.stat(csv_path)
+    return meta.get('source_mtime_ns') == st.st_mtime_ns and meta.get('source_size') == st.st_size
+
+
+def retry_on_swap(load, retries=SWAP_RETRIES, delay=SWAP_RETRY_DELAY):
+    """
+    Call load(), retrying on FileNotFoundError while a concurrent rebuild swaps a
+    directory in (store, pyramid level, artifact, ...). The last error is re-raised.
+    """
+    for attempt in range(retries):
+        try:
+            return load()
+        except FileNotFoundError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(delay)
+
+
+def load_columns(store_dir, columns, mmap_mode='r'):
+    """
+    {column: ndarray} of one store directory, all from the same build
+    (raises FileNotFoundError if the directory was swapped while loading).
+    """
+    meta = read_meta(store_dir)
+    arrays = {col: np.load(os.path.join(store_dir, f'{col}.npy'), mmap_mode=mmap_mode) for col in columns}
+    if meta is None or read_meta(store_dir) != meta:
+        raise FileNotFoundError(f"{store_dir} was replaced while loading")
+    return arrays
+
+# --- 3. Converter ---
+
+def build_store(csv_path, store_root=None, price_dtype=PRICE_DTYPE):
+    """
+    Parse the CSV once and write the columnar store atomically.
+    The store is first written to a temporary sibling directory and then
+    swapped in, so concurrent readers never see a half-written store.
+    """
+    store_dir = get_store_dir(csv_path, store_root)
+    st = os.stat(csv_path)
+
+    df = pd.read_csv(csv_path, dtype={c: 'float64' for c in PRICE_COLUMNS})
+    times = pd.to_datetime(df[TIME_COLUMN]).values.astype('datetime64[ns]').view('int64')
+    order = np.argsort(times, kind='stable')
+    if not np.all(order == np.arange(len(order))):
+        times = times[order]
+        df = df.iloc[order]
+
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, f'{TIME_COLUMN}.npy'), np.ascontiguousarray(times, dtype=np.int64))
+    for col in PRICE_COLUMNS:
+        values = np.ascontiguousarray(df[col].to_numpy(), dtype=price_dtype)
+        np.save(os.path.join(tmp_dir, f'{col}.npy'), values)
+
+    meta = {
+        'version': STORE_VERSION,
+        'source': os.path.basename(csv_path),
+        'source_mtime_ns': st.st_mtime_ns,
+        'source_size': st.st_size,
+        'rows': int(len(times)),
+        'time_unit': 'ns',
+        'columns': {TIME_COLUMN: 'int64', **{c: str(np.dtype(price_dtype)) for c in PRICE_COLUMNS}},
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the new store in (directories cannot be os.replace'd over non-empty ones)
+    old_dir = f"{store_dir}.old-{os.getpid()}"
+    if os.path.isdir(store_dir):
+        os.rename(store_dir, old_dir)
+    try:
+        os.rename(tmp_dir, store_dir)
+    except OSError:
+        # Another process won the race; its store is built from the same CSV
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return store_dir
+
+
+def ensure_store(csv_path, store_root=None, price_dtype=PRICE_DTYPE):
+    """
+    Return the store directory for a CSV, (re)building it if it is missing or stale.
+    """
+    if not os.path.isfile(csv_path):
+        raise FileNotFoundError(csv_path)
+    store_dir = get_store_dir(csv_path, store_root)
+    if not is_store_fresh(csv_path, store_dir):
+        build_store(csv_path, store_root, price_dtype)
+    return store_dir
+
+# --- 4. Loader API ---
+
+def load_arrays(csv_path, columns=None, mmap=True, store_root=None):
+    """
+    Return {column: ndarray} for the asset. `open_time` is int64 epoch nanoseconds.
+    With mmap=True the arrays are read-only views on the store files.
+    """
+    store_dir = ensure_store(csv_path, store_root)
+    columns = [TIME_COLUMN] + PRICE_COLUMNS if columns is None else list(columns)
+    mmap_mode = 'r' if mmap else None
+    return retry_on_swap(lambda: load_columns(store_dir, columns, mmap_mode))
+
+
+def load_ohlcv(csv_path, columns=None, mmap=True, store_root=None):
+    """
+    Return a DataFrame indexed by `open_time` (same shape as the old
+    read_csv + to_datetime + set_index path) backed by the columnar store.
+    """
+    columns = PRICE_COLUMNS if columns is None else list(columns)
+    arrays = load_arrays(csv_path, [TIME_COLUMN] + columns, mmap=mmap, store_root=store_root)
+    index = pd.DatetimeIndex(np.asarray(arrays[TIME_COLUMN]).view('datetime64[ns]'), name=TIME_COLUMN)
+    return pd.DataFrame({col: arrays[col] for col in columns}, index=index, copy=False)
+
+# --- 5. Main Execution Logic ---
+if __name__ == "__main__":
+    ohlcv_dir = sys.argv[1] if len(sys.argv) > 1 else OHLCV_DIR
+    csv_files = sorted(glob.glob(os.path.join(ohlcv_dir, '*_5m.csv')))
+    if not csv_files:
+        print(f"❌ No *_5m.csv files found in {ohlcv_dir}")
+        sys.exit()
+
+    for csv_path in csv_files:
+        t0 = time.perf_counter()
+        store_dir = build_store(csv_path)
+        t1 = time.perf_counter()
+        df = load_ohlcv(csv_path)
+        t2 = time.perf_counter()
+        print(f"✅ {os.path.basename(csv_path)}: {len(df)} rows | build {t1 - t0:.2f}s | load {(t2 - t1) * 1000:.1f}ms -> {store_dir}")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ Aligned Cross-Asset Price Panel (asset x time x field) in Shared Memory
+=============================================================================
+ Purpose:
+ 1. Load BTC / ETH / SOL / DOGE / TRUMP from their columnar stores once and place
+    them on one common 5m grid (union of all coverage):
+        values[asset, t, field]  (NaN where the asset has no bar)
+        valid[asset, t]          (missing-bar mask)
+ 2. Publish the panel into a single multiprocessing.shared_memory block so that
+    parallel experiment workers attach zero-copy from a small picklable spec,
+    instead of each parsing and aligning its own frames.
+
+ Usage:
+    panel = build_panel()
+    spec = panel.publish()                # parent: owns the block
+    ... pool.submit(worker, spec) ...     # worker: PricePanel.attach(spec)
+    panel.unlink()                        # parent: free the block when done
+=============================================================================
+"""
+
+import os
+import sys
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from ohlcv_store import OHLCV_DIR, TIME_COLUMN, PRICE_COLUMNS, load_arrays
+
+# --- 1. Global Configuration ---
+
+PANEL_ASSETS = {
+    'BTC': '1_Bitcoin(BTC)_BTCUSDT_5m.csv',
+    'ETH': '2_Ethereum(ETH)_ETHUSDT_5m.csv',
+    'SOL': '6_Solana(SOL)_SOLUSDT_5m.csv',
+    'DOGE': '8_Dogecoin(DOGE)_DOGEUSDT_5m.csv',
+    'TRUMP': '89_Official Trump(TRUMP)_TRUMPUSDT_5m.csv',
+}
+PANEL_STEP = pd.Timedelta(minutes=5)
+PANEL_DTYPE = 'float64'
+
+# --- 2. Shared Memory Helpers ---
+
+def _aligned(nbytes, align=64):
+    return (nbytes + align - 1) // align * align
+
+
+def _attach_shm(name):
+    # Pool workers share the publisher's resource tracker, so attaching never
+    # transfers ownership; on 3.13+ skip tracking explicitly.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+# --- 3. Panel ---
+
+class PricePanel:
+    """
+    Dense (asset, time, field) price array on a regular grid, plus a validity mask.
+    """
+    def __init__(self, assets, fields, times, values, valid, shm=None):
+        self.assets = list(assets)
+        self.fields = list(fields)
+        self.times = times          # int64 epoch ns, shape (T,)
+        self.values = values        # shape (A, T, F)
+        self.valid = valid          # bool, shape (A, T)
+        self._shm = shm
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.times.view('datetime64[ns]'), name=TIME_COLUMN)
+
+    def field(self, name):
+        """
+        (asset, time) view of one field, e.g. panel.field('close').
+        """
+        return self.values[:, :, self.fields.index(name)]
+
+    def asset_frame(self, asset, dropna=True):
+        """
+        One asset as a time-indexed frame (copy), optionally restricted to valid bars.
+        """
+        a = self.assets.index(asset)
+        df = pd.DataFrame(self.values[a], index=self.index, columns=self.fields)
+        return df[self.valid[a]] if dropna else df
+
+    # --- Shared memory ---
+
+    def publish(self):
+        """
+        Copy the panel into one shared memory block and return a picklable spec.
+        This panel's arrays are re-pointed at the block, so the caller keeps using it.
+        """
+        if self._shm is not None:
+            raise RuntimeError("Panel is already in shared memory")
+        layout, offset = {}, 0
+        for key in ('times', 'values', 'valid'):
+            arr = getattr(self, key)
+            layout[key] = (offset, arr.shape, arr.dtype.str)
+            offset += _aligned(arr.nbytes)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for key, (off, shape, dtype) in layout.items():
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=off)
+            view[...] = getattr(self, key)
+            setattr(self, key, view)
+        self._shm = shm
+        return {'name': shm.name, 'assets': self.assets, 'fields': self.fields, 'layout': layout}
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Attach to a published panel without copying; arrays are read-only views.
+        """
+        shm = _attach_shm(spec['name'])
+        arrays = {}
+        for key, (off, shape, dtype) in spec['layout'].items():
+            view = np.ndarray(tuple(shape), dtype=dtype, buffer=shm.buf, offset=off)
+            view.flags.writeable = False
+            arrays[key] = view
+        return cls(spec['assets'], spec['fields'], arrays['times'], arrays['values'], arrays['valid'], shm=shm)
+
+    def close(self):
+        """
+        Detach this process from the shared block (views become invalid).
+        """
+        if self._shm is not None:
+            self.times = self.values = self.valid = None
+            self._shm.close()
+
+    def unlink(self):
+        """
+        Close and free the shared block; call once, from the publishing process.
+        """
+        shm = self._shm
+        self.close()
+        if shm is not None:
+            shm.unlink()
+            self._shm = None
+
+# --- 4. Builder ---
+
+def build_panel(assets=None, ohlcv_dir=OHLCV_DIR, fields=None, step=PANEL_STEP, dtype=PANEL_DTYPE):
+    """
+    Load every asset from its columnar store and align all of them on the
+    union 5m grid in one scatter per asset.
+    `assets` maps asset name -> CSV file name (default: PANEL_ASSETS).
+    """
+    assets = PANEL_ASSETS if assets is None else assets
+    fields = PRICE_COLUMNS if fields is None else list(fields)
+    step_ns = np.int64(pd.Timedelta(step).value)
+
+    loaded = {
+        name: load_arrays(os.path.join(ohlcv_dir, filename), [TIME_COLUMN] + fields)
+        for name, filename in assets.items()
+    }
+    non_empty = [a[TIME_COLUMN] for a in loaded.values() if len(a[TIME_COLUMN])]
+    if not non_empty:
+        raise ValueError("No price data found for any panel asset")
+    t_start = min(int(t[0]) for t in non_empty)
+    t_end = max(int(t[-1]) for t in non_empty)
+    times = t_start + step_ns * np.arange((t_end - t_start) // step_ns + 1, dtype=np.int64)
+
+    values = np.full((len(assets), len(times), len(fields)), np.nan, dtype=dtype)
+    valid = np.zeros((len(assets), len(times)), dtype=bool)
+    for a, arrays in enumerate(loaded.values()):
+        offsets = np.asarray(arrays[TIME_COLUMN]) - t_start
+        if np.any(offsets % step_ns):
+            raise ValueError(f"{list(assets)[a]}: open_time is not aligned to the {step} grid")
+        slots = offsets // step_ns
+        valid[a, slots] = True
+        for f, col in enumerate(fields):
+            values[a, slots, f] = arrays[col]
+
+    return PricePanel(list(assets), fields, times, values, valid)
+
+# --- 5. Main Execution Logic ---
+if __name__ == "__main__":
+    panel = build_panel()
+    print(f"🎉 Panel: {len(panel.assets)} assets x {len(panel.times)} bars x {len(panel.fields)} fields "
+          f"({panel.values.nbytes / 1e6:.1f} MB)")
+    for a, asset in enumerate(panel.assets):
+        print(f"  - {asset:<6} valid bars: {int(panel.valid[a].sum())}")
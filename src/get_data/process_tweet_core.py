@@ -1,12 +1,12 @@
 import os
 import json
-import re
 from datetime import datetime
 import time
 import openai  # DeepSeek API uses the openai library
 from tqdm import tqdm # Import tqdm for progress bars
 import sys
 import traceback
+from tweet_blocks import iter_tweets, count_tweet_blocks
 
 # --- 1. Global Configuration ---
 
@@ -89,16 +89,6 @@ Text: "{text.replace('"', '""')}"
 
 # --- 3. Phase 2 Function: AI Analysis (Combined Relevance & Sentiment, Unchanged) ---
 
-def parse_full_tweet_blocks(filepath):
-    """Parses the TXT file and stores each complete tweet block as an independent element in a list."""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except FileNotFoundError: return []
-    tweet_blocks = re.split(r'(\[TWEET START\].*?\[TWEET END\])', content, flags=re.DOTALL)
-    # Return all matched complete blocks
-    return [block.strip() for block in tweet_blocks if '[TWEET START]' in block and block.strip()]
-
 def analyze_relevance_and_sentiment(client, full_tweet_block, theme):
     """
     Uses DeepSeek AI for "Two-in-One" analysis:
@@ -215,25 +205,6 @@ You must provide your final analysis ONLY in one of the two following JSON forma
 
 # --- 4. Core Execution Logic (Modified) ---
 
-# --- [!] New: Helper function to extract timestamp ID from tweet block ---
-def extract_timestamp_from_block(block):
-    """
-    Extracts 'Created At' timestamp from [METADATA] block to use as a unique ID.
-    """
-    # Use re.search to find matches in the 'block' string
-    # r"Created At: (.*?)\n" is a regex:
-    # - "Created At: " : Matches literal string
-    # - (.*?) : Non-greedy capture group
-    #   - . : Matches any character except newline
-    #   - *? : Matches previous character zero or more times, as few as possible
-    # - \n : Matches a newline character
-    match = re.search(r"Created At: (.*?)\n", block)
-    if match:
-        # match.group(0) is the full match (e.g., "Created At: 2025-11-05 18:51:01\n")
-        # match.group(1) is the content of the first group (e.g., "2025-11-05 18:51:01")
-        return match.group(1).strip()
-    return None
-
 def process_target_json(full_json_path, client):
     """
     Executes the full JSON -> TXT -> Cleaned_Analyzed_TXT pipeline for a *SINGLE SPECIFIED* JSON file.
@@ -269,24 +240,21 @@ def process_target_json(full_json_path, client):
     processed_timestamps = set()
     if os.path.exists(final_output_path):
         print(f"   -> 🔎 Found existing analysis file, loading processed tweets...")
-        # Parse the final clean file, not the intermediate one
-        processed_blocks = parse_full_tweet_blocks(final_output_path)
-        for block in processed_blocks:
-            ts = extract_timestamp_from_block(block)
-            if ts:
-                processed_timestamps.add(ts)
+        # Stream the final clean file, not the intermediate one (Created At is the tweet ID)
+        for tweet in iter_tweets(final_output_path):
+            if tweet.created_at:
+                processed_timestamps.add(tweet.created_at)
         print(f"   -> ✅ Loaded {len(processed_timestamps)} previously processed tweets.")
     else:
         print(f"   -> 🆕 No existing analysis file found, creating new file.")
     
-    # --- Load *ALL* tweets to be processed ---
-    print(f"   -> Loading source TXT file: {output_txt_filename}")
-    all_tweet_blocks = parse_full_tweet_blocks(intermediate_txt_path)
-    if not all_tweet_blocks:
+    # --- Count the tweets to be processed (they are streamed from the file below) ---
+    print(f"   -> Scanning source TXT file: {output_txt_filename}")
+    total_tweets_to_check = count_tweet_blocks(intermediate_txt_path)
+    if not total_tweets_to_check:
         print("   -> 🤷‍♂️ No tweets in file, skipping.")
         return # End processing for this file
     
-    total_tweets_to_check = len(all_tweet_blocks)
     print(f"   -> Preparing to check {total_tweets_to_check} tweets (Skipping {len(processed_timestamps)} already processed).")
 
     # Counters
@@ -298,10 +266,11 @@ def process_target_json(full_json_path, client):
         with open(final_output_path, 'a', encoding='utf-8') as outfile:
             
             # Use tqdm to show AI classification progress
-            for block in tqdm(all_tweet_blocks, desc=f"AI Analyzing {json_filename}"):
+            for tweet in tqdm(iter_tweets(intermediate_txt_path), total=total_tweets_to_check, desc=f"AI Analyzing {json_filename}"):
                 
                 # --- [!] Core Modification: Checkpoint Logic ---
-                timestamp = extract_timestamp_from_block(block)
+                block = tweet.block
+                timestamp = tweet.created_at
                 
                 # If no timestamp or timestamp already processed, skip
                 if not timestamp or timestamp in processed_timestamps:
@@ -1,12 +1,12 @@
 import os
 import json
-import re
 from datetime import datetime
 import time
 import openai 
 from tqdm import tqdm 
 import sys
 import traceback
+from tweet_blocks import iter_tweets, count_tweet_blocks
 
 
 ASSET_LIST = [
@@ -185,16 +185,6 @@ Text: "{text.replace('"', '""')}"
 
 # --- 3. Phase 2 Function: AI Analysis (Combined Relevance & Sentiment) ---
 
-def parse_full_tweet_blocks(filepath):
-    """Parses the TXT file and stores each complete tweet block as an independent element in a list."""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except FileNotFoundError: return []
-    tweet_blocks = re.split(r'(\[TWEET START\].*?\[TWEET END\])', content, flags=re.DOTALL)
-    # Return all matched complete blocks
-    return [block.strip() for block in tweet_blocks if '[TWEET START]' in block and block.strip()]
-
 def analyze_relevance_and_sentiment(client, full_tweet_block, theme):
     """
     Uses DeepSeek AI for "Two-in-One" analysis:
@@ -357,15 +347,19 @@ def process_single_asset(asset_name, client):
             output_filename = f"{base_name}_clean{extension}"
             output_path = os.path.join(final_cleaned_folder, output_filename)
             
-            all_tweet_blocks = parse_full_tweet_blocks(input_path)
-            if not all_tweet_blocks:
+            total_tweets = count_tweet_blocks(input_path)
+            if not total_tweets:
                 print(" -> No tweets in file, skipping.")
                 continue
 
-            relevant_tweets_with_analysis = []
+            # Relevant tweets are streamed to a temporary file, swapped in once the file is done
+            tmp_output_path = f"{output_path}.tmp"
+            outfile = None
+            relevant_count = 0
             
             # Use tqdm to show AI classification progress
-            for block in tqdm(all_tweet_blocks, desc=f"AI Analyzing {filename}"):
+            for tweet in tqdm(iter_tweets(input_path), total=total_tweets, desc=f"AI Analyzing {filename}"):
+                block = tweet.block
                 # Call the new "Two-in-One" analysis function
                 analysis_result = analyze_relevance_and_sentiment(client, block, theme)
                 
@@ -387,7 +381,12 @@ def process_single_asset(asset_name, client):
                     
                     # Insert [ANALYZEDATA] block before [TWEET END]
                     modified_block = block.replace("[TWEET END]", analysis_block + "[TWEET END]")
-                    relevant_tweets_with_analysis.append(modified_block)
+                    if outfile is None:
+                        outfile = open(tmp_output_path, 'w', encoding='utf-8')
+                    else:
+                        outfile.write("\n\n")
+                    outfile.write(modified_block)
+                    relevant_count += 1
                 
                 # elif analysis_result and analysis_result.get("relevant") == False:
                     # --- Tweet is irrelevant, discard (do nothing) ---
@@ -400,10 +399,10 @@ def process_single_asset(asset_name, client):
                     pass
 
             # --- Loop finished, save results ---
-            if relevant_tweets_with_analysis:
-                print(f" -> Found {len(relevant_tweets_with_analysis)}/{len(all_tweet_blocks)} relevant tweets.")
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write("\n\n".join(relevant_tweets_with_analysis))
+            if outfile is not None:
+                outfile.close()
+                os.replace(tmp_output_path, output_path)
+                print(f" -> Found {relevant_count}/{total_tweets} relevant tweets.")
                 print(f" -> 🎉 Cleaned file with analysis saved to: {os.path.basename(output_path)}")
             else:
                 print(f" -> 🤷‍♂️ No tweets matching the theme found in file '{filename}'.")
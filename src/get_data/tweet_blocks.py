@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ Streaming Tweet Block Parser (Memory-Mapped [TWEET START] ... [TWEET END])
+=============================================================================
+ Purpose:
+ 1. Scan the tweet TXT files written by process_tweet_core.py / process_tweet_related.py
+    (intermediate and *_clean.txt) over a read-only mmap of the file, one block at a
+    time, so memory stays constant regardless of file size (no full read, no re.split).
+ 2. Parse each block once into a typed TweetRecord: text, author, followers,
+    created_at, views / likes / retweets / replies / quotes and, for analyzed files,
+    label / keyword / reasoning from the [ANALYZEDATA] section.
+
+ Usage:
+    for tweet in iter_tweets(path):        # TweetRecord, tweet.block is the raw block
+        ... tweet.created_at, tweet.likes, tweet.label ...
+    n = count_tweet_blocks(path)           # e.g. for a tqdm total
+=============================================================================
+"""
+
+import os
+import sys
+import mmap
+from datetime import datetime
+
+# --- 1. Global Configuration ---
+
+BLOCK_START = b'[TWEET START]'
+BLOCK_END = b'[TWEET END]'
+METADATA_MARKER = '\n---\n[METADATA]\n'
+ANALYZEDATA_MARKER = '\n---\n[ANALYZEDATA]\n'
+
+# "- <Key>: value" line of a block -> (TweetRecord attribute, converter)
+METADATA_FIELDS = {
+    'Author Username': ('author', str),
+    'Author Followers': ('followers', int),
+    'Created At': ('created_at', datetime.fromisoformat),   # written as '%Y-%m-%d %H:%M:%S'
+    'Views': ('views', int),
+    'Likes': ('likes', int),
+    'Retweets': ('retweets', int),
+    'Replies': ('replies', int),
+    'Quotes': ('quotes', int),
+    'label': ('label', str),
+    'key_word_used': ('keyword', str),
+    'reasoning': ('reasoning', str),
+}
+
+# --- 2. Records ---
+
+class TweetRecord:
+    """
+    One parsed tweet block. Fields missing from the block (or not parseable) are None;
+    `block` keeps the raw block text for prompts and rewriting.
+    """
+    __slots__ = ['block', 'text'] + [attr for attr, _ in METADATA_FIELDS.values()]
+
+    def __init__(self, block, text=None, **fields):
+        self.block = block
+        self.text = text
+        for attr, _ in METADATA_FIELDS.values():
+            setattr(self, attr, fields.get(attr))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'block'}
+
+    def __repr__(self):
+        return f"TweetRecord(author={self.author!r}, created_at={self.created_at}, label={self.label!r})"
+
+
+def parse_tweet_block(block):
+    """
+    Parse one '[TWEET START] ... [TWEET END]' block into a TweetRecord.
+    The text is the quoted `Text:` value with "" unescaped back to ".
+    """
+    body = block[len(BLOCK_START):]
+    if body.endswith(BLOCK_END.decode()):
+        body = body[:-len(BLOCK_END)]
+    meta_pos = body.rfind(METADATA_MARKER)
+    head, meta = (body[:meta_pos], body[meta_pos + len(METADATA_MARKER):]) if meta_pos >= 0 else (body, '')
+
+    text = head.strip()
+    if text.startswith('Text:'):
+        text = text[len('Text:'):].strip()
+        if len(text) >= 2 and text[0] == text[-1] == '"':
+            text = text[1:-1]
+        text = text.replace('""', '"')
+
+    fields = {}
+    for line in meta.replace(ANALYZEDATA_MARKER, '\n').splitlines():
+        if not line.startswith('- ') or ': ' not in line:
+            continue
+        key, value = line[2:].split(': ', 1)
+        if key in METADATA_FIELDS:
+            attr, convert = METADATA_FIELDS[key]
+            try:
+                fields[attr] = convert(value.strip())
+            except (ValueError, TypeError):
+                fields[attr] = None
+    return TweetRecord(block, text, **fields)
+
+# --- 3. Streaming Scan ---
+
+def _scan_blocks(filepath):
+    """
+    Yield (start, end) byte offsets of every complete block, plus the mmap they index.
+    """
+    try:
+        f = open(filepath, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            pos = 0
+            while True:
+                start = buf.find(BLOCK_START, pos)
+                if start < 0:
+                    return
+                end = buf.find(BLOCK_END, start + len(BLOCK_START))
+                if end < 0:
+                    return
+                pos = end + len(BLOCK_END)
+                yield buf, start, pos
+
+
+def iter_tweet_blocks(filepath):
+    """
+    Raw text of every complete tweet block, in file order (nothing if the file does not exist).
+    """
+    for buf, start, stop in _scan_blocks(filepath):
+        yield buf[start:stop].decode('utf-8')
+
+
+def iter_tweets(filepath):
+    """
+    TweetRecord of every complete tweet block, in file order.
+    """
+    for block in iter_tweet_blocks(filepath):
+        yield parse_tweet_block(block)
+
+
+def count_tweet_blocks(filepath):
+    return sum(1 for _ in _scan_blocks(filepath))
+
+# --- 4. Main Execution ---
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python tweet_blocks.py <tweets.txt>")
+        sys.exit()
+    n = 0
+    labels = {}
+    for tweet in iter_tweets(sys.argv[1]):
+        n += 1
+        labels[tweet.label] = labels.get(tweet.label, 0) + 1
+    print(f"📄 {sys.argv[1]}: {n} tweets")
+    for label, count in labels.items():
+        print(f"   -> {label or 'Unlabeled'}: {count}")
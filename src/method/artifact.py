@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import mmap as mmap_module
+import time
+import shutil
+import numpy as np
+import joblib
+import paths  # puts src/get_data on the import path, for ohlcv_store
+from ohlcv_store import retry_on_swap
+from priors import DIRECTIONS, N_HORIZONS, PriorTable
+
+# ================= Configuration Area =================
+
+ARTIFACT_FORMAT = 'nsrc-artifact'
+SCHEMA_VERSION = 1
+HEADER_FILE = 'header.json'
+DATA_FILE = 'arrays.bin'
+ALIGN = 64
+
+# Arrays of every artifact; any other array in the header (e.g. online prior state) is optional
+PRIOR_ARRAYS = ['group_priors', 'has_group', 'direction_priors', 'has_direction']
+
+# ================= Artifact Layout =================
+#   <path>/header.json   format, schema_version, group vocabulary, metadata, and for every array
+#                        its (offset, dtype, shape) inside arrays.bin
+#   <path>/arrays.bin    raw little-endian arrays, each starting on a 64-byte boundary:
+#                          group_priors     (n_groups, n_directions, 24) float64
+#                          has_group        (n_groups, n_directions) bool
+#                          direction_priors (n_directions, 24) float64
+#                          has_direction    (n_directions,) bool
+#                          hourly_factors   (24,) float64 (absent if saved without factors)
+#                          group_weights    (n_groups, n_directions) float64 \ sample weight behind each prior
+#                          direction_weights (n_directions,) float64        / (absent if unknown)
+# No pickled objects, so loading is a JSON parse, one mmap and zero-copy ndarray views.
+
+class NSRCArtifact:
+    """
+    A loaded NSRC model: priors, hourly factors, metadata and any extra arrays.
+    """
+    def __init__(self, prior_table, hourly_factors=None, metadata=None, arrays=None, schema_version=SCHEMA_VERSION):
+        self.prior_table = prior_table
+        self.hourly_factors = hourly_factors
+        self.metadata = {} if metadata is None else metadata
+        self.arrays = {} if arrays is None else arrays
+        self.schema_version = schema_version
+
+
+def is_legacy_artifact(path):
+    return os.path.isfile(path)
+
+
+def read_header(path):
+    """
+    Parse and validate header.json of an artifact directory.
+    """
+    with open(os.path.join(path, HEADER_FILE), 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not an {ARTIFACT_FORMAT} directory")
+    if header.get('schema_version', 0) > SCHEMA_VERSION:
+        raise ValueError(f"{path} has schema version {header['schema_version']}, this reader supports <= {SCHEMA_VERSION}")
+    if list(header.get('directions', [])) != list(DIRECTIONS) or header.get('n_horizons') != N_HORIZONS:
+        raise ValueError(f"{path} was written for directions {header.get('directions')} / "
+                         f"{header.get('n_horizons')} horizons, expected {list(DIRECTIONS)} / {N_HORIZONS}")
+    return header
+
+
+def write_artifact(path, prior_table, hourly_factors=None, metadata=None, extra_arrays=None):
+    """
+    Write an artifact directory atomically: everything goes to a temporary sibling
+    directory that is then swapped in, so readers never see a half-written model.
+    """
+    arrays = {
+        'group_priors': np.asarray(prior_table.group_priors, dtype=np.float64),
+        'has_group': np.asarray(prior_table.has_group, dtype=bool),
+        'direction_priors': np.asarray(prior_table.direction_priors, dtype=np.float64),
+        'has_direction': np.asarray(prior_table.has_direction, dtype=bool),
+    }
+    if hourly_factors is not None:
+        arrays['hourly_factors'] = np.asarray(hourly_factors, dtype=np.float64)
+    if prior_table.group_weights is not None:
+        arrays['group_weights'] = np.asarray(prior_table.group_weights, dtype=np.float64)
+        arrays['direction_weights'] = np.asarray(prior_table.direction_weights, dtype=np.float64)
+    arrays.update(extra_arrays or {})
+
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr, dtype=np.asarray(arr).dtype.newbyteorder('<'))
+        arrays[name] = arr
+        layout[name] = {'offset': offset, 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+        offset += (arr.nbytes + ALIGN - 1) // ALIGN * ALIGN
+
+    header = {
+        'format': ARTIFACT_FORMAT,
+        'schema_version': SCHEMA_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'directions': list(DIRECTIONS),
+        'n_horizons': N_HORIZONS,
+        'groups': [str(g) for g in prior_table.groups],
+        'arrays': layout,
+        'metadata': metadata or {},
+    }
+
+    path = os.path.normpath(path)
+    tmp_dir = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, DATA_FILE), 'wb') as f:
+        for name, arr in arrays.items():
+            f.seek(layout[name]['offset'])
+            f.write(arr.tobytes())
+        # Non-empty file, so it can always be mmap'd
+        f.truncate(max(offset, 1))
+    with open(os.path.join(tmp_dir, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2)
+
+    # Swap the new artifact in (directories cannot be os.replace'd over non-empty ones)
+    old_dir = f"{path}.old-{os.getpid()}"
+    if os.path.isdir(path):
+        os.rename(path, old_dir)
+    elif os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp_dir, path)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return path
+
+
+def _read_artifact_files(path, mmap=True):
+    """
+    header.json and the arrays.bin buffer of one artifact directory.
+    """
+    header = read_header(path)
+    with open(os.path.join(path, DATA_FILE), 'rb') as f:
+        if mmap:
+            buf = mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ)
+        else:
+            buf = f.read()
+    if read_header(path) != header:
+        raise FileNotFoundError(f"{path} was replaced while loading")
+    return header, buf
+
+
+def load_artifact(path, mmap=True):
+    """
+    Load an artifact directory (arrays are read-only views on one mmap with mmap=True,
+    on one in-memory copy otherwise),
+    or a legacy joblib .pkl from train.py / online_priors.py (schema_version 0).
+    """
+    if is_legacy_artifact(path):
+        payload = joblib.load(path)
+        prior_table = PriorTable.from_dicts(payload['priors'], payload['global_priors'])
+        factors = payload.get('best_hourly_factors')
+        metadata = {'legacy_path': path}
+        if 'online_state' in payload:
+            metadata['online_state'] = payload['online_state']
+        return NSRCArtifact(prior_table, None if factors is None else np.asarray(factors), metadata, schema_version=0)
+
+    header, buf = retry_on_swap(lambda: _read_artifact_files(path, mmap))
+    arrays = {
+        name: np.ndarray(tuple(spec['shape']), dtype=spec['dtype'], buffer=buf, offset=spec['offset'])
+        for name, spec in header['arrays'].items()
+    }
+    prior_table = PriorTable(header['groups'], *(arrays.pop(name) for name in PRIOR_ARRAYS),
+                             arrays.pop('group_weights', None), arrays.pop('direction_weights', None))
+    return NSRCArtifact(prior_table, arrays.pop('hourly_factors', None), header['metadata'], arrays, header['schema_version'])
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    # Convert a legacy .pkl artifact: python artifact.py hourly_robust_stats.pkl [out_dir]
+    if len(sys.argv) < 2:
+        print("Usage: python artifact.py <legacy.pkl> [artifact_dir]")
+        sys.exit()
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0]
+    legacy = load_artifact(src)
+    write_artifact(dst, legacy.prior_table, legacy.hourly_factors, {'converted_from': os.path.basename(src)})
+
+    t0 = time.perf_counter()
+    art = load_artifact(dst)
+    print(f">>> {src} -> {dst} ({len(art.prior_table.groups)} groups), "
+          f"load {(time.perf_counter() - t0) * 1e6:.0f}us")
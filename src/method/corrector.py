@@ -0,0 +1,121 @@
+import os
+import sys
+import numpy as np
+from priors import DIRECTIONS, N_HORIZONS
+from artifact import load_artifact
+from train import MODEL_SAVE_PATH, WHITELIST_EVENTS, clean_event_name
+
+# ================= NSRC Corrector =================
+
+def normalize_directions(directions):
+    """
+    Directions as ints in DIRECTIONS; integer strings such as '1' are accepted. Anything else
+    ('Bullish', 0.5, None, 2) raises ValueError instead of silently getting no correction.
+    """
+    out = []
+    for d in directions:
+        try:
+            value = int(d.strip()) if isinstance(d, str) else int(d)
+        except (TypeError, ValueError):
+            value = None
+        if value not in DIRECTIONS or (not isinstance(d, str) and value != d):
+            raise ValueError(f"Invalid direction {d!r}, expected one of {list(DIRECTIONS)}")
+        out.append(value)
+    return out
+
+
+class NSRCCorrector:
+    """
+    Applies the trained NSRC correction to base forecasts:
+        residual  = prior(event_group, direction) * best_hourly_factors    (percent)
+        corrected = forecast * (1 + residual / 100)
+    which inverts the training target y = (true / pred - 1) * 100.
+    Events outside WHITELIST_EVENTS are passed through unchanged.
+    """
+    def __init__(self, prior_table, hourly_factors):
+        self.prior_table = prior_table
+        self.hourly_factors = np.asarray(hourly_factors, dtype=np.float64)
+        # Per-horizon residual table: (n_groups + 1, n_directions + 1, 24)
+        self.residuals = prior_table.resolved * self.hourly_factors
+        self._group_of_event = {}
+
+    @classmethod
+    def load(cls, path=MODEL_SAVE_PATH):
+        """
+        Load a train.py / online_priors.py artifact (directory or legacy .pkl).
+        """
+        artifact = load_artifact(path)
+        if artifact.hourly_factors is None:
+            raise ValueError(f"{path} has no hourly factors")
+        return cls(artifact.prior_table, artifact.hourly_factors)
+
+    def event_group(self, event_name):
+        """
+        Cleaned event group of a raw event name, or None if it is not whitelisted (memoized).
+        """
+        group = self._group_of_event.get(event_name, False)
+        if group is False:
+            cleaned = clean_event_name(event_name)
+            group = cleaned if any(core in cleaned for core in WHITELIST_EVENTS) else None
+            self._group_of_event[event_name] = group
+        return group
+
+    def correct(self, event_names, directions, forecasts):
+        """
+        Correct a batch of 24-step forecasts, shape (n, 24).
+        Returns (corrected (n, 24), applied (n,) bool). Invalid directions raise ValueError.
+        """
+        forecasts = np.asarray(forecasts, dtype=np.float64)
+        if forecasts.ndim != 2 or forecasts.shape[1] != N_HORIZONS:
+            raise ValueError(f"forecasts must have shape (n, {N_HORIZONS}), got {forecasts.shape}")
+        directions = normalize_directions(directions)
+        groups = [self.event_group(e) for e in event_names]
+        applied = np.fromiter((g is not None for g in groups), dtype=bool, count=len(groups))
+        g, d = self.prior_table.encode(groups, directions)
+        residuals = np.where(applied[:, None], self.residuals[g, d], 0.0)
+        return forecasts * (1 + residuals / 100), applied
+
+
+class HotReloadingCorrector:
+    """
+    Holds an NSRCCorrector and reloads it when the artifact's inode / mtime / size change.
+    Artifacts are swapped in atomically, so a reload never sees a partial model;
+    if loading still fails, the previous model stays in service.
+    """
+    def __init__(self, path=MODEL_SAVE_PATH, loader=NSRCCorrector.load):
+        self.path = path
+        self.loader = loader
+        self.corrector = None
+        self.signature = None
+        self.n_reloads = 0
+        self.current()
+        if self.corrector is None:
+            raise FileNotFoundError(f"Could not load NSRC artifact: {path}")
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def is_stale(self):
+        """
+        True if the artifact changed since it was last loaded (one stat(), never loads).
+        """
+        signature = self._signature()
+        return signature is not None and signature != self.signature
+
+    def current(self):
+        """
+        The up-to-date corrector (one stat() per call; reloads synchronously when stale).
+        """
+        signature = self._signature()
+        if signature is not None and signature != self.signature:
+            try:
+                self.corrector = self.loader(self.path)
+                self.signature = signature
+                self.n_reloads += 1
+            except Exception as e:
+                print(f"[WARN] Keeping previous NSRC model, reload of {self.path} failed: {e}", file=sys.stderr)
+        return self.corrector
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from prediction_store import FIELDS, N_HORIZONS, ensure_prediction_tensor, load_prediction_tensor
+from train import POLICY_PATH, MODEL, MODEL_SAVE_PATH, load_policy_events, match_policy_origins
+from run_matrix import OUTPUT_DIR as MATRIX_DIR, cell_dir
+from artifact import load_artifact
+from paths import method_path
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+REPORT_DIR = method_path('metrics_report')
+REFERENCE_MODEL = 'PatchTST'    # MAE reductions are also reported against this model
+SUBSETS = ['all', 'event', 'non_event']
+ASSET = 'BTC'                   # asset the prediction tensor forecasts (origin_recovery.PREDICTION_DIRS)
+
+# ================= Metrics Engine =================
+
+def compute_metrics(values, present, models, corrections=None, event_mask=None):
+    """
+    Every metric for every variant x subset x model x horizon in one vectorized pass.
+
+    values       (model, origin, horizon, {pred, true}) tensor (e.g. PredictionTensor.values)
+    present      (model, origin) bool
+    corrections  optional residuals in percent, broadcastable to (model, origin, horizon):
+                 adds the 'corrected' variant pred * (1 + r / 100)
+    event_mask   optional bool, broadcastable to (model, origin): splits 'event' / 'non_event'
+
+    Absolute / squared / percentage errors are reduced with one weighted einsum per moment
+    over a (subset, model, origin) weight array. Returns a long DataFrame with one row per
+    (variant, subset, model, horizon), horizon 't+k' or 'all' (pooled over horizons).
+    """
+    pred = np.asarray(values[..., FIELDS.index('pred')], dtype=np.float64)
+    true = np.asarray(values[..., FIELDS.index('true')], dtype=np.float64)
+    variants = {'base': pred}
+    if corrections is not None:
+        variants['corrected'] = pred * (1 + np.broadcast_to(corrections, pred.shape) / 100)
+    variant_names = list(variants)
+
+    ok = np.asarray(present, dtype=bool)[..., None] & np.isfinite(true) & np.isfinite(pred)
+    err = np.stack([np.where(ok, true - v, 0.0) for v in variants.values()])          # (V, M, O, H)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(ok & (true != 0), np.abs(err) / np.abs(true) * 100, 0.0)        # (V, M, O, H)
+
+    events = np.zeros(present.shape, dtype=bool) if event_mask is None else np.broadcast_to(event_mask, present.shape)
+    weights = np.stack([np.ones(present.shape), events, ~events]).astype(np.float64)   # (S, M, O)
+
+    n = np.einsum('smo,moh->smh', weights, ok.astype(np.float64))
+    sums = {
+        'abs': np.einsum('smo,vmoh->vsmh', weights, np.abs(err)),
+        'sq': np.einsum('smo,vmoh->vsmh', weights, err ** 2),
+        'pct': np.einsum('smo,vmoh->vsmh', weights, pct),
+    }
+    # Append the pooled 'all horizons' column: (..., H + 1)
+    n = np.concatenate([n, n.sum(axis=-1, keepdims=True)], axis=-1)
+    sums = {k: np.concatenate([s, s.sum(axis=-1, keepdims=True)], axis=-1) for k, s in sums.items()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mae, mse, mape = sums['abs'] / n, sums['sq'] / n, sums['pct'] / n
+
+    horizons = [f't+{h}' for h in range(1, N_HORIZONS + 1)] + ['all']
+    V, S, M, H = mae.shape
+    grid = np.meshgrid(np.arange(V), np.arange(S), np.arange(M), np.arange(H), indexing='ij')
+    v, s, m, h = (g.ravel() for g in grid)
+    return pd.DataFrame({
+        'variant': np.asarray(variant_names)[v],
+        'subset': np.asarray(SUBSETS)[s],
+        'model': np.asarray(models)[m],
+        'horizon': np.asarray(horizons)[h],
+        'n': n[s, m, h].astype(np.int64),
+        'mae': mae.ravel(),
+        'mape': mape.ravel(),
+        'mse': mse.ravel(),
+        'rmse': np.sqrt(mse.ravel()),
+    })
+
+
+def add_reductions(df, reference_model=REFERENCE_MODEL):
+    """
+    MAE reduction (%) of the corrected forecast vs the base one, and vs the reference model's base MAE.
+    """
+    key = ['subset', 'model', 'horizon']
+    base = df[df['variant'] == 'base'].set_index(key)['mae']
+    df['mae_reduction_vs_base_pct'] = (1 - df['mae'] / base.reindex(pd.MultiIndex.from_frame(df[key])).to_numpy()) * 100
+    if reference_model in set(df['model']):
+        ref = base.xs(reference_model, level='model')
+        ref_mae = ref.reindex(pd.MultiIndex.from_frame(df[['subset', 'horizon']])).to_numpy()
+        df[f'mae_reduction_vs_{reference_model}_pct'] = (1 - df['mae'] / ref_mae) * 100
+    return df
+
+# ================= Event Masks & Corrections =================
+
+def model_artifact_paths(models, matrix_dir=MATRIX_DIR, asset=ASSET):
+    """
+    {model: NSRC artifact trained on that model's forecasts, or None}: the run_matrix.py cell
+    of (model, asset), else train.py's MODEL_SAVE_PATH for train.MODEL.
+    """
+    paths = {}
+    for model in models:
+        candidates = [os.path.join(cell_dir(matrix_dir, model, asset), 'hourly_robust_stats')]
+        if model == MODEL:
+            candidates.append(MODEL_SAVE_PATH)
+        paths[model] = next((p for p in candidates if os.path.exists(p)), None)
+    return paths
+
+
+def event_corrections(origins_ns, policy_events, artifact_path=MODEL_SAVE_PATH):
+    """
+    Event-hour mask (origin,) and NSRC residuals (origin, 24) of one artifact on the tensor's
+    origin axis. Events are matched to origins like train.prepare_dataset_v7; several events
+    in the same hour contribute the mean of their residuals.
+    """
+    rows = match_policy_origins(policy_events['timestamp'], np.asarray(origins_ns).view('datetime64[ns]'))
+    ok = rows >= 0
+    event_mask = np.zeros(len(origins_ns), dtype=bool)
+    event_mask[rows[ok]] = True
+    if artifact_path is None:
+        return event_mask, None
+
+    artifact = load_artifact(artifact_path)
+    residual = artifact.prior_table.predict(policy_events[ok]) * artifact.hourly_factors
+    sums = np.zeros((len(origins_ns), N_HORIZONS))
+    np.add.at(sums, rows[ok], residual)
+    counts = np.bincount(rows[ok], minlength=len(origins_ns))
+    with np.errstate(invalid='ignore'):
+        return event_mask, np.where(counts[:, None] > 0, sums / counts[:, None], 0.0)
+
+
+def model_corrections(origins_ns, policy_events, artifact_paths):
+    """
+    Event-hour mask (origin,) and per-model residuals (model, origin, 24), each model corrected
+    by its own artifact (`artifact_paths` in model order). A model without an artifact gets NaN
+    residuals, so its 'corrected' metrics are NaN instead of repeating the base forecast.
+    Returns (mask, None) if no model has an artifact.
+    """
+    event_mask, _ = event_corrections(origins_ns, policy_events, None)
+    if all(p is None for p in artifact_paths):
+        return event_mask, None
+    corrections = np.full((len(artifact_paths), len(origins_ns), N_HORIZONS), np.nan)
+    for m, path in enumerate(artifact_paths):
+        if path is not None:
+            corrections[m] = event_corrections(origins_ns, policy_events, path)[1]
+    return event_mask, corrections
+
+
+def write_report(df, report_dir, meta):
+    """
+    Structured report: metrics.json ({meta, records}) and metrics.parquet when a Parquet engine is installed.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    records = json.loads(df.to_json(orient='records'))
+    with open(os.path.join(report_dir, 'metrics.json'), 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'records': records}, f, indent=2)
+    try:
+        df.to_parquet(os.path.join(report_dir, 'metrics.parquet'), index=False)
+    except ImportError:
+        pass
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    report_dir = sys.argv[1] if len(sys.argv) > 1 else REPORT_DIR
+    tensor = load_prediction_tensor(ensure_prediction_tensor())
+
+    corrections = event_mask = None
+    artifacts = model_artifact_paths(tensor.models)
+    if tensor.origin_kind == 'timestamp':
+        event_mask, corrections = model_corrections(
+            tensor.origins, load_policy_events(POLICY_PATH), [artifacts[m] for m in tensor.models]
+        )
+    else:
+        print(">>> Prediction tensor has no origin timestamps (run origin_recovery.py): event subsets are empty")
+
+    t0 = time.perf_counter()
+    df = add_reductions(compute_metrics(tensor.values, tensor.present, tensor.models, corrections, event_mask))
+    elapsed = time.perf_counter() - t0
+
+    write_report(df, report_dir, {
+        'models': tensor.models,
+        'n_origins': int(len(tensor.origins)),
+        'origin_kind': tensor.origin_kind,
+        'n_event_origins': 0 if event_mask is None else int(event_mask.sum()),
+        'corrected': corrections is not None,
+        'artifacts': artifacts,
+        'reference_model': REFERENCE_MODEL,
+        'compute_seconds': round(elapsed, 4),
+    })
+    print(f">>> {len(df)} metric rows ({len(tensor.models)} models) in {elapsed * 1000:.1f}ms -> {report_dir}")
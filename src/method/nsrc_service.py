@@ -0,0 +1,123 @@
+import sys
+import json
+import time
+import asyncio
+from corrector import HotReloadingCorrector
+from train import MODEL_SAVE_PATH
+
+# ================= Configuration Area =================
+HOST = '127.0.0.1'
+PORT = 8765
+UNIX_SOCKET = None          # e.g. '/tmp/nsrc.sock'; if set, serve on this socket instead of HOST:PORT
+MAX_BODY_BYTES = 8 << 20
+
+# ================= Request Handling =================
+# POST /correct   {"items": [{"origin": "...", "event": "CPI (YoY)", "direction": 1, "forecast": [24 floats]}, ...]}
+#              -> {"items": [{"origin": "...", "applied": true, "corrected": [24 floats]}, ...], "elapsed_us": ...}
+# GET  /health    -> {"status": "ok", "artifact": ..., "reloads": ...}
+
+def correct_batch(corrector, payload):
+    items = payload['items']
+    corrected, applied = corrector.correct(
+        [item['event'] for item in items],
+        [item['direction'] for item in items],
+        [item['forecast'] for item in items],
+    )
+    return [
+        {'origin': item.get('origin'), 'applied': bool(a), 'corrected': c}
+        for item, a, c in zip(items, applied, corrected.tolist())
+    ]
+
+
+def make_reloader(model):
+    """
+    maybe_reload(): if the artifact changed and no reload is running, reload it in a worker
+    thread, so the event loop never blocks on loading; requests keep the loaded model meanwhile.
+    """
+    running = set()
+    def maybe_reload():
+        if not running and model.is_stale():
+            task = asyncio.get_running_loop().run_in_executor(None, model.current)
+            running.add(task)
+            task.add_done_callback(running.discard)
+    return maybe_reload
+
+
+def route(model, method, target, body):
+    if method == 'GET' and target == '/health':
+        return '200 OK', {'status': 'ok', 'artifact': model.path, 'reloads': model.n_reloads}
+    if method == 'POST' and target == '/correct':
+        t0 = time.perf_counter()
+        try:
+            items = correct_batch(model.corrector, json.loads(body))
+        except (ValueError, KeyError, TypeError) as e:
+            return '400 Bad Request', {'error': str(e)}
+        return '200 OK', {'items': items, 'elapsed_us': round((time.perf_counter() - t0) * 1e6, 1)}
+    return '404 Not Found', {'error': f"no route for {method} {target}"}
+
+
+async def handle_connection(model, maybe_reload, reader, writer):
+    """
+    Minimal HTTP/1.1 with keep-alive: request line, headers, Content-Length body.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                status, payload = '413 Payload Too Large', {'error': 'request body too large'}
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length)
+                maybe_reload()
+                status, payload = route(model, method, target.split('?', 1)[0], body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+            data = json.dumps(payload).encode()
+            head = f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+            if not keep_alive:
+                head += "Connection: close\r\n"
+            writer.write(head.encode() + b"\r\n" + data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(artifact_path=MODEL_SAVE_PATH, host=HOST, port=PORT, unix_socket=UNIX_SOCKET):
+    # run_in_executor rather than asyncio.to_thread (3.9+): the scripts support Python 3.8
+    model = await asyncio.get_running_loop().run_in_executor(None, HotReloadingCorrector, artifact_path)
+    maybe_reload = make_reloader(model)
+    handler = lambda r, w: handle_connection(model, maybe_reload, r, w)
+    if unix_socket:
+        server = await asyncio.start_unix_server(handler, path=unix_socket)
+        where = unix_socket
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        where = f"http://{host}:{port}"
+    print(f">>> NSRC correction service on {where} (artifact: {artifact_path}, hot reload on change)")
+    async with server:
+        await server.serve_forever()
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    artifact_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_SAVE_PATH
+    try:
+        asyncio.run(serve(artifact_path))
+    except KeyboardInterrupt:
+        pass
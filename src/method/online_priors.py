@@ -0,0 +1,254 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from collections import Counter
+from priors import DIRECTIONS, N_HORIZONS, PriorTable, encode_directions
+from artifact import write_artifact, load_artifact
+from paths import method_path
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+# Own artifact, seeded from train.MODEL_SAVE_PATH on the first run, so online and batch runs never
+# overwrite each other; point the corrector / nsrc_service at it to serve the online priors
+ONLINE_STATE_PATH = method_path('online_robust_stats')
+DECAY_HALF_LIFE = None                          # e.g. pd.Timedelta(days=90); None -> plain running means
+MAX_LOG2_WEIGHT = 512                           # rebase stored weights before they approach float64 overflow
+
+STATE_ARRAYS = ['group_sums', 'group_weights', 'group_counts', 'direction_sums', 'direction_weights', 'direction_counts']
+STATE_SCALARS = ['half_life_ns', 't_ref', 'last_timestamp']
+
+# ================= Online Prior State =================
+
+class OnlinePriors:
+    """
+    Running (event_group, direction) and direction means of y_vector, updated one
+    resolved event at a time in O(24).
+
+    With exponential decay an event at time t gets weight 2 ** ((t - t_ref) / half_life).
+    Every prior is a weighted mean, so the common factor 2 ** (-now / half_life) cancels
+    and older events never have to be touched; stored sums are only rescaled (rebased)
+    when the weights grow too large. Without decay every weight is 1.
+    """
+    def __init__(self, half_life=DECAY_HALF_LIFE, hourly_factors=None):
+        self.half_life_ns = None if half_life is None else np.int64(pd.Timedelta(half_life).value)
+        self.hourly_factors = None if hourly_factors is None else np.asarray(hourly_factors, dtype=np.float64)
+        self.groups = []
+        self.group_codes = {}
+        n_dirs = len(DIRECTIONS)
+        self.group_sums = np.zeros((0, n_dirs, N_HORIZONS))
+        self.group_weights = np.zeros((0, n_dirs))
+        self.group_counts = np.zeros((0, n_dirs), dtype=np.int64)
+        self.direction_sums = np.zeros((n_dirs, N_HORIZONS))
+        self.direction_weights = np.zeros(n_dirs)
+        self.direction_counts = np.zeros(n_dirs, dtype=np.int64)
+        self.t_ref = None           # int64 ns, reference time of the stored weights
+        self.last_timestamp = None  # int64 ns, latest event seen
+        self.last_keys = []         # (event_group, direction) of every event seen at last_timestamp
+
+    @property
+    def n_events(self):
+        return int(self.direction_counts.sum())
+
+    def _group_code(self, event_group):
+        code = self.group_codes.get(event_group)
+        if code is None:
+            code = len(self.groups)
+            if code == len(self.group_sums):
+                # Amortized O(1) growth: double the capacity
+                capacity = max(8, 2 * code)
+                self.group_sums = np.resize(self.group_sums, (capacity,) + self.group_sums.shape[1:])
+                self.group_weights = np.resize(self.group_weights, (capacity,) + self.group_weights.shape[1:])
+                self.group_counts = np.resize(self.group_counts, (capacity,) + self.group_counts.shape[1:])
+                self.group_sums[code:] = 0.0
+                self.group_weights[code:] = 0.0
+                self.group_counts[code:] = 0
+            self.groups.append(event_group)
+            self.group_codes[event_group] = code
+        return code
+
+    def _log2_weight(self, t_ns):
+        if self.half_life_ns is None:
+            return 0.0
+        if self.t_ref is None:
+            self.t_ref = t_ns
+        log2_w = (t_ns - self.t_ref) / self.half_life_ns
+        if log2_w > MAX_LOG2_WEIGHT:
+            self._rebase(t_ns)
+            log2_w = 0.0
+        return log2_w
+
+    def _rebase(self, t_ns):
+        scale = 2.0 ** (-(t_ns - self.t_ref) / self.half_life_ns)
+        for arr in (self.group_sums, self.group_weights, self.direction_sums, self.direction_weights):
+            arr *= scale
+        self.t_ref = t_ns
+
+    def update(self, event_group, direction, y_vector, timestamp):
+        """
+        Add one resolved event (its 24 residuals are known). Unknown directions are ignored.
+        """
+        d = int(encode_directions([direction])[0])
+        if d < 0:
+            return
+        y = np.asarray(y_vector, dtype=np.float64)
+        t_ns = np.int64(pd.Timestamp(timestamp).value)
+        w = 2.0 ** self._log2_weight(t_ns)
+        g = self._group_code(event_group)
+
+        self.group_sums[g, d] += w * y
+        self.group_weights[g, d] += w
+        self.group_counts[g, d] += 1
+        self.direction_sums[d] += w * y
+        self.direction_weights[d] += w
+        self.direction_counts[d] += 1
+        key = (event_group, DIRECTIONS[d])
+        if self.last_timestamp is None or t_ns > self.last_timestamp:
+            self.last_timestamp, self.last_keys = t_ns, [key]
+        elif t_ns == self.last_timestamp:
+            self.last_keys.append(key)
+
+    def ingest(self, df, only_new=True):
+        """
+        Feed samples (timestamp, event_group, direction, y_vector) in time order, e.g. the
+        output of train.prepare_dataset_v7. Rows whose 24 residuals are not all known yet are
+        skipped; with `only_new`, so are rows older than the latest event already seen, and rows
+        at that timestamp that were already seen (matched by (event_group, direction), counting
+        duplicates), so an event sharing the latest timestamp is still added once.
+        Returns the number of events added.
+        """
+        # Cut-off fixed before the loop: events sharing a timestamp resolve together
+        cutoff = self.last_timestamp if only_new else None
+        seen_at_cutoff = Counter(self.last_keys) if only_new else Counter()
+        n_added = 0
+        for t, group, direction, y in zip(df['timestamp'], df['event_group'], df['direction'], df['y_vector']):
+            if cutoff is not None:
+                t_ns = pd.Timestamp(t).value
+                if t_ns < cutoff:
+                    continue
+                if t_ns == cutoff and seen_at_cutoff[(group, direction)] > 0:
+                    seen_at_cutoff[(group, direction)] -= 1
+                    continue
+            if not np.all(np.isfinite(y)):
+                continue
+            self.update(group, direction, y, t)
+            n_added += 1
+        return n_added
+
+    def table(self):
+        """
+        Current priors as a PriorTable (same fallback rules as the batch priors).
+        """
+        n = len(self.groups)
+        return PriorTable.from_sums(
+            self.groups, self.group_sums[:n], self.group_weights[:n], self.direction_sums, self.direction_weights
+        )
+
+    # --- Persistence ---
+
+    def to_state(self):
+        n = len(self.groups)
+        return {
+            'groups': list(self.groups),
+            'group_sums': self.group_sums[:n].copy(),
+            'group_weights': self.group_weights[:n].copy(),
+            'group_counts': self.group_counts[:n].copy(),
+            'direction_sums': self.direction_sums.copy(),
+            'direction_weights': self.direction_weights.copy(),
+            'direction_counts': self.direction_counts.copy(),
+            'half_life_ns': self.half_life_ns,
+            't_ref': self.t_ref,
+            'last_timestamp': self.last_timestamp,
+            'last_keys': [list(k) for k in self.last_keys],
+        }
+
+    @classmethod
+    def from_state(cls, state, hourly_factors=None):
+        obj = cls(hourly_factors=hourly_factors)
+        obj.half_life_ns = state['half_life_ns']
+        obj.groups = list(state['groups'])
+        obj.group_codes = {g: i for i, g in enumerate(obj.groups)}
+        for key in STATE_ARRAYS:
+            setattr(obj, key, np.array(state[key]))
+        obj.t_ref, obj.last_timestamp = state['t_ref'], state['last_timestamp']
+        obj.last_keys = [(g, d) for g, d in state.get('last_keys', [])]
+        return obj
+
+    @classmethod
+    def from_batch(cls, artifact, half_life=DECAY_HALF_LIFE):
+        """
+        Seed the running sums with a train.py artifact's priors (prior * sample weight), so
+        ingesting resumes after its training samples (metadata train_end / train_end_keys).
+        With decay, the seeded samples count as if they all happened at train_end.
+        """
+        table, metadata = artifact.prior_table, artifact.metadata
+        if table.group_weights is None or 'train_end' not in metadata:
+            raise ValueError("Artifact has no prior sample weights or train_end (legacy .pkl or older train.py): "
+                             "retrain it with train.py before resuming online")
+        obj = cls(half_life, artifact.hourly_factors)
+        obj.groups = list(table.groups)
+        obj.group_codes = {g: i for i, g in enumerate(obj.groups)}
+        obj.group_weights = np.array(table.group_weights, dtype=np.float64)
+        obj.group_sums = np.where(table.has_group[..., None], table.group_priors, 0.0) * obj.group_weights[..., None]
+        obj.group_counts = np.rint(obj.group_weights).astype(np.int64)
+        obj.direction_weights = np.array(table.direction_weights, dtype=np.float64)
+        obj.direction_sums = np.where(table.has_direction[:, None], table.direction_priors, 0.0) * obj.direction_weights[:, None]
+        obj.direction_counts = np.rint(obj.direction_weights).astype(np.int64)
+        obj.last_timestamp = np.int64(metadata['train_end'])
+        obj.last_keys = [(g, d) for g, d in metadata.get('train_end_keys', [])]
+        obj.t_ref = None if obj.half_life_ns is None else obj.last_timestamp
+        return obj
+
+    def save(self, path=ONLINE_STATE_PATH):
+        """
+        Write the corrector artifact (artifact.py format) with the online state as extra
+        `online_*` arrays and header metadata; the directory is swapped in atomically.
+        Refuses to write without hourly factors, which NSRCCorrector needs.
+        """
+        if self.hourly_factors is None:
+            raise ValueError("Online priors have no hourly factors: start from a train.py artifact")
+        state = self.to_state()
+        online_meta = {k: None if state[k] is None else int(state[k]) for k in STATE_SCALARS}
+        online_meta['last_keys'] = state['last_keys']
+        write_artifact(
+            path, self.table(), self.hourly_factors,
+            metadata={'online': online_meta, 'n_events': self.n_events},
+            extra_arrays={f'online_{k}': state[k] for k in STATE_ARRAYS}
+        )
+
+    @classmethod
+    def load(cls, path=ONLINE_STATE_PATH, half_life=DECAY_HALF_LIFE):
+        """
+        Resume from a saved artifact (directory or legacy .pkl). A batch artifact from train.py
+        (no online state) seeds the state with its priors and hourly factors (see from_batch).
+        """
+        artifact = load_artifact(path, mmap=False)
+        if 'online_state' in artifact.metadata:
+            return cls.from_state(artifact.metadata['online_state'], artifact.hourly_factors)
+        if 'online' in artifact.metadata:
+            state = {k: artifact.arrays[f'online_{k}'] for k in STATE_ARRAYS}
+            state.update(artifact.metadata['online'])
+            state['groups'] = artifact.prior_table.groups
+            return cls.from_state(state, artifact.hourly_factors)
+        return cls.from_batch(artifact, half_life)
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    from train import PRED_PATH, MODEL, MODEL_SAVE_PATH, prepare_dataset_v7
+
+    state_path = sys.argv[1] if len(sys.argv) > 1 else ONLINE_STATE_PATH
+    seed_path = state_path if os.path.exists(state_path) else MODEL_SAVE_PATH
+    if not os.path.exists(seed_path):
+        print(f">>> No artifact at {seed_path}: run train.py first (online priors start from its priors and hourly factors)")
+        sys.exit()
+    online = OnlinePriors.load(seed_path)
+    if seed_path != state_path:
+        print(f">>> Seeded from the batch artifact {seed_path}")
+    print(f">>> Online priors: {online.n_events} events seen, last at "
+          f"{pd.Timestamp(online.last_timestamp) if online.last_timestamp is not None else '-'}")
+
+    df = prepare_dataset_v7(PRED_PATH, MODEL)
+    n_added = online.ingest(df)
+    online.save(state_path)
+    print(f">>> Added {n_added} resolved events ({online.n_events} total). Priors saved to: {state_path}")
@@ -0,0 +1,204 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from paths import repo_path
+from ohlcv_pyramid import load_resolution_arrays
+from prediction_store import PREDICTION_DIR, PREDICTION_FILES, TENSOR_DTYPE, N_HORIZONS, read_prediction_csv, build_prediction_tensor
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+OHLCV_DIR = repo_path('dataset', 'ohlcv')
+OHLCV_FILES = {                 # 5m OHLCV CSVs (as written by src/get_data/get_ohlcv.py)
+    'BTC': '1_Bitcoin(BTC)_BTCUSDT_5m.csv',
+    'ETH': '2_Ethereum(ETH)_ETHUSDT_5m.csv',
+    'SOL': '6_Solana(SOL)_SOLUSDT_5m.csv',
+    'DOGE': '8_Dogecoin(DOGE)_DOGEUSDT_5m.csv',
+    'TRUMP': '89_Official Trump(TRUMP)_TRUMPUSDT_5m.csv',
+}
+ORIGIN_ASSET = 'BTC'             # asset the prediction files of PREDICTION_DIR forecast
+ORIGIN_OHLCV_CSV = os.path.join(OHLCV_DIR, OHLCV_FILES[ORIGIN_ASSET])
+# Asset -> directory of its per-model prediction CSVs (prediction_store.PREDICTION_FILES)
+PREDICTION_DIRS = {'BTC': PREDICTION_DIR}
+# Forecast origins are hourly; current_close = close of the 1h bar opening at t
+# Prices are compared after rounding to the asset's exchange tick size (Binance USDT pairs:
+# BTC / ETH / SOL 0.01, DOGE 0.00001, TRUMP 0.001), so distinct closes never share a key
+PRICE_DECIMALS = {'BTC': 2, 'ETH': 2, 'SOL': 2, 'DOGE': 5, 'TRUMP': 3}
+MIN_TRUE_MATCHES = 12           # a candidate bar must also match at least this many of the 24 true_t+k closes
+REPORT_FILE = 'origin_recovery_report.csv'
+
+STATUS_MATCHED, STATUS_AMBIGUOUS, STATUS_UNMATCHED = 'matched', 'ambiguous', 'unmatched'
+# Why an asset has no prediction tensor (see recovered_prediction_tensor)
+MISSING_PREDICTIONS, MISSING_OHLCV, NO_RECOVERED_ORIGINS = 'missing predictions', 'missing ohlcv', 'no recovered origins'
+
+# ================= Hourly Closes =================
+
+def load_hourly_closes(csv_path):
+    """
+    Hourly bars of a 5m OHLCV CSV as (open_time epoch ns (n,), close (n,)), sorted by time:
+    the '1h' level of src/get_data/ohlcv_pyramid.py (built on first use, then mmap'd).
+    """
+    arrays = load_resolution_arrays(csv_path, '1h')
+    return np.asarray(arrays['open_time'], dtype=np.int64), np.asarray(arrays['close'], dtype=np.float64)
+
+# ================= Origin Recovery =================
+
+def price_keys(prices, decimals):
+    """
+    Integer bucket key of each price (rounded to `decimals`); NaN -> -1.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    keys = np.rint(prices * 10 ** decimals)
+    return np.where(np.isfinite(keys), keys, -1).astype(np.int64)
+
+
+class HourlyCloseIndex:
+    """
+    Rounded-price index over hourly closes on a regular grid.
+    Keys are kept sorted with their slots, so every bucket of equal keys is one contiguous
+    range and all rows are looked up together with two searchsorted calls
+    (a vectorized hash lookup: key -> candidate bars).
+    """
+    def __init__(self, open_time_ns, close, step=pd.Timedelta(hours=1), decimals=PRICE_DECIMALS[ORIGIN_ASSET],
+                 min_true_matches=MIN_TRUE_MATCHES):
+        times = np.asarray(open_time_ns, dtype=np.int64)
+        self.step = np.int64(pd.Timedelta(step).value)
+        self.decimals = decimals
+        self.min_true_matches = min_true_matches
+        # No bars (e.g. an empty CSV) leaves an index in which every row is unmatched
+        self.t0 = times[0] if len(times) else np.int64(0)
+        slots = (times - self.t0) // self.step
+        n_slots = int(slots[-1]) + 1 if len(slots) else 0
+
+        # Close keys on the full grid (missing bars -> -1), so bar t+k is slot + k
+        self.slot_keys = np.full(n_slots + N_HORIZONS, -1, dtype=np.int64)
+        self.slot_keys[slots] = price_keys(close, decimals)
+
+        valid = np.flatnonzero(self.slot_keys >= 0)
+        order = np.argsort(self.slot_keys[valid], kind='stable')
+        self.bucket_slots = valid[order]
+        self.bucket_keys = self.slot_keys[self.bucket_slots]
+
+    @classmethod
+    def from_ohlcv(cls, csv_path=ORIGIN_OHLCV_CSV, decimals=PRICE_DECIMALS[ORIGIN_ASSET]):
+        times, close = load_hourly_closes(csv_path)
+        return cls(times, close, pd.Timedelta(hours=1), decimals)
+
+    def recover(self, current_close, y_true):
+        """
+        Origin of every prediction row in one pass.
+        Candidates are the bars whose close has the row's current_close key; each candidate is
+        scored by how many of the 24 true_t+k closes match bars slot+1 .. slot+24; candidates
+        scoring below min_true_matches are dropped (a price coincidence alone is not a match)
+        and the best-scoring one wins. Rows with no candidate left are unmatched; rows whose best score
+        is shared by several candidates (or whose bar is claimed by another row) are ambiguous (origin NaT).
+        Returns a frame: origin, status, n_candidates (bars with the same close), score (best true_t+k matches).
+        """
+        row_keys = price_keys(current_close, self.decimals)
+        true_keys = price_keys(y_true, self.decimals)
+        n = len(row_keys)
+
+        lo = np.searchsorted(self.bucket_keys, row_keys, side='left')
+        hi = np.searchsorted(self.bucket_keys, row_keys, side='right')
+        n_candidates = np.where(row_keys >= 0, hi - lo, 0)
+
+        # Expand (row, candidate) pairs and score all of them at once: (n_pairs, 24)
+        pair_row = np.repeat(np.arange(n), n_candidates)
+        pair_first = np.repeat(np.cumsum(n_candidates) - n_candidates, n_candidates)
+        pair_slot = self.bucket_slots[np.repeat(lo, n_candidates) + np.arange(len(pair_row)) - pair_first]
+        future = self.slot_keys[np.minimum(pair_slot[:, None] + np.arange(1, N_HORIZONS + 1), len(self.slot_keys) - 1)]
+        pair_score = ((future == true_keys[pair_row]) & (future >= 0)).sum(axis=1)
+
+        best = np.full(n, -1, dtype=np.int64)
+        np.maximum.at(best, pair_row, pair_score)
+        is_best = (pair_score == best[pair_row]) & (pair_score >= self.min_true_matches)
+        n_best = np.bincount(pair_row[is_best], minlength=n)
+        # Smallest best-scoring slot per row (the unique one where n_best == 1)
+        best_slot = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(best_slot, pair_row[is_best], pair_slot[is_best])
+
+        status = np.where(n_best == 0, STATUS_UNMATCHED, np.where(n_best == 1, STATUS_MATCHED, STATUS_AMBIGUOUS))
+        # Two rows claiming the same bar are both ambiguous
+        matched = np.flatnonzero(status == STATUS_MATCHED)
+        _, inverse, counts = np.unique(best_slot[matched], return_inverse=True, return_counts=True)
+        status[matched[counts[inverse] > 1]] = STATUS_AMBIGUOUS
+        origins = np.where(status == STATUS_MATCHED, self.t0 + best_slot * self.step, np.iinfo(np.int64).min)
+        return pd.DataFrame({
+            'origin': origins.view('datetime64[ns]'),
+            'status': status,
+            'n_candidates': n_candidates,
+            'score': np.maximum(best, 0),
+        })
+
+
+def recover_prediction_origins(files=None, ohlcv_csv=ORIGIN_OHLCV_CSV, decimals=PRICE_DECIMALS[ORIGIN_ASSET]):
+    """
+    Recover origins for every prediction CSV, comparing prices at `decimals` (the asset's tick).
+    Returns ({model: origins}, report frame).
+    """
+    if files is None:
+        files = {m: os.path.join(PREDICTION_DIR, f) for m, f in PREDICTION_FILES.items()}
+    index = HourlyCloseIndex.from_ohlcv(ohlcv_csv, decimals)
+    origins, reports = {}, []
+    for model, path in files.items():
+        parsed = read_prediction_csv(path, model)
+        rec = index.recover(parsed['current_close'], parsed['true'])
+        origins[model] = rec['origin'].to_numpy()
+        reports.append(rec.assign(model=model, row=np.arange(len(rec)), current_close=parsed['current_close']))
+    report = pd.concat(reports, ignore_index=True)[['model', 'row', 'current_close', 'origin', 'status', 'n_candidates', 'score']]
+    return origins, report
+
+
+def asset_inputs(asset, prediction_dir=None, models=None, ohlcv_dir=OHLCV_DIR):
+    """
+    Input files of one asset: ({model: prediction CSV} of the files that exist, OHLCV CSV, status),
+    status being None when both exist, else MISSING_PREDICTIONS / MISSING_OHLCV.
+    """
+    prediction_dir = PREDICTION_DIRS.get(asset) if prediction_dir is None else prediction_dir
+    files = {} if prediction_dir is None else {
+        m: os.path.join(prediction_dir, f) for m, f in PREDICTION_FILES.items()
+        if (models is None or m in models) and os.path.exists(os.path.join(prediction_dir, f))
+    }
+    ohlcv_csv = os.path.join(ohlcv_dir, OHLCV_FILES[asset]) if asset in OHLCV_FILES else None
+    if not files:
+        return files, ohlcv_csv, MISSING_PREDICTIONS
+    if ohlcv_csv is None or not os.path.exists(ohlcv_csv):
+        return files, ohlcv_csv, MISSING_OHLCV
+    return files, ohlcv_csv, None
+
+
+def recovered_prediction_tensor(asset, store_dir, prediction_dir=None, models=None, ohlcv_dir=OHLCV_DIR,
+                                dtype=TENSOR_DTYPE):
+    """
+    Recover the origins of an asset's per-model prediction CSVs against its hourly closes and
+    stack the matched rows into a timestamp prediction tensor at `store_dir`.
+    Returns (store_dir, report, None), or (None, report, status) with status MISSING_PREDICTIONS /
+    MISSING_OHLCV if an input file is absent, NO_RECOVERED_ORIGINS if no row matched.
+    """
+    files, ohlcv_csv, status = asset_inputs(asset, prediction_dir, models, ohlcv_dir)
+    if status is not None:
+        return None, pd.DataFrame(columns=['model', 'row', 'current_close', 'origin', 'status', 'n_candidates', 'score']), status
+    origins, report = recover_prediction_origins(files, ohlcv_csv, PRICE_DECIMALS[asset])
+    if not (report['status'] == STATUS_MATCHED).any():
+        return None, report, NO_RECOVERED_ORIGINS
+    return build_prediction_tensor(files, store_dir, origins=origins, dtype=dtype), report, None
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    prediction_dir = sys.argv[1] if len(sys.argv) > 1 else PREDICTION_DIR
+    files = {m: os.path.join(prediction_dir, f) for m, f in PREDICTION_FILES.items()}
+    origins, report = recover_prediction_origins(files)
+
+    report_path = os.path.join(prediction_dir, REPORT_FILE)
+    report.to_csv(report_path, index=False)
+    counts = report.groupby(['model', 'status']).size().unstack(fill_value=0)
+    print(">>> Origin recovery against", ORIGIN_OHLCV_CSV)
+    print(counts.reindex(columns=[STATUS_MATCHED, STATUS_AMBIGUOUS, STATUS_UNMATCHED], fill_value=0).to_string())
+    print(f">>> Row report saved to: {report_path}")
+
+    if (report['status'] == STATUS_MATCHED).any():
+        store_dir = build_prediction_tensor(files, origins=origins)
+        print(f">>> Prediction tensor with recovered origins: {store_dir}")
+    else:
+        print(">>> No origin recovered; prediction tensor not rebuilt")
@@ -0,0 +1,29 @@
+import os
+import sys
+
+# ================= Repository Layout =================
+# Default paths of the src/method scripts are built here from this file's location, so every
+# script reads and writes the same files whatever the working directory. Absolute paths
+# (e.g. local replacements of the anonymized ones) are returned unchanged.
+METHOD_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(METHOD_DIR))
+GET_DATA_DIR = os.path.join(REPO_DIR, 'src', 'get_data')
+
+# src/get_data modules (e.g. ohlcv_store) are imported by module name like src/method siblings:
+# importing this module puts their directory on the search path, after src/method's own
+if GET_DATA_DIR not in sys.path:
+    sys.path.append(GET_DATA_DIR)
+
+
+def method_path(*parts):
+    """
+    Path under src/method: the scripts' own inputs and outputs (policy file, artifacts, reports).
+    """
+    return os.path.join(METHOD_DIR, *parts)
+
+
+def repo_path(*parts):
+    """
+    Path under the repository root: the shared dataset/ tree.
+    """
+    return os.path.join(REPO_DIR, *parts)
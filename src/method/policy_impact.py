@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from priors import N_HORIZONS
+from train import POLICY_PATH, align_policy_time, match_policy_origins
+from run_matrix import MODELS, ASSETS
+from prediction_store import load_prediction_tensor
+from origin_recovery import OHLCV_DIR, OHLCV_FILES, PREDICTION_DIRS, MISSING_PREDICTIONS, load_hourly_closes, recovered_prediction_tensor
+from paths import method_path
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+OUTPUT_DIR = method_path('policy_impact')
+OUTPUT_TEMPLATE = 'Policy_Impact_Analysis_{model}_{asset}.csv'
+TENSOR_TEMPLATE = '_tensor_{asset}'     # recovered-origin prediction tensor of each asset, inside OUTPUT_DIR
+# The reference table (dataset/model_prediction/Policy_Impact_Analysis_PatchTST.csv) uses the hourly
+# OHLCV closes, not the CSVs' true_t+k (about $1 apart): close_at_t is the close of the 1h bar opening
+# at the origin, and with realized = close of bar origin + k hours
+#   h{k}_diff = realized - pred          (actual minus forecast, like train.py's residual target)
+#   h{k}_pct  = h{k}_diff / realized * 100
+DIFF_DECIMALS = 2
+PCT_DECIMALS = 4
+
+EVENT_COLUMNS = ['policy_id', 'event', 'direction', 'intensity', 'forecast_origin_t', 'close_at_t']
+IMPACT_COLUMNS = [c for k in range(1, N_HORIZONS + 1) for c in (f'h{k}_diff', f'h{k}_pct')]
+
+# ================= Inputs =================
+
+def load_impact_events(policy_path=POLICY_PATH):
+    """
+    Every event of the policy file in file order (no whitelist):
+    policy_id, event (raw name), direction, intensity and the aligned forecast origin.
+    """
+    events = []
+    with open(policy_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            item = json.loads(line)
+            events.append({
+                'policy_id': item['id'],
+                'event': item['event_meta']['event_name'],
+                'direction': item['qualitative_logic']['direction'],
+                'intensity': item['quantitative_pulse']['intensity'],
+                'timestamp': align_policy_time(item['timestamp']),
+            })
+    return pd.DataFrame(events, columns=['policy_id', 'event', 'direction', 'intensity', 'timestamp'])
+
+
+def closes_at(hourly, times):
+    """
+    Close of the hourly bar opening at each time, any shape (NaN where there is no such bar).
+    `hourly` is origin_recovery.load_hourly_closes output.
+    """
+    bar_times, close = hourly
+    keys = np.asarray(times, dtype='datetime64[ns]').view('int64')
+    if len(bar_times) == 0:
+        return np.full(keys.shape, np.nan)
+    idx = np.minimum(np.searchsorted(bar_times, keys), len(bar_times) - 1)
+    return np.where(bar_times[idx] == keys, close[idx], np.nan)
+
+# ================= Impact Tables =================
+
+def impact_table(events, origins, y_pred, realized, close_at_t):
+    """
+    Policy impact rows of one (model, asset) cell: every event whose aligned origin has a forecast,
+    in event order, with h{k}_diff = realized - pred and h{k}_pct = diff / realized (%).
+    `realized` (n, 24) and `close_at_t` (n,) are hourly closes aligned with `origins`.
+    """
+    rows = match_policy_origins(events['timestamp'], origins)
+    hit = rows >= 0
+    rows = rows[hit]
+    diff = realized[rows] - y_pred[rows]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = diff / realized[rows] * 100
+
+    impact = np.empty((len(rows), 2 * N_HORIZONS))
+    impact[:, 0::2] = np.round(diff, DIFF_DECIMALS)
+    impact[:, 1::2] = np.round(pct, PCT_DECIMALS)
+    table = events.loc[hit, ['policy_id', 'event', 'direction', 'intensity']].reset_index(drop=True)
+    table['forecast_origin_t'] = pd.DatetimeIndex(np.asarray(origins)[rows]).strftime('%Y-%m-%d %H:%M:%S')
+    table['close_at_t'] = np.round(close_at_t[rows], DIFF_DECIMALS)
+    return pd.concat([table, pd.DataFrame(impact, columns=IMPACT_COLUMNS)], axis=1)
+
+
+def generate_policy_impact(models=MODELS, assets=ASSETS, policy_path=POLICY_PATH,
+                           prediction_dirs=PREDICTION_DIRS, output_dir=OUTPUT_DIR, ohlcv_dir=OHLCV_DIR):
+    """
+    Write the policy impact table of every (model, asset) cell in one run: events are parsed once;
+    per asset, the per-model prediction CSVs get their origins recovered and are stacked into one
+    float64 prediction tensor (exact 2-decimal diffs), and the hourly closes are loaded once for all models.
+    Returns one record per cell: rows written, or why the cell was skipped ('missing predictions' /
+    'missing ohlcv' for absent input files, 'no recovered origins', 'model not in predictions').
+    """
+    events = load_impact_events(policy_path)
+    os.makedirs(output_dir, exist_ok=True)
+    hours = np.arange(1, N_HORIZONS + 1) * np.timedelta64(1, 'h')
+    records = []
+    for asset in assets:
+        if asset not in prediction_dirs:
+            records.extend({'model': m, 'asset': asset, 'status': MISSING_PREDICTIONS} for m in models)
+            continue
+        store_dir, report, status = recovered_prediction_tensor(
+            asset, os.path.join(output_dir, TENSOR_TEMPLATE.format(asset=asset)),
+            prediction_dirs[asset], models, ohlcv_dir, dtype='float64'
+        )
+        if store_dir is None:
+            records.extend({'model': m, 'asset': asset, 'status': status} for m in models)
+            continue
+        tensor = load_prediction_tensor(store_dir)
+        hourly = load_hourly_closes(os.path.join(ohlcv_dir, OHLCV_FILES[asset]))
+
+        for model in models:
+            if model not in tensor.models:
+                records.append({'model': model, 'asset': asset, 'status': 'model not in predictions'})
+                continue
+            origins_ns, y_pred, _, _ = tensor.model_arrays(model)
+            origins = origins_ns.view('datetime64[ns]')
+            realized = closes_at(hourly, origins[:, None] + hours)
+            table = impact_table(events, origins, y_pred, realized, closes_at(hourly, origins))
+            path = os.path.join(output_dir, OUTPUT_TEMPLATE.format(model=model, asset=asset))
+            table.to_csv(path, index=False)
+            records.append({'model': model, 'asset': asset, 'status': 'ok', 'n_events': len(table),
+                            'n_unmatched': len(events) - len(table), 'path': path})
+    return pd.DataFrame(records)
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR
+    t0 = time.perf_counter()
+    summary = generate_policy_impact(output_dir=output_dir)
+    print(f">>> Policy impact tables for {len(MODELS)} models x {len(ASSETS)} assets in {time.perf_counter() - t0:.2f}s")
+    print(summary.drop(columns=['path'], errors='ignore').to_string(index=False))
+    print(f">>> Tables saved to: {output_dir}")
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from paths import repo_path
+from ohlcv_store import retry_on_swap
+from priors import N_HORIZONS
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+PREDICTION_DIR = repo_path('dataset', 'model_prediction')
+PREDICTION_FILES = {
+    'PatchTST': 'PatchTST_final_prediction.csv',
+    'DLinear': 'DLinear_final_prediction.csv',
+    'iTransformer': 'iTransformer_final_prediction.csv',
+    'TimeLLM': 'TimeLLM_Final_Predictions.csv',
+}
+TENSOR_DIRNAME = '_tensor'
+TENSOR_VERSION = 2
+TENSOR_DTYPE = 'float32'
+
+# Files without origins are aligned on their current_close sequences: the shift (in rows,
+# relative to the first model) with the smallest median relative close difference wins
+MAX_ROW_SHIFT = 24
+ROW_ALIGN_TOLERANCE = 5e-4      # a wrong shift is ~5x this on the hourly BTC files
+
+FIELDS = ['pred', 'true']
+ORIGIN_COLUMN = 'forecast_origin_t'
+NAT = np.iinfo(np.int64).min
+
+# ================= Tensor Layout =================
+#   <store>/values.npy         (model, origin, horizon, {pred, true}) float32, NaN where absent
+#   <store>/current_close.npy  (model, origin) float32, close at the forecast origin (NaN if unknown)
+#   <store>/present.npy        (model, origin) bool, the model has a forecast at that origin
+#   <store>/origins.npy        (origin,) int64: epoch ns (origin_kind 'timestamp') or aligned row position ('row')
+#   <store>/meta.json          version, model vocabulary, origin_kind, source files (mtime / size)
+# origin_kind is 'timestamp' when every model has origins (a forecast_origin_t column or
+# recovered origins passed to build_prediction_tensor); otherwise rows are aligned on
+# their current_close sequences (see row_offsets) and origins are positions on that axis.
+
+def horizon_columns(columns, field):
+    """
+    Column names of one field for t+1..t+24, in either naming scheme
+    ('pred_t+1' as in dataset/model_prediction, or 't+1_pred' as in train.PRED_PATH).
+    """
+    for pattern in (f'{field}_t+{{}}', f't+{{}}_{field}'):
+        names = [pattern.format(i) for i in range(1, N_HORIZONS + 1)]
+        if all(n in columns for n in names):
+            return names
+    raise KeyError(f"No {field} columns for t+1..t+{N_HORIZONS}")
+
+
+def read_prediction_csv(csv_path, model=None):
+    """
+    Parse one wide prediction CSV (optionally a multi-model file with a `model` column)
+    into arrays: {'pred': (n, 24), 'true': (n, 24), 'current_close': (n,), 'origins': (n,) int64 ns or None}.
+    """
+    df = pd.read_csv(csv_path)
+    if 'model' in df.columns and model is not None:
+        df = df[df['model'] == model]
+    out = {field: df[horizon_columns(df.columns, field)].to_numpy(dtype=np.float64) for field in FIELDS}
+    out['current_close'] = df['current_close'].to_numpy(dtype=np.float64) if 'current_close' in df.columns else np.full(len(df), np.nan)
+    out['origins'] = pd.to_datetime(df[ORIGIN_COLUMN]).values.astype('datetime64[ns]').view('int64') if ORIGIN_COLUMN in df.columns else None
+    return out
+
+# ================= Converter =================
+
+def get_tensor_dir(prediction_dir=PREDICTION_DIR):
+    return os.path.join(prediction_dir, TENSOR_DIRNAME)
+
+
+def read_meta(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _source_stats(files):
+    stats = {}
+    for model, path in files.items():
+        st = os.stat(path)
+        stats[model] = {'path': os.path.basename(path), 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+    return stats
+
+
+def is_tensor_fresh(files, store_dir):
+    """
+    A tensor is fresh if it was built from exactly these versions of the source CSVs.
+    """
+    meta = read_meta(store_dir)
+    if meta is None or meta.get('version') != TENSOR_VERSION:
+        return False
+    return meta.get('sources') == _source_stats(files)
+
+
+def row_offsets(parsed, max_shift=MAX_ROW_SHIFT, tolerance=ROW_ALIGN_TOLERANCE):
+    """
+    Shift of every model's rows against the first model's (model row i is reference row i + shift),
+    found by matching current_close sequences. Raises ValueError if a model matches no shift
+    within `tolerance`, or has no closes and a different number of rows.
+    """
+    models = list(parsed)
+    ref = parsed[models[0]]['current_close']
+    offsets = {models[0]: 0}
+    for model in models[1:]:
+        closes = parsed[model]['current_close']
+        if not (np.isfinite(ref).any() and np.isfinite(closes).any()):
+            if len(closes) != len(ref):
+                raise ValueError(f"{model}: {len(closes)} rows vs {len(ref)} for {models[0]} and no current_close to align them")
+            offsets[model] = 0
+            continue
+        errors = {}
+        for shift in range(-max_shift, max_shift + 1):
+            i = np.arange(max(0, -shift), min(len(closes), len(ref) - shift))
+            if len(i) >= min(len(closes), len(ref)) // 2:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    errors[shift] = np.nanmedian(np.abs(closes[i] / ref[i + shift] - 1))
+        shift = min(errors, key=errors.get)
+        if not errors[shift] <= tolerance:
+            raise ValueError(f"{model}: rows do not line up with {models[0]} "
+                             f"(best shift {shift}, median close difference {errors[shift]:.4%})")
+        offsets[model] = shift
+    return offsets
+
+
+def build_prediction_tensor(files=None, store_dir=None, origins=None, dtype=TENSOR_DTYPE):
+    """
+    Pack every model's predictions into one (model, origin, horizon, {pred, true}) tensor
+    on the union origin axis, written atomically (temporary sibling directory, then swapped in).
+    `files` maps model -> CSV path (default: PREDICTION_FILES in PREDICTION_DIR);
+    `origins` optionally maps model -> per-row origin timestamps for files without a
+    forecast_origin_t column (e.g. recovered from OHLCV closes).
+    """
+    if files is None:
+        files = {m: os.path.join(PREDICTION_DIR, f) for m, f in PREDICTION_FILES.items()}
+    store_dir = get_tensor_dir(os.path.dirname(next(iter(files.values())))) if store_dir is None else store_dir
+    origins = origins or {}
+
+    parsed = {}
+    for model, path in files.items():
+        parsed[model] = read_prediction_csv(path, model)
+        if model in origins:
+            row_origins = pd.DatetimeIndex(origins[model]).as_unit('ns').asi8
+            if len(row_origins) != len(parsed[model]['pred']):
+                raise ValueError(f"{model}: {len(row_origins)} origins for {len(parsed[model]['pred'])} rows")
+            parsed[model]['origins'] = row_origins
+
+    by_time = all(p['origins'] is not None for p in parsed.values())
+    if by_time:
+        # Rows without a (recovered) origin are left out of the tensor
+        for p in parsed.values():
+            keep = p['origins'] != NAT
+            for key in list(p):
+                p[key] = p[key][keep]
+            if len(np.unique(p['origins'])) != len(p['origins']):
+                raise ValueError("Duplicate forecast origins within one model")
+        axis = np.unique(np.concatenate([p['origins'] for p in parsed.values()]))
+        rows_of = {m: np.searchsorted(axis, p['origins']) for m, p in parsed.items()}
+    else:
+        offsets = row_offsets(parsed)
+        first = min(offsets.values())
+        rows_of = {m: np.arange(len(p['pred'])) + offsets[m] - first for m, p in parsed.items()}
+        axis = np.arange(max(r[-1] + 1 if len(r) else 0 for r in rows_of.values()), dtype=np.int64)
+
+    models = list(files)
+    values = np.full((len(models), len(axis), N_HORIZONS, len(FIELDS)), np.nan, dtype=dtype)
+    current_close = np.full((len(models), len(axis)), np.nan, dtype=dtype)
+    present = np.zeros((len(models), len(axis)), dtype=bool)
+    for m, model in enumerate(models):
+        rows = rows_of[model]
+        for f, field in enumerate(FIELDS):
+            values[m, rows, :, f] = parsed[model][field]
+        current_close[m, rows] = parsed[model]['current_close']
+        present[m, rows] = True
+
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, arr in (('values', values), ('current_close', current_close), ('present', present), ('origins', axis)):
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(arr))
+    meta = {
+        'version': TENSOR_VERSION,
+        'models': models,
+        'fields': FIELDS,
+        'n_horizons': N_HORIZONS,
+        'n_origins': int(len(axis)),
+        'origin_kind': 'timestamp' if by_time else 'row',
+        'dtype': str(np.dtype(dtype)),
+        'sources': _source_stats(files),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the new store in (directories cannot be os.replace'd over non-empty ones)
+    old_dir = f"{store_dir}.old-{os.getpid()}"
+    if os.path.isdir(store_dir):
+        os.rename(store_dir, old_dir)
+    os.rename(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return store_dir
+
+# ================= Loader API =================
+
+class PredictionTensor:
+    """
+    Memory-mapped prediction tensor: values[model, origin, horizon, field].
+    """
+    def __init__(self, store_dir, mmap=True):
+        meta = read_meta(store_dir)
+        if meta is None or meta.get('version') != TENSOR_VERSION:
+            raise FileNotFoundError(f"No prediction tensor (version {TENSOR_VERSION}) in {store_dir}")
+        mmap_mode = 'r' if mmap else None
+        load = lambda name: np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+        self.meta = meta
+        self.models = list(meta['models'])
+        self.origin_kind = meta['origin_kind']
+        self.values = load('values')
+        self.current_close = load('current_close')
+        self.present = load('present')
+        self.origins = load('origins')
+        if read_meta(store_dir) != meta:
+            raise FileNotFoundError(f"{store_dir} was replaced while loading")
+
+    @property
+    def origin_index(self):
+        """
+        Origins as a DatetimeIndex (timestamp stores only).
+        """
+        if self.origin_kind != 'timestamp':
+            raise ValueError("This tensor is aligned by row position; it has no origin timestamps")
+        return pd.DatetimeIndex(np.asarray(self.origins).view('datetime64[ns]'), name=ORIGIN_COLUMN)
+
+    def model_index(self, model):
+        if model not in self.models:
+            raise KeyError(f"Unknown model {model!r}, expected one of {self.models}")
+        return self.models.index(model)
+
+    def field(self, name):
+        """
+        (model, origin, horizon) view of one field, e.g. tensor.field('pred').
+        """
+        return self.values[..., FIELDS.index(name)]
+
+    def model_arrays(self, model, dtype=np.float64):
+        """
+        Contiguous arrays of one model's present origins:
+        (origins int64 (n,), pred (n, 24), true (n, 24), current_close (n,)).
+        """
+        m = self.model_index(model)
+        rows = np.flatnonzero(self.present[m])
+        block = self.values[m, rows]
+        return (
+            np.asarray(self.origins)[rows],
+            np.ascontiguousarray(block[..., 0], dtype=dtype),
+            np.ascontiguousarray(block[..., 1], dtype=dtype),
+            np.asarray(self.current_close[m, rows], dtype=dtype),
+        )
+
+
+def ensure_prediction_tensor(files=None, store_dir=None):
+    """
+    Return the tensor store directory, (re)building it if it is missing or a source CSV changed.
+    """
+    if files is None:
+        files = {m: os.path.join(PREDICTION_DIR, f) for m, f in PREDICTION_FILES.items()}
+    store_dir = get_tensor_dir(os.path.dirname(next(iter(files.values())))) if store_dir is None else store_dir
+    if not is_tensor_fresh(files, store_dir):
+        build_prediction_tensor(files, store_dir)
+    return store_dir
+
+
+def load_prediction_tensor(store_dir=None, mmap=True):
+    store_dir = get_tensor_dir() if store_dir is None else store_dir
+    # The store is briefly missing while build_prediction_tensor swaps a new one in
+    return retry_on_swap(lambda: PredictionTensor(store_dir, mmap))
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    prediction_dir = sys.argv[1] if len(sys.argv) > 1 else PREDICTION_DIR
+    files = {m: os.path.join(prediction_dir, f) for m, f in PREDICTION_FILES.items()}
+    t0 = time.perf_counter()
+    store_dir = build_prediction_tensor(files)
+    t1 = time.perf_counter()
+    tensor = load_prediction_tensor(store_dir)
+    t2 = time.perf_counter()
+    print(f">>> {len(tensor.models)} models x {len(tensor.origins)} origins ({tensor.origin_kind}) x "
+          f"{N_HORIZONS} horizons -> {store_dir} | build {t1 - t0:.2f}s | load {(t2 - t1) * 1000:.1f}ms")
+    for m, model in enumerate(tensor.models):
+        print(f"  - {model:<13} forecasts: {int(tensor.present[m].sum())}")
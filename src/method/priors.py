@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+# ================= Configuration Area =================
+
+DIRECTIONS = (-1, 0, 1)     # qualitative_logic.direction values
+N_HORIZONS = 24
+
+# ================= Prior Table =================
+
+def encode_directions(directions):
+    """
+    Map direction values to codes 0..len(DIRECTIONS)-1; unknown values get -1.
+    """
+    directions = np.asarray(directions)
+    codes = np.full(directions.shape, -1, dtype=np.int64)
+    for code, value in enumerate(DIRECTIONS):
+        codes[directions == value] = code
+    return codes
+
+
+class PriorTable:
+    """
+    Dense NSRC residual priors.
+
+    group_priors[g, d]   mean y_vector of (event_group g, direction d), valid where has_group[g, d]
+    direction_priors[d]  mean y_vector of direction d over all groups, valid where has_direction[d]
+
+    `resolved` folds the fallback chain (group prior -> direction prior -> zeros) into one
+    (n_groups + 1, n_directions + 1, 24) array whose last row / column stand for unknown
+    groups / directions, so predicting a whole frame is a single fancy-indexing call.
+
+    group_weights / direction_weights hold the sample weight (count) behind each prior when
+    it is known (tables built from sums), so the sums can be recovered; None otherwise.
+    """
+    def __init__(self, groups, group_priors, has_group, direction_priors, has_direction,
+                 group_weights=None, direction_weights=None):
+        self.groups = list(groups)
+        self.group_codes = {g: i for i, g in enumerate(self.groups)}
+        self.group_priors = group_priors
+        self.has_group = has_group
+        self.direction_priors = direction_priors
+        self.has_direction = has_direction
+        self.group_weights = group_weights
+        self.direction_weights = direction_weights
+
+        n_groups, n_dirs = len(self.groups), len(DIRECTIONS)
+        resolved = np.zeros((n_groups + 1, n_dirs + 1, N_HORIZONS))
+        resolved[:, :n_dirs] = np.where(has_direction[:, None], direction_priors, 0.0)[None]
+        resolved[:n_groups, :n_dirs] = np.where(has_group[..., None], group_priors, resolved[:n_groups, :n_dirs])
+        self.resolved = resolved
+
+    @classmethod
+    def from_sums(cls, groups, group_sums, group_counts, direction_sums, direction_counts):
+        """
+        Build from per-(group, direction) and per-direction sums / counts of y_vector.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            group_priors = np.where(group_counts[..., None] > 0, group_sums / group_counts[..., None], 0.0)
+            direction_priors = np.where(direction_counts[:, None] > 0, direction_sums / direction_counts[:, None], 0.0)
+        return cls(groups, group_priors, group_counts > 0, direction_priors, direction_counts > 0,
+                   group_counts, direction_counts)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Group means of `y_vector` by (event_group, direction) and by direction.
+        """
+        group_codes, groups = pd.factorize(df['event_group'])
+        dir_codes = encode_directions(df['direction'].to_numpy())
+        y = np.stack(df['y_vector'].values) if len(df) else np.zeros((0, N_HORIZONS))
+
+        n_groups, n_dirs = len(groups), len(DIRECTIONS)
+        known = dir_codes >= 0
+        flat = group_codes[known] * n_dirs + dir_codes[known]
+
+        group_sums = np.zeros((n_groups * n_dirs, N_HORIZONS))
+        np.add.at(group_sums, flat, y[known])
+        group_counts = np.bincount(flat, minlength=n_groups * n_dirs)
+        direction_sums = np.zeros((n_dirs, N_HORIZONS))
+        np.add.at(direction_sums, dir_codes[known], y[known])
+        direction_counts = np.bincount(dir_codes[known], minlength=n_dirs)
+
+        return cls.from_sums(
+            list(groups),
+            group_sums.reshape(n_groups, n_dirs, N_HORIZONS), group_counts.reshape(n_groups, n_dirs),
+            direction_sums, direction_counts
+        )
+
+    @classmethod
+    def from_dicts(cls, priors, global_priors):
+        """
+        Inverse of to_dicts: build from the legacy ({(event_group, direction): prior}, {direction: prior}) dicts.
+        """
+        groups = list(dict.fromkeys(group for group, _ in priors))
+        codes = {g: i for i, g in enumerate(groups)}
+        n_dirs = len(DIRECTIONS)
+        group_priors = np.zeros((len(groups), n_dirs, N_HORIZONS))
+        has_group = np.zeros((len(groups), n_dirs), dtype=bool)
+        for (group, direction), prior in priors.items():
+            d = DIRECTIONS.index(direction)
+            group_priors[codes[group], d] = prior
+            has_group[codes[group], d] = True
+        direction_priors = np.zeros((n_dirs, N_HORIZONS))
+        has_direction = np.zeros(n_dirs, dtype=bool)
+        for direction, prior in global_priors.items():
+            d = DIRECTIONS.index(direction)
+            direction_priors[d] = prior
+            has_direction[d] = True
+        return cls(groups, group_priors, has_group, direction_priors, has_direction)
+
+    def encode(self, event_groups, directions):
+        """
+        Integer codes into `resolved`; unknown groups / directions map to the fallback row / column.
+        """
+        unknown_group = len(self.groups)
+        g = np.fromiter((self.group_codes.get(e, unknown_group) for e in event_groups), dtype=np.int64, count=len(event_groups))
+        d = encode_directions(directions)
+        d = np.where(d < 0, len(DIRECTIONS), d)
+        return g, d
+
+    def predict(self, df):
+        """
+        Residual prior vectors for every row of a frame with `event_group` and `direction`: (n, 24).
+        """
+        g, d = self.encode(df['event_group'].to_numpy(), df['direction'].to_numpy())
+        return self.resolved[g, d]
+
+    def to_dicts(self):
+        """
+        Legacy ({(event_group, direction): prior}, {direction: prior}) dicts.
+        """
+        p = {
+            (group, DIRECTIONS[d]): self.group_priors[g, d]
+            for g, group in enumerate(self.groups) for d in range(len(DIRECTIONS)) if self.has_group[g, d]
+        }
+        gp = {DIRECTIONS[d]: self.direction_priors[d] for d in range(len(DIRECTIONS)) if self.has_direction[d]}
+        return p, gp
+
+
+class PriorPrefix:
+    """
+    Cumulative (event_group, direction) and direction sums over a time-sorted frame.
+
+    Built once in O(N); the PriorTable of any prefix df.iloc[:n] (e.g. every
+    TimeSeriesSplit training fold) then comes out by subtraction of two cumulative
+    sums per key, instead of re-running the group means over the prefix.
+    """
+    def __init__(self, df):
+        group_codes, groups = pd.factorize(df['event_group'])
+        dir_codes = encode_directions(df['direction'].to_numpy())
+        y = np.stack(df['y_vector'].values) if len(df) else np.zeros((0, N_HORIZONS))
+
+        self.groups = list(groups)
+        self.n_rows = len(df)
+        n_dirs = len(DIRECTIONS)
+        known = dir_codes >= 0
+        self._group_index = self._build(np.where(known, group_codes * n_dirs + dir_codes, -1), len(self.groups) * n_dirs, y)
+        self._direction_index = self._build(dir_codes, n_dirs, y)
+
+    def _build(self, keys, n_keys, y):
+        # Rows sorted by (key, row); unknown keys (-1) are pushed past the last key and never queried
+        keys = np.where(keys < 0, n_keys, keys)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        composite = sorted_keys * (self.n_rows + 1) + order
+        key_start = np.searchsorted(sorted_keys, np.arange(n_keys), side='left')
+        cum = np.zeros((len(order) + 1, N_HORIZONS))
+        np.cumsum(y[order], axis=0, out=cum[1:])
+        return composite, key_start, cum, n_keys
+
+    def _prefix_sums(self, index, n):
+        composite, key_start, cum, n_keys = index
+        end = np.searchsorted(composite, np.arange(n_keys) * (self.n_rows + 1) + n, side='left')
+        return cum[end] - cum[key_start], end - key_start
+
+    def table(self, n):
+        """
+        PriorTable of the first n rows (same result as PriorTable.from_frame(df.iloc[:n])
+        up to float summation order; groups first seen after row n have no group prior).
+        """
+        n_dirs = len(DIRECTIONS)
+        group_sums, group_counts = self._prefix_sums(self._group_index, n)
+        direction_sums, direction_counts = self._prefix_sums(self._direction_index, n)
+        return PriorTable.from_sums(
+            self.groups,
+            group_sums.reshape(len(self.groups), n_dirs, N_HORIZONS), group_counts.reshape(len(self.groups), n_dirs),
+            direction_sums, direction_counts
+        )
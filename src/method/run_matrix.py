@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from train import POLICY_PATH, FACTOR_SEARCH, load_policy_events, prepare_dataset_v7, train_nsrc, save_artifact, training_cutoff
+from prediction_store import load_prediction_tensor
+from origin_recovery import PREDICTION_DIRS, MISSING_PREDICTIONS, recovered_prediction_tensor
+from paths import method_path
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+MODELS = ['PatchTST', 'DLinear', 'iTransformer', 'TimeLLM']
+ASSETS = ['BTC', 'ETH', 'SOL', 'DOGE', 'TRUMP']
+# Predictions of each asset: the per-model CSVs of origin_recovery.PREDICTION_DIRS with their origins
+# recovered from the OHLCV closes, stacked into one prediction tensor per asset inside OUTPUT_DIR
+OUTPUT_DIR = method_path('nsrc_matrix')
+TENSOR_TEMPLATE = '_tensor_{asset}'
+SUMMARY_FILE = 'nsrc_matrix_summary.csv'
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# ================= Matrix Cells =================
+
+# Policy events parsed once in the parent, set once per worker process by _init_worker
+_WORKER_STATE = {}
+
+def _init_worker(policy_events, output_dir, method):
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update({'events': policy_events, 'output_dir': output_dir, 'method': method})
+
+
+def cell_dir(output_dir, model, asset):
+    return os.path.join(output_dir, f"{model}_{asset}")
+
+
+def asset_predictions(assets, models, output_dir, prediction_dirs=PREDICTION_DIRS):
+    """
+    {asset: (prediction tensor directory or None, models in it, status if None)}.
+    Each asset's per-model CSVs get their origins recovered once, in this process; the status
+    tells missing prediction / OHLCV files apart from inputs in which no origin was recovered.
+    """
+    out = {}
+    for asset in assets:
+        if asset not in prediction_dirs:
+            out[asset] = (None, [], MISSING_PREDICTIONS)
+            continue
+        store_dir, _, status = recovered_prediction_tensor(
+            asset, os.path.join(output_dir, TENSOR_TEMPLATE.format(asset=asset)), prediction_dirs[asset], models
+        )
+        out[asset] = (None, [], status) if store_dir is None else (store_dir, load_prediction_tensor(store_dir).models, None)
+    return out
+
+
+def _run_cell(model, asset, pred_path):
+    """
+    Train and evaluate one (model, asset) cell; writes its artifact and metrics record.
+    `pred_path` is a prediction CSV or tensor directory (see train.load_predictions).
+    Never raises: failures become the record's `status`.
+    """
+    record = {'model': model, 'asset': asset, 'pred_path': pred_path}
+    if not os.path.exists(pred_path):
+        return {**record, 'status': MISSING_PREDICTIONS}
+    try:
+        df = prepare_dataset_v7(pred_path, model, _WORKER_STATE['events'], verbose=False)
+        record['n_unmatched'] = df.attrs['n_unmatched']
+        if df.empty:
+            return {**record, 'status': 'no matched events'}
+        prior_table, factors, metrics = train_nsrc(df, _WORKER_STATE['method'], verbose=False)
+    except Exception as e:
+        return {**record, 'status': f"error: {e}"}
+
+    out_dir = cell_dir(_WORKER_STATE['output_dir'], model, asset)
+    os.makedirs(out_dir, exist_ok=True)
+    save_artifact(prior_table, factors, os.path.join(out_dir, 'hourly_robust_stats'), {
+        'pred_path': pred_path,
+        'model': model,
+        'asset': asset,
+        'factor_search': _WORKER_STATE['method'],
+        'n_train': metrics['n_train'],
+        'n_test': metrics['n_test'],
+        **training_cutoff(df.iloc[:metrics['n_train']]),
+    })
+
+    total_oh, total_ch = metrics['total_mae_original'], metrics['total_mae_refined']
+    record.update({
+        'status': 'ok',
+        'n_samples': len(df),
+        'n_train': metrics['n_train'],
+        'n_test': metrics['n_test'],
+        'total_mae_original': float(total_oh),
+        'total_mae_refined': float(total_ch),
+        'total_improvement_pct': float((total_oh - total_ch) / total_oh * 100) if total_oh != 0 else 0.0,
+        'hourly_factors': [float(f) for f in factors],
+        'mae_original': [float(v) for v in metrics['mae_original']],
+        'mae_refined': [float(v) for v in metrics['mae_refined']],
+    })
+    with open(os.path.join(out_dir, 'metrics.json'), 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    return record
+
+
+def run_matrix(models=MODELS, assets=ASSETS, prediction_dirs=PREDICTION_DIRS, policy_path=POLICY_PATH,
+               output_dir=OUTPUT_DIR, method=FACTOR_SEARCH, max_workers=MAX_WORKERS):
+    """
+    Train every (model, asset) cell across a process pool.
+    The policy JSONL is parsed and the prediction tensors are built once here; events are handed
+    to each worker at start-up. Cells without predictions are recorded without being submitted.
+    Returns the metrics records in (model, asset) order, independent of completion order.
+    """
+    policy_events = load_policy_events(policy_path)
+    predictions = asset_predictions(assets, models, output_dir, prediction_dirs)
+    cells, records = [], {}
+    for m in models:
+        for a in assets:
+            store_dir, store_models, status = predictions[a]
+            if store_dir is None or m not in store_models:
+                records[(m, a)] = {'model': m, 'asset': a, 'pred_path': store_dir, 'status': status or 'model not in predictions'}
+                print(f"  - {m:<13} {a:<6} {records[(m, a)]['status']}")
+            else:
+                cells.append((m, a, store_dir))
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(policy_events, output_dir, method)
+    ) as executor:
+        futures = {executor.submit(_run_cell, *cell): cell[:2] for cell in cells}
+        for future in as_completed(futures):
+            record = future.result()
+            records[futures[future]] = record
+            print(f"  - {record['model']:<13} {record['asset']:<6} {record['status']}")
+    return [records[(m, a)] for m in models for a in assets]
+
+
+def summary_table(records):
+    """
+    One row per cell: totals plus refined MAE and factor of each horizon.
+    """
+    rows = []
+    for r in records:
+        row = {k: v for k, v in r.items() if not isinstance(v, list)}
+        for h, (mae, f) in enumerate(zip(r.get('mae_refined', []), r.get('hourly_factors', [])), start=1):
+            row[f't+{h}_mae_refined'] = mae
+            row[f't+{h}_factor'] = f
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR
+    print(f">>> Training {len(MODELS)} models x {len(ASSETS)} assets on {MAX_WORKERS} workers...")
+    records = run_matrix(output_dir=output_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    df_summary = summary_table(records)
+    summary_path = os.path.join(output_dir, SUMMARY_FILE)
+    df_summary.to_csv(summary_path, index=False)
+
+    ok = df_summary[df_summary['status'] == 'ok']
+    if not ok.empty:
+        print("\n" + "="*85)
+        print(ok.pivot(index='model', columns='asset', values='total_improvement_pct')
+                .reindex(index=[m for m in MODELS if m in set(ok['model'])],
+                         columns=[a for a in ASSETS if a in set(ok['asset'])])
+                .round(2).to_string())
+        print("="*85)
+    print(f"\n>>> {len(ok)}/{len(records)} cells trained. Summary saved to: {summary_path}")
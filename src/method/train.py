@@ -6,12 +6,29 @@ from datetime import datetime, timedelta
 import joblib
 import os
 from sklearn.model_selection import TimeSeriesSplit
+from paths import method_path
+from priors import N_HORIZONS, PriorTable, PriorPrefix
+from artifact import write_artifact
+from prediction_store import horizon_columns, load_prediction_tensor
 
 # ================= Configuration Area =================
 # Anonymized paths: replace these with your actual local paths
-POLICY_PATH = 'impact_features_step1.jsonl'
-PRED_PATH = 'BTC_Final_Predictions_2025.csv'
-MODEL_SAVE_PATH = 'hourly_robust_stats.pkl'
+POLICY_PATH = method_path('impact_features_step1.jsonl')
+PRED_PATH = method_path('BTC_Final_Predictions_2025.csv')
+MODEL = 'PatchTST'
+
+# Event -> forecast-origin join (pd.merge_asof): the default zero tolerance keeps
+# V7's exact-hour match; e.g. pd.Timedelta(hours=1) with 'backward' also uses the
+# previous origin when the aligned hour is missing from the prediction file
+ORIGIN_TOLERANCE = pd.Timedelta(0)
+ORIGIN_DIRECTION = 'backward'    # 'backward' / 'forward' / 'nearest'
+MODEL_SAVE_PATH = method_path('hourly_robust_stats')   # artifact directory (see artifact.py); a '.pkl' path writes the legacy joblib dict
+
+# Hourly gain search: 'grid' (76-step grid on [0, 1.5], as in V7) or
+# 'l1' (exact L1-optimal factor per hour via weighted median, clipped to [0, 1.5])
+FACTOR_SEARCH = 'grid'
+FACTOR_GRID = np.linspace(0, 1.5, 76)
+N_CV_SPLITS = 5
 
 WHITELIST_EVENTS = [
     'Nonfarm Payrolls', 'CPI', 'Retail Sales', 'ISM', 'Jobless Claims', 
@@ -31,101 +48,224 @@ def align_policy_time(ts_str):
         dt = pd.to_datetime(ts_str)
     return dt.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
 
-def prepare_dataset_v7():
-    print(">>> Building dataset and sorting by time...")
-    df_pred = pd.read_csv(PRED_PATH)
-    df_pred = df_pred[df_pred['model'] == 'PatchTST'].copy()
-    df_pred['forecast_origin_t'] = pd.to_datetime(df_pred['forecast_origin_t'])
-    df_pred_indexed = df_pred.set_index('forecast_origin_t')
-    
-    samples = []
-    with open(POLICY_PATH, 'r', encoding='utf-8') as f:
+def load_policy_events(policy_path=POLICY_PATH):
+    """
+    Whitelisted policy events in file order: aligned forecast origin, event group, direction.
+    Independent of the prediction file, so it can be parsed once and shared across models / assets.
+    """
+    events = []
+    with open(policy_path, 'r', encoding='utf-8') as f:
         for line in f:
             item = json.loads(line)
             cleaned_event = clean_event_name(item['event_meta']['event_name'])
             if not any(core in cleaned_event for core in WHITELIST_EVENTS):
                 continue
-            t_origin = align_policy_time(item['timestamp'])
-            if t_origin in df_pred_indexed.index:
-                row = df_pred_indexed.loc[t_origin]
-                y_vector = [(row[f't+{i}_true'] / row[f't+{i}_pred'] - 1) * 100 for i in range(1, 25)]
-                samples.append({
-                    'timestamp': t_origin,
-                    'event_group': cleaned_event,
-                    'direction': item['qualitative_logic']['direction'],
-                    'y_vector': np.array(y_vector)
-                })
-    return pd.DataFrame(samples).sort_values('timestamp').reset_index(drop=True)
+            events.append({
+                'timestamp': align_policy_time(item['timestamp']),
+                'event_group': cleaned_event,
+                'direction': item['qualitative_logic']['direction'],
+            })
+    return pd.DataFrame(events, columns=['timestamp', 'event_group', 'direction'])
+
+def load_predictions(pred_path, model):
+    """
+    One model's forecasts as arrays: (origins datetime64[ns] (n,), y_pred (n, 24), y_true (n, 24)).
+    `pred_path` is a wide CSV with `model` / `forecast_origin_t` columns, or a prediction
+    tensor directory (prediction_store.py) with origin timestamps, read without parsing.
+    """
+    if os.path.isdir(pred_path):
+        tensor = load_prediction_tensor(pred_path)
+        if tensor.origin_kind != 'timestamp':
+            raise ValueError(f"{pred_path} has no forecast origin timestamps")
+        origins, y_pred, y_true, _ = tensor.model_arrays(model)
+        return origins.view('datetime64[ns]'), y_pred, y_true
+    df_pred = pd.read_csv(pred_path)
+    df_pred = df_pred[df_pred['model'] == model]
+    y_pred, y_true = forecast_matrices(df_pred)
+    return pd.to_datetime(df_pred['forecast_origin_t']).values.astype('datetime64[ns]'), y_pred, y_true
+
+def match_policy_origins(event_times, origins, tolerance=ORIGIN_TOLERANCE, direction=ORIGIN_DIRECTION):
+    """
+    Join every event time to a forecast origin with one sorted merge_asof.
+    Returns the matched row of `origins` for each event (input order), -1 where unmatched.
+    """
+    left = pd.DataFrame({
+        'timestamp': pd.DatetimeIndex(event_times).as_unit('ns'),
+        '_event_pos': np.arange(len(event_times)),
+    }).sort_values('timestamp', kind='stable')
+    right = pd.DataFrame({
+        'forecast_origin_t': pd.DatetimeIndex(origins).as_unit('ns'),
+        '_row': np.arange(len(origins)),
+    }).sort_values('forecast_origin_t', kind='stable')
+    merged = pd.merge_asof(
+        left, right,
+        left_on='timestamp', right_on='forecast_origin_t',
+        tolerance=tolerance, direction=direction
+    )
+    rows = np.full(len(event_times), -1, dtype=np.int64)
+    rows[merged['_event_pos'].to_numpy()] = merged['_row'].fillna(-1).to_numpy(dtype=np.int64)
+    return rows
+
+def forecast_matrices(df):
+    """
+    Base forecasts and realized prices of every row: two (n, 24) arrays.
+    """
+    y_pred = df[horizon_columns(df.columns, 'pred')].to_numpy(dtype=np.float64)
+    y_true = df[horizon_columns(df.columns, 'true')].to_numpy(dtype=np.float64)
+    return y_pred, y_true
+
+def prepare_dataset_v7(pred_path=PRED_PATH, model=MODEL, policy_events=None, verbose=True,
+                       tolerance=ORIGIN_TOLERANCE, direction=ORIGIN_DIRECTION):
+    """
+    Training samples (timestamp, forecast_origin_t, event_group, direction, y_vector), sorted by time;
+    `pred_vector` / `true_vector` keep the matched base forecast and realized prices.
+    The number of events without a forecast origin is kept in `df.attrs['n_unmatched']`.
+    """
+    if verbose:
+        print(">>> Building dataset and sorting by time...")
+    if policy_events is None:
+        policy_events = load_policy_events()
+    origins, y_pred_all, y_true_all = load_predictions(pred_path, model)
+
+    rows = match_policy_origins(policy_events['timestamp'], origins, tolerance, direction)
+    ok = rows >= 0
+    matched, rows = policy_events[ok], rows[ok]
+    n_unmatched = int((~ok).sum())
+    if verbose:
+        print(f">>> Matched {len(matched)}/{len(policy_events)} events to a forecast origin "
+              f"({n_unmatched} unmatched, tolerance={tolerance}, direction={direction})")
+
+    y_pred, y_true = y_pred_all[rows], y_true_all[rows]
+    columns = ['timestamp', 'forecast_origin_t', 'event_group', 'direction', 'y_vector', 'pred_vector', 'true_vector']
+    df = pd.DataFrame({
+        'timestamp': matched['timestamp'].to_numpy(),
+        'forecast_origin_t': origins[rows],
+        'event_group': matched['event_group'].to_numpy(),
+        'direction': matched['direction'].to_numpy(),
+        'y_vector': list((y_true / y_pred - 1) * 100),
+        'pred_vector': list(y_pred),
+        'true_vector': list(y_true),
+    }, columns=columns)
+    df = df.sort_values('timestamp').reset_index(drop=True)
+    df.attrs['n_unmatched'] = n_unmatched
+    return df
 
 # ================= Core: Hourly Cross-Validation Optimization =================
 
 def get_priors(df):
-    p = df.groupby(['event_group', 'direction'])['y_vector'].apply(lambda x: np.mean(np.stack(x), axis=0)).to_dict()
-    gp = df.groupby('direction')['y_vector'].apply(lambda x: np.mean(np.stack(x), axis=0)).to_dict()
-    return p, gp
+    """
+    (event_group, direction) priors with per-direction fallback, as a dense PriorTable.
+    """
+    return PriorTable.from_frame(df)
+
+def grid_search_factors(y_val, p_val, grid=FACTOR_GRID):
+    """
+    Evaluate every grid factor for every fold and hour in one broadcast:
+    (folds, grid, samples, 24) -> MAE (folds, grid, 24) -> best factor (folds, 24).
+    The first (smallest) factor wins ties, like the strict '<' of the V7 loop;
+    grid[0] = 0 is the "no correction" baseline.
+    """
+    mae = np.abs(y_val[:, None] - p_val[:, None] * grid[None, :, None, None]).mean(axis=2)
+    return grid[np.argmin(mae, axis=1)]
+
+
+def l1_optimal_factors(y_val, p_val, lo=FACTOR_GRID[0], hi=FACTOR_GRID[-1]):
+    """
+    Exact minimizer of mean|y - f * p| per fold and hour.
+    sum|y - f p| = sum |p| * |y/p - f|, so the optimum is the |p|-weighted median
+    of y/p (rows with p == 0 do not depend on f); the objective is convex, so
+    clipping to [lo, hi] gives the constrained optimum. Hours without any
+    non-zero prior fall back to 0 (circuit breaker).
+    """
+    w = np.abs(p_val)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(w > 0, y_val / p_val, 0.0)
+
+    order = np.argsort(ratio, axis=1)
+    ratio_sorted = np.take_along_axis(ratio, order, axis=1)
+    cum_w = np.cumsum(np.take_along_axis(w, order, axis=1), axis=1)
+    total = cum_w[:, -1:, :]
+    median_idx = np.argmax(cum_w >= total / 2, axis=1)
+    f = np.take_along_axis(ratio_sorted, median_idx[:, None, :], axis=1)[:, 0, :]
+    return np.where(total[:, 0, :] > 0, np.clip(f, lo, hi), 0.0)
 
-def predict_res(row, p, gp):
-    key = (row['event_group'], row['direction'])
-    return p.get(key, gp.get(row['direction'], np.zeros(24)))
 
-def find_hourly_factors_no_leakage(df_train):
+def find_hourly_factors_no_leakage(df_train, method=FACTOR_SEARCH, verbose=True, prefix=None):
     """
     Find optimal coefficients for each of the 24 hours 
     using time-series cross-validation within the training set.
+    `prefix` may be a PriorPrefix over any time-sorted frame that starts with df_train
+    (e.g. the full sample set in a walk-forward run); by default one is built here.
     """
-    tscv = TimeSeriesSplit(n_splits=5)
-    # Stores the optimal coefficient for each hour in each fold: shape (n_splits, 24)
-    fold_hourly_factors = []
+    tscv = TimeSeriesSplit(n_splits=N_CV_SPLITS)
+    # Training folds are nested prefixes of the time-sorted frame: cumulative
+    # group sums are built once and each fold's priors come out by subtraction
+    if prefix is None:
+        prefix = PriorPrefix(df_train)
+    # Validation targets and priors of every fold: shape (n_splits, n_val, 24)
+    # (TimeSeriesSplit validation folds all have the same size)
+    y_folds, p_folds = [], []
     
     for train_idx, val_idx in tscv.split(df_train):
-        sub_train, sub_val = df_train.iloc[train_idx], df_train.iloc[val_idx]
-        p, gp = get_priors(sub_train)
+        sub_val = df_train.iloc[val_idx]
+        priors = prefix.table(train_idx[-1] + 1)
         
-        y_val = np.stack(sub_val['y_vector'].values)
-        p_val = np.stack([predict_res(r, p, gp) for _, r in sub_val.iterrows()])
-        
-        current_fold_f = []
-        # Independent optimization for each hour
-        for h in range(24):
-            f_best_h, min_mae_h = 0, np.abs(y_val[:, h]).mean()
-            # Search for best intensity factor on the validation set for this specific hour
-            for f in np.linspace(0, 1.5, 76): 
-                curr_mae = np.abs(y_val[:, h] - p_val[:, h] * f).mean()
-                if curr_mae < min_mae_h:
-                    min_mae_h, f_best_h = curr_mae, f
-            current_fold_f.append(f_best_h)
-        fold_hourly_factors.append(current_fold_f)
+        y_folds.append(np.stack(sub_val['y_vector'].values))
+        p_folds.append(priors.predict(sub_val))
+    y_val, p_val = np.stack(y_folds), np.stack(p_folds)
+    
+    # Optimal coefficient for each hour in each fold: shape (n_splits, 24)
+    if method == 'grid':
+        fold_hourly_factors = grid_search_factors(y_val, p_val)
+    elif method == 'l1':
+        fold_hourly_factors = l1_optimal_factors(y_val, p_val)
+    else:
+        raise ValueError(f"Unknown FACTOR_SEARCH method: {method}")
     
     # Average results across all folds to get the final 24-hour coefficient vector
     final_hourly_fs = np.mean(fold_hourly_factors, axis=0)
-    print(f">>> Hourly optimization complete. t+1 factor: {final_hourly_fs[0]:.4f}, t+24 factor: {final_hourly_fs[-1]:.4f}")
+    if verbose:
+        print(f">>> Hourly optimization ({method}) complete. t+1 factor: {final_hourly_fs[0]:.4f}, t+24 factor: {final_hourly_fs[-1]:.4f}")
     return final_hourly_fs
 
 # ================= Statistics and Execution =================
 
-def main():
-    df = prepare_dataset_v7()
-    if df.empty: return
-
+def train_nsrc(df, method=FACTOR_SEARCH, verbose=True):
+    """
+    Strict 7:3 time split, priors and hourly factors from the training part only,
+    evaluation on the held-out part.
+    Returns (prior_table, hourly factors (24,), metrics dict).
+    """
     # 1. Strict 7:3 split
     split_idx = int(len(df) * 0.7)
     df_train, df_test = df.iloc[:split_idx], df.iloc[split_idx:]
-    print(f"Train samples: {len(df_train)} | Test samples: {len(df_test)}")
+    if verbose:
+        print(f"Train samples: {len(df_train)} | Test samples: {len(df_test)}")
 
     # 2. Calculate base priors based only on training set
-    final_priors, final_global_priors = get_priors(df_train)
+    prior_table = get_priors(df_train)
 
     # 3. Find 24 optimal coefficients based only on training set (hourly optimization)
-    robust_hourly_fs = find_hourly_factors_no_leakage(df_train)
+    robust_hourly_fs = find_hourly_factors_no_leakage(df_train, method, verbose)
 
     # 4. Evaluate on the held-out test set
     y_test_true = np.stack(df_test['y_vector'].values)
-    preds_test_raw = np.stack([predict_res(row, final_priors, final_global_priors) for _, row in df_test.iterrows()])
+    preds_test_raw = prior_table.predict(df_test)
     
     # Apply hourly factors: y_test_pred = prior * factor_vector
     y_test_pred = preds_test_raw * robust_hourly_fs
 
-    # 5. Print Report
+    metrics = {
+        'n_train': len(df_train),
+        'n_test': len(df_test),
+        'mae_original': np.abs(y_test_true).mean(axis=0),
+        'mae_refined': np.abs(y_test_true - y_test_pred).mean(axis=0),
+        'total_mae_original': np.abs(y_test_true).mean(),
+        'total_mae_refined': np.abs(y_test_true - y_test_pred).mean(),
+    }
+    return prior_table, robust_hourly_fs, metrics
+
+def print_report(robust_hourly_fs, metrics):
     print("\n" + "="*85)
     print(f"[V7 Zero Leakage - Hourly Optimization] Test Set Evaluation Details")
     print("-" * 85)
@@ -133,25 +273,61 @@ def main():
     print("-" * 85)
 
     for h in range(24):
-        oh = np.abs(y_test_true[:, h]).mean()
-        ch = np.abs(y_test_true[:, h] - y_test_pred[:, h]).mean()
+        oh = metrics['mae_original'][h]
+        ch = metrics['mae_refined'][h]
         imp = (oh - ch) / oh * 100 if oh != 0 else 0
         status = "[Circuit Breaker]" if robust_hourly_fs[h] < 0.01 else ""
         print(f"t+{h+1:<2}   | {robust_hourly_fs[h]:<12.4f} | {oh:10.4f}% | {ch:10.4f}% | {imp:8.2f}% {status}")
 
-    total_oh = np.abs(y_test_true).mean()
-    total_ch = np.abs(y_test_true - y_test_pred).mean()
+    total_oh = metrics['total_mae_original']
+    total_ch = metrics['total_mae_refined']
     total_imp = (total_oh - total_ch) / total_oh * 100
     
     print("-" * 85)
     print(f"{'Total':<6} | {'-':<12} | {total_oh:10.4f}% | {total_ch:10.4f}% | {total_imp:8.2f}%")
     print("="*85)
 
-    joblib.dump({
-        'priors': final_priors,
-        'global_priors': final_global_priors,
-        'best_hourly_factors': robust_hourly_fs
-    }, MODEL_SAVE_PATH)
+def training_cutoff(df_train):
+    """
+    Artifact metadata marking where the priors' training samples end (online_priors.py resumes
+    after it): latest timestamp in epoch ns and the (event_group, direction) of every sample there.
+    """
+    if df_train.empty:
+        return {}
+    last = df_train['timestamp'].max()
+    at_last = df_train[df_train['timestamp'] == last]
+    return {
+        'train_end': int(pd.Timestamp(last).value),
+        'train_end_keys': [[str(g), int(d)] for g, d in zip(at_last['event_group'], at_last['direction'])],
+    }
+
+def save_artifact(prior_table, robust_hourly_fs, path=MODEL_SAVE_PATH, metadata=None):
+    if path.endswith('.pkl'):
+        final_priors, final_global_priors = prior_table.to_dicts()
+        joblib.dump({
+            'priors': final_priors,
+            'global_priors': final_global_priors,
+            'best_hourly_factors': robust_hourly_fs
+        }, path)
+        return
+    write_artifact(path, prior_table, robust_hourly_fs, metadata)
+
+def main():
+    df = prepare_dataset_v7()
+    if df.empty: return
+
+    prior_table, robust_hourly_fs, metrics = train_nsrc(df)
+    print_report(robust_hourly_fs, metrics)
+    save_artifact(prior_table, robust_hourly_fs, MODEL_SAVE_PATH, {
+        'pred_path': PRED_PATH,
+        'model': MODEL,
+        'factor_search': FACTOR_SEARCH,
+        'n_train': metrics['n_train'],
+        'n_test': metrics['n_test'],
+        'total_mae_original': float(metrics['total_mae_original']),
+        'total_mae_refined': float(metrics['total_mae_refined']),
+        **training_cutoff(df.iloc[:metrics['n_train']]),
+    })
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,145 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from priors import N_HORIZONS, PriorPrefix
+from paths import method_path
+from train import PRED_PATH, MODEL, FACTOR_SEARCH, N_CV_SPLITS, prepare_dataset_v7, find_hourly_factors_no_leakage
+
+# ================= Configuration Area =================
+# Anonymized paths: replace these with your actual local paths
+REFIT_FREQ = 'MS'               # pandas offset alias of the refit calendar: 'MS' monthly, 'W-MON' weekly
+MIN_TRAIN_SAMPLES = 30          # steps with fewer training events are skipped (CV needs > N_CV_SPLITS)
+BACKTEST_END = '2026-01-01'     # last block ends here (exclusive)
+WALK_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+OUTPUT_DIR = method_path('walk_forward')
+
+METRICS = ['mae', 'mape', 'mse']
+VARIANTS = ['base', 'nsrc']     # raw model forecast / NSRC-corrected forecast
+
+# ================= Walk-Forward Steps =================
+
+def plan_steps(timestamps, freq=REFIT_FREQ, end=BACKTEST_END, min_train=MIN_TRAIN_SAMPLES):
+    """
+    Expanding-window steps over time-sorted samples: refit at every calendar boundary,
+    test on the block up to the next boundary. Only events whose 24 hourly outcomes are
+    known at the refit (origin + 24h <= boundary) are trained on, so no label leaks.
+    Returns [(step, boundary, next_boundary, n_train, test_lo, test_hi)] as row positions.
+    """
+    times = pd.DatetimeIndex(timestamps)
+    if len(times) == 0:
+        return []
+    boundaries = pd.date_range(times[0].floor('D'), pd.Timestamp(end), freq=freq)
+    boundaries = boundaries.append(pd.DatetimeIndex([pd.Timestamp(end)])).unique()
+    cuts = np.searchsorted(times.values, boundaries.values, side='left')
+    resolved = np.searchsorted(times.values, (boundaries - pd.Timedelta(hours=N_HORIZONS)).values, side='right')
+
+    steps = []
+    for b in range(len(boundaries) - 1):
+        n_train, test_lo, test_hi = int(resolved[b]), int(cuts[b]), int(cuts[b + 1])
+        if n_train < max(min_train, N_CV_SPLITS + 1) or test_hi == test_lo:
+            continue
+        steps.append((len(steps), boundaries[b], boundaries[b + 1], n_train, test_lo, test_hi))
+    return steps
+
+
+def forecast_errors(y_pred, y_true):
+    """
+    Per-horizon MAE / MAPE (%) / MSE of price forecasts, and the pooled totals.
+    """
+    err = y_true - y_pred
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.abs(err / y_true) * 100
+    per_h = {'mae': np.abs(err).mean(axis=0), 'mape': ape.mean(axis=0), 'mse': (err ** 2).mean(axis=0)}
+    total = {'mae': np.abs(err).mean(), 'mape': ape.mean(), 'mse': (err ** 2).mean()}
+    return per_h, total
+
+# Samples and cumulative priors, set once per worker process by _init_worker
+_WORKER_STATE = {}
+
+def _init_worker(df, method):
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update({'df': df, 'prefix': PriorPrefix(df), 'method': method})
+
+
+def _run_step(step):
+    """
+    Refit on the first n_train samples and correct the test block.
+    Priors come from the shared PriorPrefix (cumulative sums, no refit from zero);
+    the hourly factors are re-optimized with the same leakage-free CV as train.py.
+    """
+    _, _, _, n_train, lo, hi = step
+    df, prefix = _WORKER_STATE['df'], _WORKER_STATE['prefix']
+    factors = find_hourly_factors_no_leakage(df.iloc[:n_train], _WORKER_STATE['method'], verbose=False, prefix=prefix)
+    df_test = df.iloc[lo:hi]
+    residual = prefix.table(n_train).predict(df_test) * factors
+
+    y_pred = np.stack(df_test['pred_vector'].values)
+    y_true = np.stack(df_test['true_vector'].values)
+    return factors, y_pred, y_pred * (1 + residual / 100), y_true
+
+
+def run_walk_forward(df, freq=REFIT_FREQ, end=BACKTEST_END, min_train=MIN_TRAIN_SAMPLES,
+                     method=FACTOR_SEARCH, max_workers=WALK_WORKERS):
+    """
+    Run every walk-forward step across a process pool.
+    Returns (per-step long table, aggregate long table, factors per step (n_steps, 24)).
+    The aggregate pools all out-of-sample forecasts of all steps.
+    """
+    steps = plan_steps(df['timestamp'], freq, end, min_train)
+    if not steps:
+        raise ValueError("No walk-forward step has enough training samples")
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(df, method)) as executor:
+        outputs = list(executor.map(_run_step, steps))
+
+    rows = []
+    pooled = {v: [] for v in VARIANTS}
+    for (step, start, stop, n_train, lo, hi), (_, y_base, y_nsrc, y_true) in zip(steps, outputs):
+        for variant, y_hat in zip(VARIANTS, (y_base, y_nsrc)):
+            pooled[variant].append((y_hat, y_true))
+            per_h, total = forecast_errors(y_hat, y_true)
+            base = {'step': step, 'test_start': start, 'test_end': stop, 'n_train': n_train, 'n_test': hi - lo, 'variant': variant}
+            rows.extend({**base, 'horizon': f't+{h + 1}', **{m: per_h[m][h] for m in METRICS}} for h in range(N_HORIZONS))
+            rows.append({**base, 'horizon': 'all', **total})
+
+    agg_rows = []
+    for variant in VARIANTS:
+        y_hat = np.concatenate([p for p, _ in pooled[variant]])
+        y_true = np.concatenate([t for _, t in pooled[variant]])
+        per_h, total = forecast_errors(y_hat, y_true)
+        base = {'variant': variant, 'n_steps': len(steps), 'n_test': len(y_true)}
+        agg_rows.extend({**base, 'horizon': f't+{h + 1}', **{m: per_h[m][h] for m in METRICS}} for h in range(N_HORIZONS))
+        agg_rows.append({**base, 'horizon': 'all', **total})
+
+    return pd.DataFrame(rows), pd.DataFrame(agg_rows), np.stack([f for f, _, _, _ in outputs])
+
+# ================= Execution =================
+
+if __name__ == "__main__":
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR
+    df = prepare_dataset_v7(PRED_PATH, MODEL)
+    if df.empty:
+        sys.exit()
+
+    print(f">>> Walk-forward ({REFIT_FREQ} refits) on {WALK_WORKERS} workers...")
+    df_steps, df_agg, factors = run_walk_forward(df)
+
+    os.makedirs(output_dir, exist_ok=True)
+    df_steps.to_csv(os.path.join(output_dir, 'walk_forward_steps.csv'), index=False)
+    df_agg.to_csv(os.path.join(output_dir, 'walk_forward_aggregate.csv'), index=False)
+    pd.DataFrame(factors, columns=[f't+{h}' for h in range(1, N_HORIZONS + 1)]).to_csv(
+        os.path.join(output_dir, 'walk_forward_factors.csv'), index_label='step')
+
+    totals = df_steps[df_steps['horizon'] == 'all'].pivot(index=['step', 'test_start', 'n_train', 'n_test'], columns='variant', values='mae')
+    print("\n" + "="*85)
+    print("[Walk-Forward] Out-of-sample MAE per step")
+    print("-" * 85)
+    print(totals.to_string())
+    print("-" * 85)
+    agg = df_agg[df_agg['horizon'] == 'all'].set_index('variant')
+    for m in METRICS:
+        b, n = agg.loc['base', m], agg.loc['nsrc', m]
+        print(f"{m.upper():<5} | base {b:14.4f} | nsrc {n:14.4f} | improvement {(b - n) / b * 100 if b else 0:8.2f}%")
+    print("="*85)
+    print(f"\n>>> Reports saved to: {output_dir}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their siblings by module name (they are run from their own directory)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub in ('src/get_data', 'src/method'):
+    sys.path.insert(0, os.path.join(ROOT, sub))
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ana_match_rates as amr
+
+
+def v10_loop(df_events, df_price, input_min, output_min, threshold):
+    """
+    Reference: the original per-window loop (get_price_trend / get_majority_sentiment).
+    """
+    event_window, price_window = pd.Timedelta(minutes=input_min), pd.Timedelta(minutes=output_min)
+    end = df_price.index.max()
+    counts = {level: [0, 0] for level in amr.IMPACT_LEVELS}
+    for start in pd.date_range(df_price.index.min(), end, freq=event_window):
+        if start + event_window + price_window > end + amr.PRICE_RESOLUTION:
+            break
+        in_window = df_events[(df_events.index >= start) & (df_events.index < start + event_window)]
+        if in_window.empty:
+            continue
+        trend = amr.get_price_trend(df_price, start + event_window, start + event_window + price_window,
+                                    amr.PRICE_RESOLUTION, threshold)
+        if trend is None:
+            continue
+        events = list(zip(in_window['sentiment'], in_window['impact']))
+        for level in amr.IMPACT_LEVELS:
+            sentiment = amr.get_majority_sentiment(events, level)
+            if not pd.isna(sentiment):
+                counts[level][0] += sentiment == trend
+                counts[level][1] += 1
+    return tuple(c for level in amr.IMPACT_LEVELS for c in counts[level])
+
+
+@pytest.fixture
+def market():
+    rng = np.random.default_rng(7)
+    times = pd.date_range('2025-01-01', periods=2000, freq='5min')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, len(times))))
+    df_price = pd.DataFrame({'open': np.r_[100, close[:-1]], 'close': close}, index=times)
+    df_price.iloc[300, 0] = 0                                   # zero start price
+    df_price = df_price.drop(times[500:520])                    # missing bars
+
+    event_times = times[0] + pd.to_timedelta(np.sort(rng.integers(0, 2000 * 5, 400)), unit='min')
+    df_events = pd.DataFrame({
+        'sentiment': rng.choice(['bullish', 'bearish', 'consolidation'], 400),
+        'impact': rng.choice(['Low', 'Medium', 'High'], 400),
+    }, index=pd.DatetimeIndex(event_times, name='time'))
+    return df_events, df_price
+
+
+@pytest.mark.parametrize('input_min,output_min', [(5, 10), (30, 60), (120, 20)])
+@pytest.mark.parametrize('threshold', [0.0, 0.1])
+def test_process_scenario_matches_v10_loop(market, tmp_path, input_min, output_min, threshold):
+    df_events, df_price = market
+    counts = amr.process_scenario(df_events, df_price, input_min, output_min, str(tmp_path), threshold=threshold)
+    assert counts == v10_loop(df_events, df_price, input_min, output_min, threshold)
+    assert (tmp_path / f'input_{input_min}m_output_{output_min}m.csv').exists()
+
+
+
+def test_threshold_cube_matches_single_thresholds(market, tmp_path):
+    df_events, df_price = market
+    df_windows = amr.compute_scenario_windows(df_events, df_price, 30, 60)
+    thresholds = [0.0, 0.05, 0.1, 0.5]
+    cube = amr.threshold_match_counts(df_windows, thresholds)
+    for t, threshold in enumerate(thresholds):
+        expected = amr.summarize_scenario(df_windows, 30, 60, str(tmp_path), threshold)
+        assert tuple(cube[t].ravel()) == expected
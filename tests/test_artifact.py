@@ -0,0 +1,51 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from artifact import load_artifact, write_artifact
+from priors import N_HORIZONS, PriorTable
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(1)
+    return PriorTable.from_frame(pd.DataFrame({
+        'event_group': ['CPI', 'CPI', 'FOMC', 'NFP'],
+        'direction': [1, 1, -1, 0],
+        'y_vector': list(rng.normal(size=(4, N_HORIZONS))),
+    }))
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(tmp_path, table, mmap):
+    factors = np.linspace(0.5, 1.5, N_HORIZONS)
+    path = str(tmp_path / 'hourly_robust_stats')
+    write_artifact(path, table, factors, {'train_end': 123}, {'extra': np.arange(3)})
+    write_artifact(path, table, factors, {'train_end': 123}, {'extra': np.arange(3)})   # swaps over the old one
+
+    art = load_artifact(path, mmap=mmap)
+    loaded = art.prior_table
+    assert loaded.groups == table.groups
+    for name in ['group_priors', 'has_group', 'direction_priors', 'has_direction', 'group_weights', 'direction_weights']:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(table, name))
+    np.testing.assert_array_equal(art.hourly_factors, factors)
+    np.testing.assert_array_equal(art.arrays['extra'], np.arange(3))
+    assert art.metadata == {'train_end': 123}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['hourly_robust_stats']
+
+
+def test_round_trip_without_factors_or_weights(tmp_path, table):
+    table = PriorTable(table.groups, table.group_priors, table.has_group, table.direction_priors, table.has_direction)
+    art = load_artifact(write_artifact(str(tmp_path / 'a'), table))
+    assert art.hourly_factors is None
+    assert art.prior_table.group_weights is None and art.prior_table.direction_weights is None
+
+
+def test_legacy_pickle(tmp_path, table):
+    priors, global_priors = table.to_dicts()
+    path = str(tmp_path / 'hourly_robust_stats.pkl')
+    joblib.dump({'priors': priors, 'global_priors': global_priors, 'best_hourly_factors': [1.0] * N_HORIZONS}, path)
+    art = load_artifact(path)
+    assert art.schema_version == 0
+    np.testing.assert_array_equal(art.prior_table.resolved, table.resolved)
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from artifact import write_artifact
+from corrector import NSRCCorrector
+from nsrc_service import route
+from priors import N_HORIZONS, PriorTable
+
+
+@pytest.fixture
+def artifact_path(tmp_path):
+    prior_table = PriorTable.from_dicts(
+        {('CPI', 1): np.full(N_HORIZONS, 2.0), ('FOMC', -1): np.full(N_HORIZONS, -1.0)},
+        {1: np.full(N_HORIZONS, 0.5)},
+    )
+    path = str(tmp_path / 'hourly_robust_stats')
+    write_artifact(path, prior_table, np.linspace(0.5, 1.0, N_HORIZONS))
+    return path
+
+
+def test_corrects_known_event(artifact_path):
+    corrector = NSRCCorrector.load(artifact_path)
+    factors = np.linspace(0.5, 1.0, N_HORIZONS)
+    forecasts = np.full((4, N_HORIZONS), 100.0)
+    corrected, applied = corrector.correct(
+        ['CPI (YoY)', 'FOMC', 'GDP (QoQ)', 'Crude Oil Inventories'], [1, -1, '1', 1], forecasts
+    )
+
+    np.testing.assert_array_equal(applied, [True, True, True, False])
+    np.testing.assert_allclose(corrected[0], 100 * (1 + 2.0 * factors / 100))
+    np.testing.assert_allclose(corrected[1], 100 * (1 - 1.0 * factors / 100))
+    np.testing.assert_allclose(corrected[2], 100 * (1 + 0.5 * factors / 100))    # direction fallback
+    np.testing.assert_array_equal(corrected[3], forecasts[3])                     # not whitelisted
+
+
+@pytest.mark.parametrize('direction', ['Bullish', 0.5, None, 2])
+def test_rejects_invalid_direction(artifact_path, direction):
+    corrector = NSRCCorrector.load(artifact_path)
+    with pytest.raises(ValueError, match='Invalid direction'):
+        corrector.correct(['CPI (YoY)'], [direction], np.full((1, N_HORIZONS), 100.0))
+
+
+def test_service_answers_invalid_direction_with_400(artifact_path):
+    class Model:
+        corrector = NSRCCorrector.load(artifact_path)
+
+    body = json.dumps({'items': [{'event': 'CPI (YoY)', 'direction': 'Bullish', 'forecast': [100.0] * N_HORIZONS}]})
+    status, payload = route(Model, 'POST', '/correct', body)
+    assert status == '400 Bad Request' and 'Invalid direction' in payload['error']
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import get_ohlcv
+
+INTERVAL_MS = get_ohlcv.INTERVAL_MS['5m']
+
+
+class StubKlines(BaseHTTPRequestHandler):
+    """
+    Binance /klines stand-in: serves synthetic bars and answers 500 for startTimes in `failing`;
+    startTimes in `throttled` get that many 429 / 418 answers with a Retry-After first.
+    """
+    failing = set()
+    throttled = {}
+    throttle_status = 429
+    retry_after = '7'
+    requests = []
+
+    def do_GET(self):
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        start, end, limit = int(q['startTime']), int(q['endTime']), int(q['limit'])
+        type(self).requests.append(start)
+        if self.throttled.get(start, 0) > 0:
+            self.throttled[start] -= 1
+            self.send_response(self.throttle_status)
+            self.send_header('Retry-After', self.retry_after)
+            self.end_headers()
+            return
+        if start in self.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        bars = [[t, '1', '2', '0.5', str(t % 97), '10', t + INTERVAL_MS - 1, '0', 0, '0', '0', '0']
+                for t in range(start, end + 1, INTERVAL_MS)][:limit]
+        body = json.dumps(bars).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-MBX-USED-WEIGHT-1M', '10')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClock:
+    """
+    Stand-in for get_ohlcv's `time` module: sleep() advances monotonic() instead of blocking.
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += max(seconds, 0.0)
+
+    def time(self):
+        return time.time()
+
+
+@pytest.fixture
+def stub_url(monkeypatch):
+    StubKlines.failing, StubKlines.throttled, StubKlines.requests = set(), {}, []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubKlines)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(get_ohlcv.time, 'sleep', lambda s: None)
+    yield f'http://127.0.0.1:{server.server_address[1]}/api/v3/klines'
+    server.shutdown()
+
+
+TOKENS = [('1_Test(TST)', 'TSTUSDT', 'Binance')]
+START, END = '2025-01-01 00:00:00', '2025-01-15 00:00:00'
+
+
+def test_full_download_is_complete_and_ordered(stub_url, tmp_path):
+    get_ohlcv.download_tokens(TOKENS, '5m', START, END, out_dir=str(tmp_path), base_url=stub_url)
+    df = pd.read_csv(tmp_path / '1_Test(TST)_TSTUSDT_5m.csv', parse_dates=['open_time'])
+    expected = pd.date_range(START, END, freq='5min')
+    assert len(StubKlines.requests) > 1
+    assert (df['open_time'].to_numpy() == expected.to_numpy()).all()
+
+
+def test_failed_page_leaves_no_file(stub_url, tmp_path, capsys):
+    StubKlines.failing = {get_ohlcv.to_ms(START) + get_ohlcv.LIMIT * INTERVAL_MS}
+    with pytest.raises(RuntimeError, match='TSTUSDT'):
+        get_ohlcv.download_tokens(TOKENS, '5m', START, END, out_dir=str(tmp_path), base_url=stub_url)
+    assert not (tmp_path / '1_Test(TST)_TSTUSDT_5m.csv').exists()
+    assert 'HTTP 500' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('status', [429, 418])
+def test_throttled_page_waits_for_retry_after(stub_url, tmp_path, monkeypatch, status):
+    clock = FakeClock()
+    monkeypatch.setattr(get_ohlcv, 'time', clock)
+    throttled_start = get_ohlcv.to_ms(START) + get_ohlcv.LIMIT * INTERVAL_MS
+    StubKlines.throttled, StubKlines.throttle_status = {throttled_start: 1}, status
+
+    get_ohlcv.download_tokens(TOKENS, '5m', START, END, out_dir=str(tmp_path), base_url=stub_url)
+    assert StubKlines.requests.count(throttled_start) == 2
+    assert max(clock.sleeps) == pytest.approx(float(StubKlines.retry_after))
+    df = pd.read_csv(tmp_path / '1_Test(TST)_TSTUSDT_5m.csv', parse_dates=['open_time'])
+    assert (df['open_time'].to_numpy() == pd.date_range(START, END, freq='5min').to_numpy()).all()
+
+
+def test_weight_limiter_spends_budget_and_follows_server(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(get_ohlcv, 'time', clock)
+    limiter = get_ohlcv.WeightLimiter(limit_per_min=120, safety=0.5)    # 60 weight per minute: 1 per second
+    for _ in range(30):
+        limiter.acquire(2)
+    assert clock.sleeps == []
+    limiter.acquire(2)                                                  # budget spent: wait for 2 weight
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+    clock.now += 30                                                     # 30 weight refilled locally ...
+    limiter.observe(50)                                                 # ... but the server says 10 are left
+    limiter.acquire(12)
+    assert clock.sleeps[-1] == pytest.approx(2.0)
+
+
+def test_incremental_append_resumes_without_duplicate_or_unclosed_bars(stub_url, tmp_path):
+    now = pd.Timestamp.now('UTC').tz_localize(None)
+    start, first_end, live_end = now.floor('5min') - pd.Timedelta(days=2), now - pd.Timedelta(days=1), now + pd.Timedelta(hours=1)
+    csv_path = tmp_path / '1_Test(TST)_TSTUSDT_5m.csv'
+
+    get_ohlcv.download_tokens(TOKENS, '5m', start, first_end, out_dir=str(tmp_path), base_url=stub_url)
+    first = pd.read_csv(csv_path, parse_dates=['open_time'])
+    StubKlines.requests = []
+    for _ in range(2):                  # the second refresh finds nothing new
+        get_ohlcv.download_tokens(TOKENS, '5m', start, live_end, out_dir=str(tmp_path), base_url=stub_url, incremental=True)
+    df = pd.read_csv(csv_path, parse_dates=['open_time'])
+
+    # Resumed at the last stored bar instead of re-downloading from `start`
+    assert min(StubKlines.requests) == int(first['open_time'].iloc[-1].value // 1_000_000)
+    assert df.iloc[:len(first)].equals(first)
+    assert df['open_time'].is_unique
+    assert (df['open_time'].diff().dropna() == pd.Timedelta(minutes=5)).all()
+    # Every stored bar had closed; the one still open at refresh time was not frozen in
+    close_time = df['open_time'] + pd.Timedelta(minutes=5)
+    assert close_time.iloc[-1] <= pd.Timestamp.now('UTC').tz_localize(None)
+    assert close_time.iloc[-1] > now - pd.Timedelta(minutes=10)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import online_priors
+from online_priors import OnlinePriors
+from priors import N_HORIZONS, PriorTable
+
+
+@pytest.fixture
+def stream():
+    rng = np.random.default_rng(3)
+    n = 120
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2025-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 24 * 365, n)), unit='h'),
+        'event_group': rng.choice(['CPI', 'FOMC', 'NFP'], n),
+        'direction': rng.choice([-1, 0, 1], n),
+        'y_vector': list(rng.normal(size=(n, N_HORIZONS))),
+    })
+
+
+def decayed_table(df, half_life):
+    """
+    Batch recompute: weighted means with weight 2 ** ((t - t_last) / half_life) per event.
+    """
+    age = (df['timestamp'] - df['timestamp'].max()) / pd.Timedelta(half_life)
+    w = 2.0 ** age.to_numpy()
+    y = np.stack(df['y_vector'].values)
+    groups = list(dict.fromkeys(df['event_group']))
+    group_sums = np.zeros((len(groups), 3, N_HORIZONS))
+    group_weights = np.zeros((len(groups), 3))
+    for g, d, wi, yi in zip(df['event_group'], df['direction'], w, y):
+        group_sums[groups.index(g), d + 1] += wi * yi
+        group_weights[groups.index(g), d + 1] += wi
+    return PriorTable.from_sums(groups, group_sums, group_weights, group_sums.sum(axis=0), group_weights.sum(axis=0))
+
+
+def test_running_means_match_batch(stream):
+    online = OnlinePriors()
+    assert online.ingest(stream) == len(stream)
+    np.testing.assert_allclose(online.table().predict(stream), PriorTable.from_frame(stream).predict(stream), atol=1e-12)
+    assert online.n_events == len(stream)
+
+
+def test_decay_matches_weighted_batch(stream, monkeypatch):
+    half_life = pd.Timedelta(days=30)
+    expected = decayed_table(stream, half_life).predict(stream)
+
+    online = OnlinePriors(half_life)
+    online.ingest(stream)
+    np.testing.assert_allclose(online.table().predict(stream), expected, rtol=1e-10)
+
+    # Rebasing the stored weights on the way leaves the means unchanged
+    monkeypatch.setattr(online_priors, 'MAX_LOG2_WEIGHT', 1)
+    rebased = OnlinePriors(half_life)
+    rebased.ingest(stream)
+    assert rebased.t_ref > stream['timestamp'].min().value
+    np.testing.assert_allclose(rebased.table().predict(stream), expected, rtol=1e-10)
+
+
+def test_resumed_stream_matches_single_pass(stream, tmp_path):
+    half_life = pd.Timedelta(days=30)
+    path = str(tmp_path / 'online_robust_stats')
+    # Split inside a run of equal timestamps: the already-seen events are not added twice
+    stream = pd.concat([stream.iloc[:60], stream.iloc[59:60], stream.iloc[60:]], ignore_index=True)
+    stream.loc[60, 'event_group'] = 'PPI'
+
+    first = OnlinePriors(half_life, hourly_factors=np.ones(N_HORIZONS))
+    first.ingest(stream.iloc[:60])
+    first.save(path)
+    resumed = OnlinePriors.load(path)
+    assert resumed.ingest(stream) == len(stream) - 60
+
+    single = OnlinePriors(half_life)
+    single.ingest(stream)
+    np.testing.assert_allclose(resumed.table().predict(stream), single.table().predict(stream), rtol=1e-10)
+    assert resumed.n_events == single.n_events == len(stream)
+
+
+def test_default_path_is_not_the_batch_artifact():
+    from train import MODEL_SAVE_PATH
+    assert online_priors.ONLINE_STATE_PATH != MODEL_SAVE_PATH
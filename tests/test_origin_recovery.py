@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from origin_recovery import (PRICE_DECIMALS, STATUS_MATCHED, STATUS_UNMATCHED, HourlyCloseIndex,
+                             load_hourly_closes)
+from priors import N_HORIZONS
+
+HOUR = pd.Timedelta(hours=1).value
+
+
+def hourly_market(start_price, tick, n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(start_price * np.exp(np.cumsum(rng.normal(0, 0.003, n))) / tick) * tick
+    times = pd.Timestamp('2025-01-01').value + np.arange(n, dtype=np.int64) * HOUR
+    return times, close
+
+
+def prediction_rows(close, origins):
+    current_close = close[origins]
+    y_true = close[origins[:, None] + np.arange(1, N_HORIZONS + 1)]
+    return current_close, y_true
+
+
+@pytest.mark.parametrize('asset,start_price,tick', [('BTC', 95000, 0.01), ('DOGE', 0.17, 1e-5), ('TRUMP', 11, 1e-3)])
+def test_recover_known_origins(asset, start_price, tick):
+    times, close = hourly_market(start_price, tick)
+    times = np.delete(times, [100, 101])              # missing bars stay on the hourly grid
+    close = np.delete(close, [100, 101])
+    origins = np.arange(0, len(close) - N_HORIZONS, 7)
+    current_close, y_true = prediction_rows(close, origins)
+    current_close = np.r_[current_close, close[5] + 1000 * tick, np.nan]     # no such close / missing
+    y_true = np.vstack([y_true, y_true[:2]])
+
+    rec = HourlyCloseIndex(times, close, decimals=PRICE_DECIMALS[asset]).recover(current_close, y_true)
+    matched = rec['status'].to_numpy()[:-2] == STATUS_MATCHED
+    assert matched.mean() > 0.9
+    assert (rec['origin'].to_numpy()[:-2][matched].view('int64') == times[origins][matched]).all()
+    assert (rec['status'].to_numpy()[-2:] == STATUS_UNMATCHED).all()
+
+
+def test_coarse_rounding_collapses_low_priced_closes():
+    times, close = hourly_market(0.17, 1e-5)
+    origins = np.arange(0, len(close) - N_HORIZONS, 5)
+    current_close, y_true = prediction_rows(close, origins)
+    exact = HourlyCloseIndex(times, close, decimals=PRICE_DECIMALS['DOGE']).recover(current_close, y_true)
+    coarse = HourlyCloseIndex(times, close, decimals=2).recover(current_close, y_true)
+    assert exact['n_candidates'].mean() < 2
+    assert coarse['n_candidates'].mean() > 50
+    assert (exact['status'] == STATUS_MATCHED).sum() > (coarse['status'] == STATUS_MATCHED).sum()
+
+
+def test_empty_index_leaves_rows_unmatched():
+    times, close = hourly_market(95000, 0.01, n=50)
+    rec = HourlyCloseIndex(np.zeros(0, dtype=np.int64), np.zeros(0)).recover(*prediction_rows(close, np.arange(3)))
+    assert (rec['status'] == STATUS_UNMATCHED).all()
+
+
+def test_load_hourly_closes_is_last_5m_close(tmp_path):
+    times = pd.date_range('2025-01-01', periods=5 * 12 + 7, freq='5min')
+    close = np.arange(len(times), dtype=float) + 0.5
+    csv_path = tmp_path / '1_Test(TST)_TSTUSDT_5m.csv'
+    pd.DataFrame({'open_time': times, 'open': close, 'high': close, 'low': close, 'close': close,
+                  'volume': 1.0}).to_csv(csv_path, index=False)
+
+    hours, hourly_close = load_hourly_closes(str(csv_path))
+    expected = pd.Series(close, index=times).resample('1h').last()
+    assert (hours == expected.index.values.astype('datetime64[ns]').view('int64')).all()
+    np.testing.assert_array_equal(hourly_close, expected.to_numpy())
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import prediction_store as ps
+from priors import N_HORIZONS
+
+
+def write_predictions(path, close, first, n, rng):
+    """
+    Prediction CSV in the dataset/model_prediction layout: rows are origins first .. first + n - 1.
+    """
+    rows = np.arange(first, first + n)
+    true = close[rows[:, None] + np.arange(1, N_HORIZONS + 1)]
+    df = pd.DataFrame({'current_close': close[rows]})
+    for k in range(N_HORIZONS):
+        df[f'pred_t+{k + 1}'] = true[:, k] * (1 + rng.normal(0, 1e-3, n))
+    for k in range(N_HORIZONS):
+        df[f'true_t+{k + 1}'] = true[:, k]
+    df.to_csv(path, index=False)
+
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(3)
+    return np.round(95000 * np.exp(np.cumsum(rng.normal(0, 0.003, 400))), 2)
+
+
+@pytest.mark.parametrize('first_b,n_b', [(9, 101), (13, 90)])     # B starts one origin earlier / three later
+def test_rows_aligned_on_current_close(tmp_path, close, first_b, n_b):
+    rng = np.random.default_rng(4)
+    first_a, n_a = 10, 100
+    files = {'A': str(tmp_path / 'A.csv'), 'B': str(tmp_path / 'B.csv')}
+    write_predictions(files['A'], close, first_a, n_a, rng)
+    write_predictions(files['B'], close, first_b, n_b, rng)
+
+    assert ps.row_offsets({m: ps.read_prediction_csv(p) for m, p in files.items()}) == {'A': 0, 'B': first_b - first_a}
+    tensor = ps.load_prediction_tensor(ps.build_prediction_tensor(files, str(tmp_path / 'store')))
+    assert tensor.origin_kind == 'row'
+
+    # Axis position r is origin start + r for both models
+    start = min(first_a, first_b)
+    axis_origin = start + np.asarray(tensor.origins)
+    for m, (first, n) in enumerate([(first_a, n_a), (first_b, n_b)]):
+        present = (axis_origin >= first) & (axis_origin < first + n)
+        np.testing.assert_array_equal(tensor.present[m], present)
+        np.testing.assert_allclose(tensor.current_close[m, present], close[axis_origin[present]], rtol=1e-6)
+        np.testing.assert_allclose(tensor.field('true')[m, present, 0], close[axis_origin[present] + 1], rtol=1e-6)
+        assert np.isnan(tensor.values[m, ~present]).all()
+
+
+def test_unrelated_rows_are_rejected(tmp_path, close):
+    rng = np.random.default_rng(5)
+    files = {'A': str(tmp_path / 'A.csv'), 'B': str(tmp_path / 'B.csv')}
+    write_predictions(files['A'], close, 10, 100, rng)
+    write_predictions(files['B'], close[::-1].copy(), 10, 100, rng)
+    with pytest.raises(ValueError, match='do not line up'):
+        ps.build_prediction_tensor(files, str(tmp_path / 'store'))
+
+
+def test_older_tensor_version_is_rebuilt(tmp_path, close):
+    rng = np.random.default_rng(6)
+    files = {'A': str(tmp_path / 'A.csv'), 'B': str(tmp_path / 'B.csv')}
+    write_predictions(files['A'], close, 10, 100, rng)
+    write_predictions(files['B'], close, 9, 101, rng)
+    store_dir = ps.build_prediction_tensor(files, str(tmp_path / 'store'))
+    assert ps.is_tensor_fresh(files, store_dir)
+
+    meta_path = tmp_path / 'store' / 'meta.json'
+    meta = json.loads(meta_path.read_text())
+    meta['version'] = ps.TENSOR_VERSION - 1
+    meta_path.write_text(json.dumps(meta))
+    assert not ps.is_tensor_fresh(files, store_dir)
+    with pytest.raises(FileNotFoundError):
+        ps.PredictionTensor(store_dir)
+
+    ps.ensure_prediction_tensor(files, store_dir)
+    assert ps.load_prediction_tensor(store_dir).meta['version'] == ps.TENSOR_VERSION
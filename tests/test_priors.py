@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from priors import N_HORIZONS, PriorPrefix, PriorTable
+
+
+def v7_predict(train, queries):
+    """
+    Reference: train.py V7 get_priors dicts and the per-row predict_res lookup.
+    """
+    p = train.groupby(['event_group', 'direction'])['y_vector'].apply(lambda x: np.mean(np.stack(x), axis=0)).to_dict()
+    gp = train.groupby('direction')['y_vector'].apply(lambda x: np.mean(np.stack(x), axis=0)).to_dict()
+    return np.stack([p.get((r['event_group'], r['direction']), gp.get(r['direction'], np.zeros(N_HORIZONS)))
+                     for _, r in queries.iterrows()])
+
+
+@pytest.fixture
+def events():
+    rng = np.random.default_rng(0)
+    n = 300
+    return pd.DataFrame({
+        'event_group': rng.choice(['CPI', 'FOMC', 'NFP', 'PPI'], n),
+        'direction': rng.choice([-1, 0, 1], n),
+        'y_vector': list(rng.normal(size=(n, N_HORIZONS))),
+    })
+
+
+def test_table_matches_v7_dict_lookup(events):
+    train = events.iloc[:200]
+    train = train[~((train['event_group'] == 'PPI') & (train['direction'] == 1))]     # direction fallback
+    queries = pd.concat([events.iloc[200:], pd.DataFrame({
+        'event_group': ['unseen', 'CPI'], 'direction': [1, 2], 'y_vector': [None, None]     # unknown direction -> zeros
+    })], ignore_index=True)
+
+    table = PriorTable.from_frame(train)
+    np.testing.assert_allclose(table.predict(queries), v7_predict(train, queries), atol=1e-12)
+    np.testing.assert_allclose(PriorTable.from_dicts(*table.to_dicts()).predict(queries), table.predict(queries))
+
+
+@pytest.mark.parametrize('n', [0, 1, 17, 150, 300])
+def test_prefix_table_matches_from_frame(events, n):
+    events = events.assign(direction=np.where(np.arange(len(events)) % 7 == 0, 2, events['direction']))   # some unknown
+    table = PriorPrefix(events).table(n)
+    expected = PriorTable.from_frame(events.iloc[:n])
+    queries = events.assign(event_group=list(events['event_group'].iloc[:-1]) + ['unseen'])
+
+    np.testing.assert_allclose(table.predict(queries), expected.predict(queries), atol=1e-12)
+    np.testing.assert_array_equal(table.has_direction, expected.has_direction)
+    np.testing.assert_array_equal(table.direction_weights, expected.direction_weights)
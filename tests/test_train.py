@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from train import FACTOR_GRID, grid_search_factors, l1_optimal_factors
+
+
+def test_l1_factor_is_weighted_median():
+    # One fold, five samples, two hours
+    p_val = np.array([[[1.0, 0.0], [2.0, 0.0], [-1.0, 0.0], [1.0, 0.0], [0.0, 0.0]]])
+    y_val = np.array([[[0.2, 1.0], [1.2, 2.0], [-0.9, 3.0], [1.4, 4.0], [5.0, 5.0]]])
+    # Hour 1: ratios 0.2, 0.6, 0.9, 1.4 with |p| weights 1, 2, 1, 1 (p == 0 carries no weight)
+    # -> cumulative weight reaches half of 5 at 0.6. Hour 2 has no non-zero prior -> 0.
+    np.testing.assert_allclose(l1_optimal_factors(y_val, p_val), [[0.6, 0.0]])
+
+    # The weighted median is also the minimum of the L1 objective over a fine grid
+    fine = np.linspace(0, 1.5, 1501)
+    mae = np.abs(y_val[0, :, 0, None] - p_val[0, :, 0, None] * fine).mean(axis=0)
+    assert fine[np.argmin(mae)] == pytest.approx(0.6)
+
+
+def test_l1_factor_is_clipped_to_the_grid_range():
+    p_val = np.ones((1, 3, 1))
+    np.testing.assert_allclose(l1_optimal_factors(3.0 * p_val, p_val), [[FACTOR_GRID[-1]]])
+    np.testing.assert_allclose(l1_optimal_factors(-1.0 * p_val, p_val), [[FACTOR_GRID[0]]])
+
+
+def test_l1_matches_grid_search_on_unique_optimum():
+    rng = np.random.default_rng(7)
+    p_val = rng.normal(size=(3, 40, 24))
+    # y = f * p exactly, with f on the grid: f is the unique minimizer (zero error)
+    factors = FACTOR_GRID[rng.integers(0, len(FACTOR_GRID), size=(3, 24))]
+    y_val = p_val * factors[:, None, :]
+
+    np.testing.assert_allclose(l1_optimal_factors(y_val, p_val), factors, atol=1e-12)
+    np.testing.assert_allclose(grid_search_factors(y_val, p_val), factors)
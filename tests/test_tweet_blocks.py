@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from tweet_blocks import iter_tweets, parse_tweet_block
+
+# Block as written by process_tweet_core.py, with the [ANALYZEDATA] section it inserts later
+RAW = '''[TWEET START]
+Text: "Fed says ""no cut"" - markets: down"
+---
+[METADATA]
+- Author Username: alice
+- Author Followers: 1200
+- Created At: 2025-03-01 14:05:00
+- Views: 900
+- Likes: 12
+- Retweets: 3
+- Replies: 1
+- Quotes: N/A
+[TWEET END]'''
+ANALYZED = RAW.replace('[TWEET END]', '\n---\n[ANALYZEDATA]\n- label: bearish\n- key_word_used: no cut\n'
+                                      '- reasoning: Rates: higher for longer\n[TWEET END]')
+
+
+def test_parse_metadata_block():
+    tweet = parse_tweet_block(RAW)
+    assert tweet.text == 'Fed says "no cut" - markets: down'
+    assert tweet.author == 'alice'
+    assert tweet.followers == 1200
+    assert tweet.created_at == datetime(2025, 3, 1, 14, 5)
+    assert (tweet.views, tweet.likes, tweet.retweets, tweet.replies) == (900, 12, 3, 1)
+    assert tweet.quotes is None         # unparseable values become None
+    assert tweet.label is None and tweet.block == RAW
+
+
+def test_parse_analyzed_block():
+    tweet = parse_tweet_block(ANALYZED)
+    assert (tweet.label, tweet.keyword) == ('bearish', 'no cut')
+    assert tweet.reasoning == 'Rates: higher for longer'
+    assert tweet.likes == 12
+
+
+def test_iter_tweets_skips_incomplete_block(tmp_path):
+    path = tmp_path / 'tweets.txt'
+    path.write_text('\n\n'.join([RAW, ANALYZED, RAW[:-len('[TWEET END]')]]), encoding='utf-8')
+    assert [t.label for t in iter_tweets(str(path))] == [None, 'bearish']
+    assert list(iter_tweets(str(tmp_path / 'missing.txt'))) == []
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from priors import N_HORIZONS
+from walk_forward import plan_steps
+
+
+def test_training_labels_resolve_before_the_test_block():
+    rng = np.random.default_rng(5)
+    horizon = pd.Timedelta(hours=N_HORIZONS)
+    random_times = pd.Timestamp('2025-01-03') + pd.to_timedelta(rng.integers(0, 24 * 170, 400), unit='h')
+    boundaries = pd.date_range('2025-02-01', '2025-06-01', freq='MS')
+    # Events in the last day before each refit, including origins exactly 24h before it
+    edge_times = pd.DatetimeIndex([t for b in boundaries for t in (b - horizon, b - horizon, b - pd.Timedelta(hours=1), b)])
+    times = pd.DatetimeIndex(np.sort(np.concatenate([random_times.values, edge_times.values])))
+
+    steps = plan_steps(times, freq='MS', end='2025-07-01', min_train=10)
+    assert [s[1] for s in steps] == list(boundaries)
+
+    prev_hi = None
+    for _, boundary, next_boundary, n_train, lo, hi in steps:
+        # Every training origin's 24h horizon ends by the refit, and no resolved event is left out
+        assert times[n_train - 1] + horizon <= boundary
+        assert n_train == len(times) or times[n_train] + horizon > boundary
+        # The test block is exactly the events of [boundary, next_boundary)
+        assert times[lo] >= boundary and times[hi - 1] < next_boundary
+        assert lo == 0 or times[lo - 1] < boundary
+        assert n_train <= lo
+        assert prev_hi is None or lo == prev_hi
+        prev_hi = hi